@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+End-to-end document chat turn latency for every channel
+
+Runs chat turns through ConversationEngine the way each channel adapter
+does (REST and WhatsApp non-streamed, Telegram streamed) against the
+database in DATABASE_URL, with Gemini replaced by a fake of fixed latency,
+and reports p50/p95/p99 turn latency, the engine's own overhead on top of
+the model and, for streamed turns, time to first chunk. Seeds its own users
+and document and deletes them afterwards.
+
+Usage: python benchmarks/bench_conversation_turn.py [--turns N] [--users U]
+       [--model-latency-ms L] [--chunks C] [--channels web,telegram,whatsapp]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from sqlalchemy import delete
+
+from models.document import Document, DocumentStatus
+from models.user import User, UserRole
+from services.conversation_engine import conversation_engine
+from services.gemini_service import gemini_service
+from services.whatsapp_sender import MAX_TEXT_LENGTH
+from utils import database
+from utils.text import split_message
+
+ANSWER = "The document explains this in section two. " * 20
+
+
+def install_fake_model(latency_ms: float, chunks: int):
+    """Replace Gemini with a fixed-latency fake, spread over the stream's chunks"""
+    latency = latency_ms / 1000
+
+    async def chat_with_document(document_text, question, chat_history=None, user_id=None):
+        await asyncio.sleep(latency)
+        return {"response": ANSWER, "success": True, "model_used": "fake"}
+
+    async def stream_chat_with_document(document_text, question, chat_history=None, user_id=None):
+        size = max(1, len(ANSWER) // chunks)
+        for i in range(0, len(ANSWER), size):
+            await asyncio.sleep(latency / chunks)
+            yield ANSWER[i:i + size]
+
+    gemini_service.chat_with_document = chat_with_document
+    gemini_service.stream_chat_with_document = stream_chat_with_document
+
+
+def percentiles(samples: list) -> dict:
+    if len(samples) < 2:
+        return {"p50_ms": round(samples[0] * 1000, 2) if samples else None}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+async def seed(users: int):
+    async with database.async_session_factory() as session:
+        students = [
+            User(
+                id=uuid.uuid4(),
+                email=f"bench-{uuid.uuid4().hex[:12]}@example.com",
+                password_hash="x",
+                full_name="Benchmark Student",
+                role=UserRole.STUDENT.value
+            )
+            for _ in range(users)
+        ]
+        document = Document(
+            id=uuid.uuid4(),
+            original_filename="benchmark.pdf",
+            file_path="/dev/null",
+            file_size=0,
+            status=DocumentStatus.processed,
+            processed_text="Benchmark document. " * 2000
+        )
+        session.add_all(students + [document])
+        await session.commit()
+    return students, document
+
+
+async def cleanup(students: list, document: Document):
+    async with database.async_session_factory() as session:
+        await session.execute(delete(Document).where(Document.id == document.id))
+        await session.execute(delete(User).where(User.id.in_([s.id for s in students])))
+        await session.commit()
+
+
+async def run_channel(channel: str, students: list, document: Document, turns: int, model_latency: float) -> dict:
+    latencies = []
+    first_chunks = []
+
+    async def consume(chunks, started):
+        text = ""
+        async for chunk in chunks:
+            if not text:
+                first_chunks.append(time.perf_counter() - started)
+            text += chunk
+        return text
+
+    async def converse(student: User, count: int):
+        for i in range(count):
+            started = time.perf_counter()
+            async with database.async_session_factory() as session:
+                turn = await conversation_engine.run_turn(
+                    session,
+                    document.id,
+                    student,
+                    f"Question {i} about the document?",
+                    channel=channel,
+                    on_stream=(lambda chunks: consume(chunks, started)) if channel == "telegram" else None
+                )
+            if channel == "whatsapp":
+                split_message(turn.response_text, MAX_TEXT_LENGTH)
+            latencies.append(time.perf_counter() - started)
+
+    per_user = max(1, turns // len(students))
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(student, per_user) for student in students))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "turns": len(latencies),
+        "turns_per_sec": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+        "engine_overhead_p50_ms": round((statistics.median(latencies) - model_latency) * 1000, 2),
+    }
+    if first_chunks:
+        report["first_chunk"] = percentiles(first_chunks)
+    return report
+
+
+async def main(args) -> dict:
+    install_fake_model(args.model_latency_ms, args.chunks)
+    database.init_database()
+    students, document = await seed(args.users)
+    report = {"users": args.users, "model_latency_ms": args.model_latency_ms}
+    try:
+        for channel in args.channels.split(","):
+            report[channel] = await run_channel(
+                channel, students, document, args.turns, args.model_latency_ms / 1000
+            )
+    finally:
+        await cleanup(students, document)
+        await database.close_database()
+    report["engine"] = conversation_engine.stats()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--model-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--channels", default="web,telegram,whatsapp")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args)), indent=2))
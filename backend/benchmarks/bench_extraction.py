@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Extraction throughput of DocumentProcessingService, with regression thresholds
+
+Generates a synthetic corpus once into --corpus-dir: PDF, DOCX and TXT
+files of graded sizes (1 to 1000 pages), with tables and non-ASCII text.
+Then measures extract_text_from_file plus _clean_text for every file. Each
+file runs in a fresh interpreter so peak RSS belongs to that file alone.
+The measurements are the best and median wall time over --repeat runs,
+pages/s, peak RSS and output size.
+
+Results are compared with the JSON baseline (--baseline). The run fails
+(exit status 1) when a case:
+- has a best time more than the time tolerance slower than its baseline
+  (and by more than --min-delta-ms)
+- uses more than the RSS tolerance more peak memory
+- produces different output
+--update-baseline records the current results instead, as does the first
+run when no baseline exists. Baselines are machine specific: record them on
+the machine that runs the check, with the same --repeat.
+
+Usage: python benchmarks/bench_extraction.py [--pages 1,10,100,1000]
+       [--formats pdf,docx,txt] [--repeat R] [--tolerance PCT]
+       [--rss-tolerance PCT] [--baseline FILE] [--update-baseline]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).parent
+SRC = BENCHMARKS.parent / "src"
+DEFAULT_BASELINE = BENCHMARKS / "baselines" / "extraction.json"
+DEFAULT_CORPUS = Path(tempfile.gettempdir()) / "edutech-extraction-corpus"
+# Bump when the generators change, so cached corpora are rebuilt
+CORPUS_VERSION = 1
+
+MIME_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+}
+
+LATIN = (
+    "the student reviews each chapter with notes on method result theory proof example "
+    "naïve café Größe español façade coöperate déjà vu señor Ærø — €"
+).split()
+# Not representable with the PDF standard fonts, so only used in DOCX and TXT
+UNICODE = "数学 物理 Ελληνικά математика עברית हिन्दी 📘 ∑ ∫ √".split()
+
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 14
+TABLE_EVERY = 5  # pages
+
+
+def page_lines(rng: random.Random, unicode: bool) -> list:
+    words = LATIN + UNICODE if unicode else LATIN
+    return [" ".join(rng.choice(words) for _ in range(WORDS_PER_LINE)) for _ in range(LINES_PER_PAGE)]
+
+
+def table_rows(rng: random.Random, page: int) -> list:
+    header = ["Topic", "Score", "Weight", "Notes"]
+    return [header] + [
+        [f"Item {page}.{row}", str(rng.randrange(100)), f"{rng.random():.2f}", rng.choice(LATIN)]
+        for row in range(6)
+    ]
+
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("cp1252") + b")"
+
+
+def write_pdf(path: Path, pages: int, seed: int):
+    """Minimal multi-page PDF (Helvetica, WinAnsi, Flate-compressed content) without a PDF library"""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    page_tree = add(b"")
+    page_ids = []
+    for page in range(pages):
+        ops = [b"BT /F1 10 Tf 12 TL 50 790 Td"]
+        for line in page_lines(rng, unicode=False):
+            ops.append(_pdf_string(line) + b" '")
+        ops.append(b"ET")
+        if page % TABLE_EVERY == 0:
+            for row, cells in enumerate(table_rows(rng, page)):
+                for column, cell in enumerate(cells):
+                    x, y = 50 + column * 120, 260 - row * 14
+                    ops.append(b"BT /F1 9 Tf %d %d Td " % (x, y) + _pdf_string(cell) + b" Tj ET")
+        stream = zlib.compress(b"\n".join(ops))
+        content = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    path.write_bytes(bytes(out))
+
+
+def write_docx(path: Path, pages: int, seed: int):
+    from docx import Document
+
+    rng = random.Random(seed)
+    document = Document()
+    for page in range(pages):
+        document.add_heading(f"Chapter {page + 1}", level=2)
+        for line in page_lines(rng, unicode=True):
+            document.add_paragraph(line)
+        if page % TABLE_EVERY == 0:
+            rows = table_rows(rng, page)
+            table = document.add_table(rows=len(rows), cols=len(rows[0]))
+            for row, cells in zip(table.rows, rows):
+                for cell, text in zip(row.cells, cells):
+                    cell.text = text
+        if page < pages - 1:
+            document.add_page_break()
+    document.save(path)
+
+
+def write_txt(path: Path, pages: int, seed: int):
+    rng = random.Random(seed)
+    parts = []
+    for page in range(pages):
+        parts.extend(page_lines(rng, unicode=True))
+        if page % TABLE_EVERY == 0:
+            parts.extend("\t".join(cells) for cells in table_rows(rng, page))
+        # Runs of repeated characters, which _clean_text collapses
+        parts.append("-" * 40 + "\f")
+    path.write_text("\n".join(parts), encoding="utf-8")
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def corpus_file(corpus: Path, kind: str, pages: int) -> Path:
+    path = corpus / f"v{CORPUS_VERSION}-{pages}p.{kind}"
+    if not path.exists():
+        corpus.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        WRITERS[kind](path, pages, seed=pages)
+        print(f"generated {path.name} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+def measure(path: str, mime_type: str, repeat: int) -> dict:
+    """Runs in the child interpreter"""
+    sys.path.insert(0, str(SRC))
+    from services.document_service import document_service
+
+    async def run():
+        extract, clean, total = [], [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            text = await document_service.extract_text_from_file(path, mime_type)
+            extracted = time.perf_counter()
+            if text is None:
+                raise RuntimeError(f"extraction failed for {path}")
+            cleaned = await document_service._clean_text(text)
+            finished = time.perf_counter()
+            extract.append(extracted - started)
+            clean.append(finished - extracted)
+            total.append(finished - started)
+        # Best of the repeats is what gets compared: noise only ever adds time
+        return {
+            "seconds": min(total),
+            "median_seconds": statistics.median(total),
+            "extract_seconds": min(extract),
+            "clean_seconds": min(clean),
+            "output_chars": len(text),
+            "cleaned_chars": len(cleaned),
+        }
+
+    result = asyncio.run(run())
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def peak_rss_mb() -> float:
+    """This process's peak RSS; VmHWM because Linux carries ru_maxrss over from the parent across exec"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_case(path: Path, kind: str, pages: int, repeat: int) -> dict:
+    child = subprocess.run(
+        [sys.executable, __file__, "--measure", str(path), MIME_TYPES[kind], str(repeat)],
+        capture_output=True,
+        text=True
+    )
+    if child.returncode != 0:
+        raise RuntimeError(f"{path.name}: {child.stderr[-2000:]}")
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    return {
+        "seconds": round(result["seconds"], 5),
+        "median_seconds": round(result["median_seconds"], 5),
+        "extract_seconds": round(result["extract_seconds"], 5),
+        "clean_seconds": round(result["clean_seconds"], 5),
+        "pages_per_sec": round(pages / result["seconds"], 1) if result["seconds"] else None,
+        "input_bytes": path.stat().st_size,
+        "output_chars": result["output_chars"],
+        "cleaned_chars": result["cleaned_chars"],
+        "peak_rss_mb": round(result["peak_rss_mb"], 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, rss_tolerance: float, min_delta: float) -> list:
+    failures = []
+    for case, current in results.items():
+        previous = baseline.get("cases", {}).get(case)
+        if previous is None:
+            continue
+        slower = current["seconds"] - previous["seconds"]
+        if slower > previous["seconds"] * tolerance / 100 and slower > min_delta:
+            failures.append(
+                f"{case}: {current['seconds'] * 1000:.1f}ms vs baseline {previous['seconds'] * 1000:.1f}ms "
+                f"(+{slower / previous['seconds'] * 100:.0f}%, tolerance {tolerance:.0f}%)"
+            )
+        if current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + rss_tolerance / 100):
+            failures.append(
+                f"{case}: peak RSS {current['peak_rss_mb']}MB vs baseline {previous['peak_rss_mb']}MB "
+                f"(tolerance {rss_tolerance:.0f}%)"
+            )
+        if current["cleaned_chars"] != previous["cleaned_chars"]:
+            failures.append(
+                f"{case}: output changed ({current['cleaned_chars']} chars vs {previous['cleaned_chars']})"
+            )
+    return failures
+
+
+def main(args) -> int:
+    results = {}
+    for kind in args.formats.split(","):
+        for pages in (int(p) for p in args.pages.split(",")):
+            path = corpus_file(args.corpus_dir, kind, pages)
+            results[f"{kind}-{pages}p"] = run_case(path, kind, pages, args.repeat)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance_pct", 15.0)
+    rss_tolerance = args.rss_tolerance if args.rss_tolerance is not None else baseline.get("rss_tolerance_pct", 20.0)
+
+    report = {"cases": results}
+    if args.update_baseline or not baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "machine": f"{platform.machine()} / {platform.processor() or 'unknown cpu'} / Python {platform.python_version()}",
+            "repeat": args.repeat,
+            "tolerance_pct": tolerance,
+            "rss_tolerance_pct": rss_tolerance,
+            "cases": {**baseline.get("cases", {}), **results},
+        }, indent=2) + "\n")
+        report["baseline"] = f"recorded to {args.baseline}"
+        failures = []
+    else:
+        failures = compare(results, baseline, tolerance, rss_tolerance, args.min_delta_ms / 1000)
+        report["baseline"] = str(args.baseline)
+        report["tolerance_pct"] = tolerance
+        report["rss_tolerance_pct"] = rss_tolerance
+    report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--measure":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="1,10,100,1000")
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=None, help="Allowed slowdown in percent")
+    parser.add_argument("--rss-tolerance", type=float, default=None, help="Allowed peak RSS growth in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--corpus-dir", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--update-baseline", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Import time of the application (worker cold start)
+
+Imports main in a fresh interpreter under ``python -X importtime`` and
+reports the total and the slowest modules by cumulative time. Fails (exit
+status 1) when a module that should load lazily through the service
+registry was imported eagerly, or when the total exceeds --max-ms, so it
+can run in CI as a regression check (tests/test_import_time.py runs the
+eager-import check with the test suite). Required settings that are unset
+get placeholders.
+
+Usage: python benchmarks/bench_import_time.py [--runs N] [--top K]
+       [--max-ms MS]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from offline_fakes import OFFLINE_ENVIRONMENT
+
+SRC = Path(__file__).parent.parent / "src"
+
+# Loaded on first use or by the lifespan warm-up, never by importing the app
+LAZY_MODULES = ("google.generativeai", "grpc", "pypdf", "docx", "nltk")
+
+# "import time: self [us] | cumulative | imported package"
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_once(module: str) -> dict:
+    """Cumulative import time per module (µs) for one fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC,
+        env={**OFFLINE_ENVIRONMENT, **os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def eager_lazy_modules(modules: dict) -> list:
+    """Modules of LAZY_MODULES that an import pulled in"""
+    return sorted(
+        name for name in modules
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+
+
+def main(args) -> int:
+    runs = [import_once(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run[args.module] for run in runs) / 1000
+
+    last = runs[-1]
+    eager = eager_lazy_modules(last)
+    top_level = {name: us for name, us in last.items() if "." not in name and name != args.module}
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "total_ms": round(total_ms, 1),
+        "modules_imported": len(last),
+        "slowest_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "eager_lazy_modules": eager,
+    }
+    failures = []
+    if eager:
+        failures.append(f"lazy modules imported eagerly: {', '.join(eager)}")
+    if args.max_ms is not None and total_ms > args.max_ms:
+        failures.append(f"import took {total_ms:.0f}ms, limit {args.max_ms:.0f}ms")
+    report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None)
+    sys.exit(main(parser.parse_args()))
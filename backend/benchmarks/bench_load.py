@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test of the API
+
+Boots the app in-process, with its lifespan, against the PostgreSQL in
+DATABASE_URL. Gemini, the Telegram Bot API and the WhatsApp Cloud API are
+replaced by the deterministic fakes in offline_fakes.py, so no network or
+API keys are needed.
+
+A weighted, seeded mix of traffic is driven through the app by concurrent
+virtual users:
+- REST: document upload, list, summary and chat
+- Webhook replays: Telegram and WhatsApp messages from linked users with
+  an active document chat
+
+The report gives per-endpoint request counts, errors, throughput and
+p50/p95/p99 latency, plus how the bots' queues drained. It is printed as
+JSON and written to --output with the git commit, so runs can be compared
+commit to commit. The test seeds its own users, documents and bot
+identities and deletes them afterwards.
+
+Usage: python benchmarks/bench_load.py [--requests N] [--concurrency C]
+       [--mix upload=1,list=6,summary=2,chat=3,telegram=4,whatsapp=4]
+       [--model-latency-ms L] [--tokens-per-sec T] [--api-latency-ms A]
+       [--users U] [--seed S] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import httpx
+from jose import jwt
+from sqlalchemy import delete, select
+
+from core.config import settings
+from offline_fakes import (
+    FakeGeminiModel, FakeTelegramRequest, install_fake_gemini, install_fake_telegram, whatsapp_transport
+)
+
+DEFAULT_MIX = "upload=1,list=6,summary=2,chat=3,telegram=4,whatsapp=4"
+
+
+def configure_offline():
+    """Settings for an offline run; must happen before the app is imported"""
+    settings.TELEGRAM_BOT_TOKEN = "123456:offline-benchmark"
+    settings.TELEGRAM_WEBHOOK_URL = None
+    settings.TELEGRAM_WEBHOOK_SECRET = None
+    settings.WHATSAPP_WEBHOOK_SECRET = None
+    settings.DEBUG = False
+    settings.ENABLE_METRICS = False
+    settings.WARM_UP_ON_STARTUP = False
+    settings.LOG_LEVEL = "WARNING"
+
+
+def percentiles(samples: list) -> dict:
+    if len(samples) < 2:
+        return {"p50_ms": round(samples[0] * 1000, 2) if samples else None}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def token_for(user) -> str:
+    return jwt.encode(
+        {"sub": str(user.id), "exp": datetime.utcnow() + timedelta(hours=2)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+class Fixture:
+    """Users, documents and linked bot identities created for one run"""
+
+    def __init__(self, users: int):
+        from models.user import User, UserRole
+        from models.document import Document, DocumentStatus
+
+        run = uuid.uuid4().hex[:8]
+        self.instructor = User(
+            id=uuid.uuid4(),
+            email=f"bench-{run}-instructor@example.com",
+            password_hash="x",
+            full_name="Benchmark Instructor",
+            role=UserRole.INSTRUCTOR.value
+        )
+        self.students = [
+            User(
+                id=uuid.uuid4(),
+                email=f"bench-{run}-{i}@example.com",
+                password_hash="x",
+                full_name=f"Benchmark Student {i}",
+                role=UserRole.STUDENT.value
+            )
+            for i in range(users)
+        ]
+        self.documents = [
+            Document(
+                id=uuid.uuid4(),
+                uploaded_by=self.instructor.id,
+                original_filename=f"benchmark-{i}.pdf",
+                file_path="/dev/null",
+                file_size=0,
+                mime_type="application/pdf",
+                status=DocumentStatus.processed,
+                processed_text=f"Benchmark document {i}. " + "Lorem ipsum dolor sit amet. " * 1500
+            )
+            for i in range(3)
+        ]
+        # Synthetic identities, far outside real Telegram ids and phone numbers
+        base = random.Random(run).randrange(10**6)
+        self.telegram_ids = [9_000_000_000 + base * 1000 + i for i in range(users)]
+        self.phones = [f"1555{(base + i) % 10**7:07d}" for i in range(users)]
+        self.tokens = [token_for(student) for student in self.students]
+        self.instructor_token = token_for(self.instructor)
+
+    async def create(self, session_factory):
+        from models.telegram import TelegramUser
+        from models.whatsapp import WhatsAppUser
+        from services.chat_context_store import chat_context_store, whatsapp_chat_context
+
+        now = datetime.utcnow()
+        async with session_factory() as session:
+            session.add_all([self.instructor] + self.students)
+            await session.flush()
+            session.add_all(self.documents)
+            session.add_all([
+                TelegramUser(user_id=student.id, telegram_id=telegram_id, telegram_first_name="Bench", is_linked=True, linked_at=now)
+                for student, telegram_id in zip(self.students, self.telegram_ids)
+            ])
+            session.add_all([
+                WhatsAppUser(user_id=student.id, whatsapp_phone=phone, whatsapp_name="Bench", is_linked=True, linked_at=now)
+                for student, phone in zip(self.students, self.phones)
+            ])
+            await session.commit()
+
+        for i, (telegram_id, phone) in enumerate(zip(self.telegram_ids, self.phones)):
+            document_id = str(self.documents[i % len(self.documents)].id)
+            await chat_context_store.set(telegram_id, document_id)
+            await whatsapp_chat_context.set(phone, document_id)
+
+    async def delete(self, session_factory):
+        from models.document import Document
+        from models.telegram import TelegramUser
+        from models.whatsapp import WhatsAppUser
+        from models.user import User
+
+        async with session_factory() as session:
+            result = await session.execute(
+                select(Document.file_path).where(Document.uploaded_by == self.instructor.id)
+            )
+            uploaded = [path for path in result.scalars().all() if path != "/dev/null"]
+            await session.execute(delete(Document).where(Document.uploaded_by == self.instructor.id))
+            await session.execute(delete(TelegramUser).where(TelegramUser.telegram_id.in_(self.telegram_ids)))
+            await session.execute(delete(WhatsAppUser).where(WhatsAppUser.whatsapp_phone.in_(self.phones)))
+            user_ids = [self.instructor.id] + [student.id for student in self.students]
+            await session.execute(delete(User).where(User.id.in_(user_ids)))
+            await session.commit()
+        for path in uploaded:
+            Path(path).unlink(missing_ok=True)
+
+
+class Scenarios:
+    """One request per traffic type; each returns the endpoint label and the response"""
+
+    def __init__(self, fixture: Fixture):
+        self.fixture = fixture
+        self.update_ids = iter(range(10**9, 2 * 10**9))
+        self.uploads = 0
+
+    def _student(self, rng: random.Random) -> int:
+        return rng.randrange(len(self.fixture.students))
+
+    def _auth(self, token: str) -> dict:
+        return {"Authorization": f"Bearer {token}"}
+
+    def _document(self, rng: random.Random) -> str:
+        return str(rng.choice(self.fixture.documents).id)
+
+    async def upload(self, client, rng):
+        self.uploads += 1
+        content = (f"Benchmark upload {self.uploads}. " + "Some study notes about the topic. " * 300).encode()
+        response = await client.post(
+            "/api/documents/upload",
+            files={"file": (f"benchmark-{self.uploads}.txt", content, "text/plain")},
+            headers=self._auth(self.fixture.instructor_token)
+        )
+        return "POST /documents/upload", response
+
+    async def list(self, client, rng):
+        response = await client.get(
+            "/api/documents/", params={"per_page": 10},
+            headers=self._auth(self.fixture.tokens[self._student(rng)])
+        )
+        return "GET /documents/", response
+
+    async def summary(self, client, rng):
+        response = await client.get(
+            f"/api/documents/{self._document(rng)}/summary",
+            headers=self._auth(self.fixture.tokens[self._student(rng)])
+        )
+        return "GET /documents/{id}/summary", response
+
+    async def chat(self, client, rng):
+        student = self._student(rng)
+        document = self.fixture.documents[student % len(self.fixture.documents)]
+        response = await client.post(
+            f"/api/documents/{document.id}/chat",
+            json={"content": f"What does part {rng.randrange(100)} say?"},
+            headers=self._auth(self.fixture.tokens[student])
+        )
+        return "POST /documents/{id}/chat", response
+
+    async def telegram(self, client, rng):
+        telegram_id = self.fixture.telegram_ids[self._student(rng)]
+        update_id = next(self.update_ids)
+        update = {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": {"id": telegram_id, "is_bot": False, "first_name": "Bench"},
+                "text": f"Explain point {rng.randrange(100)} please",
+            },
+        }
+        response = await client.post("/api/telegram/webhook", json=update)
+        return "POST /telegram/webhook", response
+
+    async def whatsapp(self, client, rng):
+        phone = self.fixture.phones[self._student(rng)]
+        message_id = f"wamid.in.{next(self.update_ids)}"
+        payload = {
+            "object": "whatsapp_business_account",
+            "entry": [{
+                "id": "benchmark",
+                "changes": [{
+                    "field": "messages",
+                    "value": {
+                        "messaging_product": "whatsapp",
+                        "metadata": {"display_phone_number": "15550000000", "phone_number_id": "offline"},
+                        "contacts": [{"profile": {"name": "Bench"}, "wa_id": phone}],
+                        "messages": [{
+                            "id": message_id,
+                            "from": phone,
+                            "timestamp": str(int(time.time())),
+                            "type": "text",
+                            "text": {"body": f"What is topic {rng.randrange(100)} about?"},
+                        }],
+                    },
+                }],
+            }],
+        }
+        response = await client.post("/api/whatsapp/webhook", json=payload)
+        return "POST /whatsapp/webhook", response
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def drain(timeout: float) -> float:
+    """Wait for queued bot work and background processing to finish; returns the time it took"""
+    from services.telegram_bot import telegram_bot
+    from services.whatsapp_bot import whatsapp_bot
+    from utils.task_supervisor import task_supervisor
+
+    started = time.perf_counter()
+    deadline = started + timeout
+    pools = [telegram_bot.update_pool, whatsapp_bot.batch_pool, whatsapp_bot.message_pool]
+    while time.perf_counter() < deadline:
+        busy = any(pool.pending_count or pool.active for pool in pools)
+        background = any(info.kind == "document_processing" for info in task_supervisor.tasks.values())
+        if not busy and not background:
+            break
+        await asyncio.sleep(0.05)
+    return time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    configure_offline()
+    from main import app
+    from services.conversation_engine import conversation_engine
+    from services.telegram_bot import telegram_bot
+    from services.telegram_sender import telegram_sender
+    from services.whatsapp_bot import whatsapp_bot
+    from services.whatsapp_sender import whatsapp_sender
+    from services.ai_quota import ai_quota
+    from utils import database
+
+    model = FakeGeminiModel(args.model_latency_ms, args.tokens_per_sec)
+    install_fake_gemini(model)
+    ai_quota.enabled = args.ai_quota
+    telegram_api = FakeTelegramRequest(args.api_latency_ms)
+    whatsapp_sent = {}
+
+    async with app.router.lifespan_context(app):
+        # The lifespan built the bot without network access; finish its start offline
+        install_fake_telegram(telegram_bot.application.bot, telegram_api)
+        await telegram_bot.application.initialize()
+        await telegram_bot.application.start()
+        telegram_sender.start(telegram_bot.application.bot)
+        telegram_bot.update_pool.start()
+
+        whatsapp_sender.access_token = whatsapp_sender.phone_number_id = "offline"
+        await whatsapp_sender.client.aclose()
+        whatsapp_sender.client = httpx.AsyncClient(
+            transport=whatsapp_transport(args.api_latency_ms, whatsapp_sent),
+            base_url="https://graph.example.test/offline"
+        )
+
+        fixture = Fixture(args.users)
+        await fixture.create(database.async_session_factory)
+        scenarios = Scenarios(fixture)
+        weights = parse_mix(args.mix)
+
+        latencies = defaultdict(list)
+        statuses = defaultdict(Counter)
+        rng = random.Random(args.seed)
+        # Draw the whole sequence up front so every run sends the same traffic
+        plan = rng.choices(list(weights), weights=list(weights.values()), k=args.requests)
+        remaining = iter(plan)
+
+        try:
+            transport = httpx.ASGITransport(app=app)
+            # Outside DEBUG the app only accepts its production host
+            async with httpx.AsyncClient(transport=transport, base_url="http://yourdomain.com", timeout=60) as client:
+                async def virtual_user(worker: int):
+                    user_rng = random.Random(args.seed * 1000 + worker)
+                    for scenario in remaining:
+                        started = time.perf_counter()
+                        try:
+                            endpoint, response = await getattr(scenarios, scenario)(client, user_rng)
+                            status = response.status_code
+                        except Exception as e:
+                            endpoint, status = scenario, type(e).__name__
+                        latencies[endpoint].append(time.perf_counter() - started)
+                        statuses[endpoint][status] += 1
+
+                started = time.perf_counter()
+                await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+                elapsed = time.perf_counter() - started
+                drain_time = await drain(args.drain_timeout)
+        finally:
+            await fixture.delete(database.async_session_factory)
+
+        endpoints = {}
+        for endpoint, samples in sorted(latencies.items()):
+            errors = sum(n for status, n in statuses[endpoint].items() if not (isinstance(status, int) and status < 400))
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "requests_per_sec": round(len(samples) / elapsed, 2),
+                **percentiles(samples),
+                "status": {str(status): n for status, n in statuses[endpoint].items()},
+            }
+
+        return {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "config": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "mix": weights,
+                "users": args.users,
+                "model_latency_ms": args.model_latency_ms,
+                "tokens_per_sec": args.tokens_per_sec,
+                "api_latency_ms": args.api_latency_ms,
+                "seed": args.seed,
+            },
+            "elapsed_sec": round(elapsed, 3),
+            "requests_per_sec": round(args.requests / elapsed, 2),
+            "drain_sec": round(drain_time, 3),
+            "endpoints": endpoints,
+            "telegram_updates": telegram_bot.update_pool.stats(),
+            "whatsapp": whatsapp_bot.stats(),
+            "conversation": conversation_engine.stats(),
+            "fakes": {
+                "gemini_calls": model.calls,
+                "gemini_streamed_calls": model.streamed_calls,
+                "telegram_api_calls": telegram_api.calls,
+                "whatsapp_messages_sent": whatsapp_sent.get("messages", 0),
+            },
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=150.0)
+    parser.add_argument("--api-latency-ms", type=float, default=40.0)
+    parser.add_argument("--ai-quota", action="store_true", help="Keep per-user AI quotas on (off by default)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Request throughput with logging off, synchronous and queued
+
+Drives a small FastAPI app in-process (httpx ASGITransport, no sockets)
+whose handler logs like the WhatsApp webhook does: a few INFO lines per
+request, one of them with a large payload. Each mode runs the same load:
+
+- off: no sinks
+- sync: the previous setup, loguru formatting and writing inline
+- queued: configure_logging(), records handed to the writer thread
+
+The output stream discards everything but can be made slow per write
+(--write-latency-ms) to stand in for a blocked stdout pipe, and --storm
+adds that many extra records per request. The queued mode applies the
+per-logger rate limit (--rate-limit, 0 to keep every record). Needs no
+database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_logging.py [--requests N] [--concurrency C]
+       [--lines L] [--storm S] [--write-latency-ms W] [--rate-limit R]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import httpx
+from fastapi import FastAPI
+from loguru import logger
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from core.config import settings
+from middleware.request_context import RequestContextMiddleware
+from utils.log_pipeline import configure_logging
+
+OLD_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+
+
+class SlowStream:
+    """Discards output, sleeping per write like a full pipe would block"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.devnull = open(os.devnull, "w")
+        self.writes = 0
+
+    def write(self, text: str):
+        self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.devnull.write(text)
+
+    def flush(self):
+        self.devnull.flush()
+
+
+def build_app(lines: int, storm: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+    payload = {"entry": [{"changes": [{"value": {"messages": [{"text": {"body": "x" * 4000}}]}}]}]}
+
+    @app.post("/webhook")
+    async def webhook():
+        logger.info(f"Received webhook: {payload}")
+        for i in range(lines - 1):
+            logger.info(f"Processing message {i}")
+        for i in range(storm):
+            logger.info(f"Storm record {i}")
+        return {"status": "ok"}
+
+    return app
+
+
+async def run_load(app: FastAPI, requests: int, concurrency: int) -> dict:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.post("/webhook")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def main(args) -> dict:
+    app = build_app(args.lines, args.storm)
+    latency = args.write_latency_ms / 1000
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "records_per_request": args.lines + args.storm,
+        "write_latency_ms": args.write_latency_ms,
+        "modes": {},
+    }
+
+    logger.remove()
+    report["modes"]["off"] = asyncio.run(run_load(app, args.requests, args.concurrency))
+
+    stream = SlowStream(latency)
+    logger.remove()
+    logger.add(stream, format=OLD_FORMAT, level="INFO")
+    report["modes"]["sync"] = asyncio.run(run_load(app, args.requests, args.concurrency))
+    report["modes"]["sync"]["writes"] = stream.writes
+
+    stream = SlowStream(latency)
+    sink = configure_logging(stream)
+    report["modes"]["queued"] = asyncio.run(run_load(app, args.requests, args.concurrency))
+    sink.stop()
+    report["modes"]["queued"].update(sink.stats(), writes=stream.writes)
+    logger.remove()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--storm", type=int, default=0)
+    parser.add_argument("--write-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=settings.LOG_RATE_LIMIT_PER_SECOND)
+    args = parser.parse_args()
+    settings.LOG_RATE_LIMIT_PER_SECOND = args.rate_limit
+    settings.LOG_LEVEL = "INFO"
+    settings.DEBUG = False
+    print(json.dumps(main(args), indent=2))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Per-check cost of the GCRA rate limiter
+
+Measures the in-memory backend (hot key and many distinct keys) and, when
+REDIS_URL is set, the shared Redis backend.
+
+Needs no database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_rate_limiter.py [--checks N] [--keys K]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from utils.rate_limiter import (
+    RateLimiter, InMemoryRateLimitBackend, RedisRateLimitBackend
+)
+
+
+async def run_checks(limiter: RateLimiter, checks: int, keys: int) -> float:
+    """Run checks spread over `keys` identifiers, return µs per check"""
+    identifiers = [f"10.0.{i // 256}.{i % 256}" for i in range(keys)]
+    start = time.perf_counter()
+    for i in range(checks):
+        await limiter.check(identifiers[i % keys])
+    return (time.perf_counter() - start) / checks * 1_000_000
+
+
+async def main(checks: int, keys: int):
+    print("In-memory backend")
+    limiter = RateLimiter(max_requests=60, backend=InMemoryRateLimitBackend())
+    print(f"  hot key:            {await run_checks(limiter, checks, 1):8.2f} µs/check")
+
+    tracemalloc.start()
+    limiter = RateLimiter(max_requests=60, backend=InMemoryRateLimitBackend())
+    per_check = await run_checks(limiter, checks, keys)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {keys} keys:       {per_check:8.2f} µs/check "
+          f"({len(limiter.backend.tats)} live keys, {current / 1024:.0f} KiB)")
+
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        print("Redis backend")
+        import redis.asyncio as redis
+
+        client = redis.from_url(redis_url)
+        backend = RedisRateLimitBackend(client, prefix="bench:ratelimit:")
+        limiter = RateLimiter(max_requests=60, backend=backend)
+        print(f"  {keys} keys:       {await run_checks(limiter, checks // 10, keys):8.2f} µs/check")
+        await client.close()
+    else:
+        print("Redis backend: skipped (REDIS_URL not set)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.checks, args.keys))
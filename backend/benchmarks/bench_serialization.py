@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Serialization micro-benchmarks for API response payloads
+
+Compares the stdlib JSONResponse path (validate + jsonable_encoder + json.dumps)
+with the orjson default response class and with pre-encoded cached artifacts.
+
+Usage: python benchmarks/bench_serialization.py [--number N] [--json]
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from schemas.document import DocumentListResponse, ChatSessionResponse
+from utils.responses import encode_json_artifact
+
+
+def make_document_list(count: int = 100) -> dict:
+    """Synthetic DocumentListResponse payload"""
+    now = datetime.utcnow()
+    documents = [
+        {
+            "id": uuid.uuid4(),
+            "uploaded_by": uuid.uuid4(),
+            "original_filename": f"lecture_notes_{i}.pdf",
+            "file_path": f"/app/uploads/{i}.pdf",
+            "file_size": 1024 * (i + 1),
+            "mime_type": "application/pdf",
+            "status": "processed",
+            "file_metadata": {"word_count": 1200 + i, "character_count": 8000 + i,
+                              "extraction_successful": True},
+            "created_at": now - timedelta(minutes=i),
+            "processed_at": now,
+        }
+        for i in range(count)
+    ]
+    return {"documents": documents, "total": count, "page": 1, "per_page": count}
+
+
+def make_chat_session(messages: int = 200) -> dict:
+    """Synthetic ChatSessionResponse payload with a long history"""
+    now = datetime.utcnow()
+    return {
+        "id": uuid.uuid4(),
+        "document_id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "session_name": "Chat with lecture_notes.pdf",
+        "created_at": now,
+        "updated_at": now,
+        "messages": [
+            {
+                "id": uuid.uuid4(),
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "Explain the second law of thermodynamics in simple terms. " * 8,
+                "message_metadata": {"model_used": "gemini-2.0-flash"},
+                "created_at": now + timedelta(seconds=i),
+            }
+            for i in range(messages)
+        ],
+    }
+
+
+def make_mind_map(depth: int = 4, breadth: int = 5) -> dict:
+    """Synthetic mind map tree"""
+    def node(level: int, path: str) -> dict:
+        if level == depth:
+            return {"name": f"Detail {path}"}
+        return {
+            "name": f"Topic {path}",
+            "children": [node(level + 1, f"{path}.{i}") for i in range(breadth)],
+        }
+    return {"title": "Thermodynamics", "children": node(1, "1")["children"]}
+
+
+def bench(label: str, func, number: int, out=sys.stdout) -> dict:
+    """Time a callable and return a result record"""
+    total = min(timeit.repeat(func, number=number, repeat=3))
+    per_op_us = total / number * 1_000_000
+    print(f"  {label:<40} {per_op_us:>10.1f} µs/op  {number / total:>10.0f} ops/s", file=out)
+    return {"case": label, "us_per_op": round(per_op_us, 2), "ops_per_sec": round(number / total)}
+
+
+def run(number: int, out=sys.stdout) -> list:
+    """Run every case, printing progress to out"""
+    results = []
+
+    doc_list = make_document_list()
+    print("DocumentListResponse (100 documents)", file=out)
+    results.append(bench(
+        "document_list/stdlib",
+        lambda: json.dumps(jsonable_encoder(DocumentListResponse(**doc_list))).encode(),
+        number, out,
+    ))
+    results.append(bench(
+        "document_list/orjson",
+        lambda: orjson.dumps(DocumentListResponse(**doc_list).model_dump(mode="json")),
+        number, out,
+    ))
+
+    session = make_chat_session()
+    print("ChatSessionResponse (200 messages)", file=out)
+    results.append(bench(
+        "chat_session/stdlib",
+        lambda: json.dumps(jsonable_encoder(ChatSessionResponse(**session))).encode(),
+        number, out,
+    ))
+    results.append(bench(
+        "chat_session/orjson",
+        lambda: orjson.dumps(ChatSessionResponse(**session).model_dump(mode="json")),
+        number, out,
+    ))
+
+    mind_map = make_mind_map()
+    # What Postgres hands back for cast(cached_mind_map AS text)
+    mind_map_text = json.dumps(mind_map)
+    print("Mind map (depth 4, breadth 5)", file=out)
+    results.append(bench(
+        "mind_map/stdlib",
+        lambda: json.dumps(jsonable_encoder({"mind_map": json.loads(mind_map_text),
+                                             "success": True})).encode(),
+        number, out,
+    ))
+    results.append(bench(
+        "mind_map/orjson",
+        lambda: orjson.dumps({"mind_map": orjson.loads(mind_map_text), "success": True}),
+        number, out,
+    ))
+    results.append(bench(
+        "mind_map/pre_encoded",
+        lambda: encode_json_artifact("mind_map", mind_map_text),
+        number, out,
+    ))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="iterations per case")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    # With --json stdout carries only the report, so it can be piped into a JSON parser
+    results = run(args.number, out=sys.stderr if args.json else sys.stdout)
+    if args.json:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for the Telegram update worker pool
+
+Replays a synthetic webhook stream (many chats, bursts per chat, a share of
+redeliveries) through KeyedWorkerPool with a handler that simulates DB and
+Gemini latency, then reports updates/s and verifies per-chat ordering.
+
+Usage: python benchmarks/bench_telegram_replay.py [--updates N] [--chats C]
+       [--workers W] [--latency-ms L] [--duplicate-rate R]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils.keyed_worker_pool import KeyedWorkerPool, QueueFullError
+
+
+def make_stream(updates: int, chats: int, duplicate_rate: float, seed: int = 42) -> list:
+    """Synthetic (chat_id, update_id) stream with redeliveries"""
+    rng = random.Random(seed)
+    stream = []
+    for update_id in range(updates):
+        chat_id = rng.randrange(chats)
+        stream.append((chat_id, update_id))
+        if rng.random() < duplicate_rate:
+            stream.append((chat_id, update_id))
+    return stream
+
+
+async def replay(args) -> dict:
+    seen_order = defaultdict(list)
+
+    async def handler(item):
+        chat_id, update_id = item
+        await asyncio.sleep(args.latency_ms / 1000)
+        seen_order[chat_id].append(update_id)
+
+    pool = KeyedWorkerPool(
+        handler,
+        name="replay",
+        workers=args.workers,
+        max_pending=args.updates * 2
+    )
+    pool.start()
+
+    stream = make_stream(args.updates, args.chats, args.duplicate_rate)
+    start = time.perf_counter()
+    for chat_id, update_id in stream:
+        try:
+            pool.submit(chat_id, (chat_id, update_id), item_id=update_id)
+        except QueueFullError:
+            pass
+    ack_time = time.perf_counter() - start
+
+    await pool.ready.join()
+    elapsed = time.perf_counter() - start
+    await pool.stop()
+
+    ordered = all(ids == sorted(ids) for ids in seen_order.values())
+    stats = pool.stats()
+    return {
+        "updates": args.updates,
+        "chats": args.chats,
+        "workers": args.workers,
+        "handler_latency_ms": args.latency_ms,
+        "enqueue_us_per_update": round(ack_time / len(stream) * 1_000_000, 2),
+        "updates_per_sec": round(stats["processed"] / elapsed, 1),
+        "elapsed_sec": round(elapsed, 3),
+        "per_chat_ordering": ordered,
+        **stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args))
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["per_chat_ordering"] else 1)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Outbound Telegram scheduler benchmark against a local fake Bot API
+
+The fake bot enforces Telegram-like limits (global msgs/s and per-chat
+spacing) by raising RetryAfter, and adds network latency. The run mixes
+interactive replies, bulk broadcast sends and bursts of edits to the same
+message, then reports queue latency, throughput, flood waits and coalescing.
+
+Needs no database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_telegram_sender.py [--chats C] [--bulk N]
+       [--interactive N] [--edits N] [--latency-ms L]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from telegram.error import RetryAfter
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from services.telegram_sender import TelegramSender, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+
+class FakeBotAPI:
+    """Stand-in for telegram.Bot that enforces flood limits like the real API"""
+
+    def __init__(self, latency_ms: float, global_per_sec: int = 30, chat_gap: float = 1.0):
+        self.latency = latency_ms / 1000
+        self.global_per_sec = global_per_sec
+        self.chat_gap = chat_gap
+        self.recent = deque()
+        self.last_per_chat = {}
+        self.calls = 0
+        self.flood_errors = 0
+
+    async def _call(self, chat_id: int):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self.recent and self.recent[0] < now - 1:
+            self.recent.popleft()
+        last = self.last_per_chat.get(chat_id, 0)
+        # Allow a small per-chat burst like the real API
+        if len(self.recent) >= self.global_per_sec or now - last < self.chat_gap / 4:
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        self.recent.append(now)
+        self.last_per_chat[chat_id] = now
+        self.calls += 1
+        return {"chat_id": chat_id, "message_id": self.calls}
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        return await self._call(chat_id)
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs):
+        return await self._call(chat_id)
+
+
+async def run(args) -> dict:
+    bot = FakeBotAPI(args.latency_ms)
+    sender = TelegramSender()
+    sender.start(bot)
+
+    interactive_latencies = []
+
+    async def interactive(chat_id: int):
+        start = time.monotonic()
+        await sender.send_message(chat_id, "answer", priority=PRIORITY_INTERACTIVE)
+        interactive_latencies.append(time.monotonic() - start)
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(sender.send_message(i % args.chats, "announcement", priority=PRIORITY_BULK))
+        for i in range(args.bulk)
+    ]
+    tasks += [asyncio.create_task(interactive(10_000 + i))
+              for i in range(args.interactive)]
+    tasks += [
+        asyncio.create_task(sender.edit_message_text(20_000, 1, f"partial answer {i}"))
+        for i in range(args.edits)
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await sender.stop()
+
+    interactive_latencies.sort()
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "requested": len(tasks),
+        "errors": sum(1 for r in results if isinstance(r, Exception)),
+        "api_calls": bot.calls,
+        "api_flood_errors": bot.flood_errors,
+        "interactive_p50_ms": round(interactive_latencies[len(interactive_latencies) // 2] * 1000, 1)
+        if interactive_latencies else None,
+        **sender.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--bulk", type=int, default=300)
+    parser.add_argument("--interactive", type=int, default=50)
+    parser.add_argument("--edits", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
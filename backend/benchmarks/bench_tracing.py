@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tracing overhead on the document chat path
+
+Measures the CPU cost of a span with tracing disabled, in an unsampled
+trace and in a sampled trace (exporter running, writing JSON lines to a
+temporary file), then replays a simulated chat turn with the same span
+layout as the real one (request, auth, context queries, model call,
+persist) and reports the overhead as a share of turn latency against the
+2% budget.
+
+Needs no database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_tracing.py [--spans N] [--turns T]
+       [--db-ms D] [--model-ms M] [--sample-rate R]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from core.config import settings
+from utils.tracing import Tracer
+
+OVERHEAD_BUDGET = 0.02
+
+
+def make_tracer(enabled: bool, sample_rate: float) -> Tracer:
+    tracer = Tracer()
+    tracer.enabled = enabled
+    tracer.sample_rate = sample_rate
+    tracer.start()
+    return tracer
+
+
+def span_cost_us(tracer: Tracer, spans: int) -> float:
+    """Average cost of one child span inside a trace, in microseconds"""
+    with tracer.trace("bench"):
+        start = time.perf_counter()
+        for i in range(spans):
+            with tracer.span("db.query", statement="SELECT 1") as span:
+                span.set_attribute("db.rows", i)
+        elapsed = time.perf_counter() - start
+    return elapsed / spans * 1_000_000
+
+
+async def chat_turn(tracer: Tracer, db: float, model: float):
+    """Span layout of one REST chat turn, with simulated I/O"""
+    with tracer.trace("HTTP POST"):
+        with tracer.span("auth.current_user"):
+            with tracer.span("db.query"):
+                await asyncio.sleep(db)
+        with tracer.span("chat.context"):
+            for _ in range(3):
+                with tracer.span("db.query"):
+                    await asyncio.sleep(db)
+        with tracer.span("chat.model"):
+            with tracer.span("gemini.generate"):
+                await asyncio.sleep(model)
+        with tracer.span("chat.persist"):
+            with tracer.span("db.query"):
+                await asyncio.sleep(db)
+
+
+async def turn_latency(tracer: Tracer, turns: int, db: float, model: float) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        await chat_turn(tracer, db, model)
+    return (time.perf_counter() - start) / turns
+
+
+def main(args) -> dict:
+    settings.TRACE_EXPORT_PATH = str(Path(tempfile.mkdtemp()) / "traces.jsonl")
+    settings.TRACE_EXPORT_URL = None
+    db, model = args.db_ms / 1000, args.model_ms / 1000
+
+    modes = {
+        "disabled": make_tracer(False, 0.0),
+        "unsampled": make_tracer(True, 0.0),
+        "sampled": make_tracer(True, 1.0),
+        "configured": make_tracer(True, args.sample_rate),
+    }
+
+    report = {"sample_rate": args.sample_rate, "span_cost_us": {}, "turn": {}}
+    for name, tracer in modes.items():
+        report["span_cost_us"][name] = round(span_cost_us(tracer, args.spans), 3)
+
+    baseline = asyncio.run(turn_latency(modes["disabled"], args.turns, db, model))
+    report["turn"]["baseline_ms"] = round(baseline * 1000, 3)
+    # 10 spans per simulated turn; CPU cost relative to the turn is what the loop loses
+    spans_per_turn = 10
+    for name in ("unsampled", "sampled", "configured"):
+        latency = asyncio.run(turn_latency(modes[name], args.turns, db, model))
+        cpu_share = spans_per_turn * report["span_cost_us"][name] / 1_000_000 / baseline
+        report["turn"][name] = {
+            "latency_ms": round(latency * 1000, 3),
+            "cpu_overhead_pct": round(cpu_share * 100, 4),
+            "within_budget": cpu_share < OVERHEAD_BUDGET,
+        }
+
+    for tracer in modes.values():
+        tracer.stop()
+    report["exporter"] = modes["sampled"].exporter.stats()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spans", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--db-ms", type=float, default=1.0)
+    parser.add_argument("--model-ms", type=float, default=20.0)
+    parser.add_argument("--sample-rate", type=float, default=settings.TRACE_SAMPLE_RATE)
+    args = parser.parse_args()
+    print(json.dumps(main(args), indent=2))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+WhatsApp sender throughput benchmark against a local mock Graph API server
+
+Starts an in-process HTTP/1.1 server that speaks enough of the Cloud API
+/messages endpoint (with configurable latency, 429 throttling and 5xx
+errors), then sends the same workload through the pooled WhatsAppSender and
+through a naive client-per-send baseline, and reports messages/s and the
+number of TCP connections each opened.
+
+Needs no database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_whatsapp_sender.py [--messages N]
+       [--recipients R] [--latency-ms L] [--throttle-rate T] [--error-rate E]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import httpx
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from core.config import settings
+
+
+class MockGraphAPI:
+    """Minimal keep-alive HTTP/1.1 server imitating POST /{version}/{phone_id}/messages"""
+
+    def __init__(self, latency_ms: float, throttle_rate: float, error_rate: float, seed: int = 42):
+        self.latency = latency_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def reset(self):
+        self.connections = self.requests = self.throttled = self.errors = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+                self.requests += 1
+
+                await asyncio.sleep(self.latency)
+                roll = self.rng.random()
+                extra = ""
+                if roll < self.throttle_rate:
+                    self.throttled += 1
+                    status, reason = 429, "Too Many Requests"
+                    payload = {"error": {"code": 130429, "message": "Rate limit hit"}}
+                    extra = "Retry-After: 0.05\r\n"
+                elif roll < self.throttle_rate + self.error_rate:
+                    self.errors += 1
+                    status, reason = 500, "Internal Server Error"
+                    payload = {"error": {"code": 1, "message": "Unknown error"}}
+                else:
+                    status, reason = 200, "OK"
+                    payload = {
+                        "messaging_product": "whatsapp",
+                        "contacts": [{"input": body.get("to"), "wa_id": body.get("to")}],
+                        "messages": [{"id": f"wamid.{self.requests}"}],
+                    }
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"{extra}\r\n".encode() + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_pooled(base_url: str, workload: list) -> dict:
+    from services.whatsapp_sender import WhatsAppSender
+
+    sender = WhatsAppSender(api_url=base_url, access_token="bench-token", phone_number_id="1234567890")
+    sender.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(sender.send_text(to, text) for to, text in workload),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    await sender.stop()
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "messages_per_sec": round(len(workload) / elapsed, 1),
+        "failed": sum(1 for r in results if isinstance(r, Exception)),
+        **sender.stats(),
+    }
+
+
+async def run_naive(base_url: str, workload: list) -> dict:
+    """Baseline: a fresh client (and connection) for every send, same concurrency bound"""
+    url = f"{base_url}/{settings.WHATSAPP_API_VERSION}/1234567890/messages"
+    semaphore = asyncio.Semaphore(settings.WHATSAPP_SEND_CONCURRENCY)
+
+    async def send(to: str, text: str):
+        async with semaphore:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(url, json={"messaging_product": "whatsapp", "to": to, "text": {"body": text}})
+                response.raise_for_status()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(send(to, text) for to, text in workload), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "messages_per_sec": round(len(workload) / elapsed, 1),
+        "failed": sum(1 for r in results if isinstance(r, Exception)),
+    }
+
+
+async def main(args) -> dict:
+    # Benchmark the client, not Meta's limits
+    settings.WHATSAPP_MESSAGES_PER_SECOND = 100_000
+    settings.WHATSAPP_RECIPIENT_MESSAGES_PER_SECOND = 1_000
+    settings.WHATSAPP_RECIPIENT_BURST = 100
+
+    api = MockGraphAPI(args.latency_ms, args.throttle_rate, args.error_rate)
+    server = await asyncio.start_server(api.handle, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    rng = random.Random(7)
+    workload = [(f"1555{rng.randrange(args.recipients):07d}", f"message {i}") for i in range(args.messages)]
+
+    report = {"messages": args.messages, "recipients": args.recipients}
+    async with server:
+        report["pooled"] = await run_pooled(base_url, workload)
+        report["pooled"].update(connections=api.connections, requests=api.requests,
+                                throttled=api.throttled, server_errors=api.errors)
+
+        api.reset()
+        api.throttle_rate = api.error_rate = 0.0
+        report["naive"] = await run_naive(base_url, workload)
+        report["naive"].update(connections=api.connections, requests=api.requests)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args)), indent=2))
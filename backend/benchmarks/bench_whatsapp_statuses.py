@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Burst benchmark for write-behind WhatsApp status tracking
+
+Feeds bursts of sent/delivered/read callbacks (shuffled, with redeliveries)
+into WhatsAppStatusTracker while a simulated database write takes a fixed
+time per batch, then reports ingest rate, coalescing and how many database
+round trips the burst cost.
+
+Needs no database: required settings that are unset get placeholders.
+
+Usage: python benchmarks/bench_whatsapp_statuses.py [--messages N]
+       [--rate EVENTS_PER_SEC] [--write-ms W] [--redelivery-rate R]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from offline_fakes import use_offline_environment
+
+use_offline_environment()
+
+from services.whatsapp_status_tracker import WhatsAppStatusTracker
+
+
+class TimedTracker(WhatsAppStatusTracker):
+    """Tracker whose database write is a fixed-latency stand-in"""
+
+    def __init__(self, write_ms: float):
+        super().__init__()
+        self.write_latency = write_ms / 1000
+        self.round_trips = 0
+        self.final = {}
+
+    async def _write(self, rows):
+        self.round_trips += 1
+        await asyncio.sleep(self.write_latency)
+        for row in rows:
+            current = self.final.get(row["message_id"])
+            if current is None or (row["status_rank"], row["status_at"]) > (current["status_rank"], current["status_at"]):
+                self.final[row["message_id"]] = row
+
+
+def make_events(messages: int, redelivery_rate: float, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    now = int(time.time())
+    events = []
+    for i in range(messages):
+        for offset, status in enumerate(("sent", "delivered", "read")):
+            event = {"id": f"wamid.{i}", "status": status, "timestamp": str(now + offset), "recipient_id": f"1555{i % 9999:07d}"}
+            events.append(event)
+            if rng.random() < redelivery_rate:
+                events.append(dict(event))
+    # Webhooks for one message do not arrive in lifecycle order
+    rng.shuffle(events)
+    return events
+
+
+async def run(args) -> dict:
+    tracker = TimedTracker(args.write_ms)
+    tracker.start(db_session_factory=object())
+
+    events = make_events(args.messages, args.redelivery_rate)
+    chunk = max(1, args.rate // 100)  # deliver in 10ms slices
+    start = time.perf_counter()
+    ingest = 0.0
+    for i in range(0, len(events), chunk):
+        t0 = time.perf_counter()
+        for event in events[i:i + chunk]:
+            tracker.record(event)
+        ingest += time.perf_counter() - t0
+        await asyncio.sleep(0.01)
+    await tracker.stop()
+    elapsed = time.perf_counter() - start
+
+    stats = tracker.stats()
+    return {
+        "events": len(events),
+        "elapsed_sec": round(elapsed, 3),
+        "ingest_events_per_sec": round(len(events) / ingest) if ingest else None,
+        "db_round_trips": tracker.round_trips,
+        "events_per_round_trip": round(len(events) / max(1, tracker.round_trips), 1),
+        "all_read": all(row["status"] == "read" for row in tracker.final.values()),
+        **stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rate", type=int, default=5000)
+    parser.add_argument("--write-ms", type=float, default=20.0)
+    parser.add_argument("--redelivery-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
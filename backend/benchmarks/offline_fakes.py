@@ -0,0 +1,189 @@
+"""
+Deterministic offline stand-ins for the external APIs, for benchmarks and tests
+
+- FakeGeminiModel replaces the google.generativeai model behind
+  gemini_service, so the service's own path (quota, executor, metrics,
+  tracing, streaming) still runs. Latency is a fixed time to first token
+  plus the answer length over a token rate, and answers depend only on the
+  prompt.
+- FakeTelegramRequest is a python-telegram-bot transport answering Bot
+  API calls locally after a fixed latency.
+- whatsapp_transport() is an httpx transport answering Cloud API sends.
+- use_offline_environment() fills in the settings the app requires with
+  placeholders, for runs that never reach the database or Hasura.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+import zlib
+
+import httpx
+from telegram.request import BaseRequest
+
+WORDS = (
+    "the document explains concept section example definition theorem proof "
+    "student chapter summary question answer method result figure table"
+).split()
+
+MIND_MAP = {
+    "title": "Benchmark Document",
+    "children": [
+        {"name": f"Topic {i}", "children": [{"name": f"Detail {i}.{j}"} for j in range(3)]}
+        for i in range(4)
+    ],
+}
+
+
+# Required by core.config but never used without a database
+OFFLINE_ENVIRONMENT = {
+    "DATABASE_URL": "postgresql+asyncpg://localhost/unused",
+    "HASURA_GRAPHQL_ENDPOINT": "http://hasura.invalid/v1/graphql",
+    "HASURA_ADMIN_SECRET": "offline",
+    "SECRET_KEY": "offline-secret-key",
+}
+
+
+def use_offline_environment():
+    """Set placeholders for required settings that are not configured (call before importing settings)"""
+    for name, value in OFFLINE_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+
+class FakeUsage:
+    def __init__(self, total_token_count: int):
+        self.total_token_count = total_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel; blocking like the real client (runs in the executor)"""
+
+    def __init__(self, latency_ms: float = 300.0, tokens_per_sec: float = 150.0, answer_tokens: int = 120, chunks: int = 8):
+        self.latency = latency_ms / 1000
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.chunks = chunks
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.streamed_calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        if "mind map" in prompt:
+            return json.dumps(MIND_MAP)
+        seed = zlib.crc32(prompt.encode())
+        return " ".join(WORDS[(seed + i * 7) % len(WORDS)] for i in range(self.answer_tokens)) + "."
+
+    def _usage(self, prompt: str) -> FakeUsage:
+        return FakeUsage(len(prompt) // 4 + self.answer_tokens)
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        with self.lock:
+            self.calls += 1
+            self.streamed_calls += stream
+        answer = self._answer(prompt)
+        generation = self.answer_tokens / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        if stream:
+            return self._stream(prompt, answer, generation)
+        time.sleep(self.latency + generation)
+        return FakeResponse(answer, self._usage(prompt))
+
+    def _stream(self, prompt: str, answer: str, generation: float):
+        response = FakeStream(self._usage(prompt))
+        size = max(1, len(answer) // self.chunks)
+        parts = [answer[i:i + size] for i in range(0, len(answer), size)]
+
+        def chunks():
+            time.sleep(self.latency)
+            for part in parts:
+                time.sleep(generation / len(parts))
+                yield FakeResponse(part)
+
+        response.iterator = chunks()
+        return response
+
+
+class FakeStream:
+    """Iterable of chunks with usage_metadata, like a streamed GenerateContentResponse"""
+
+    def __init__(self, usage: FakeUsage):
+        self.usage_metadata = usage
+        self.iterator = iter(())
+
+    def __iter__(self):
+        return self.iterator
+
+
+def install_fake_gemini(model: FakeGeminiModel):
+    """Serve gemini_service from the fake instead of loading google.generativeai"""
+    from services.gemini_service import gemini_model, gemini_service
+    gemini_service.api_key = "offline-benchmark"
+    gemini_model.value = model
+    gemini_model.loaded = True
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Bot API transport answering every call locally after a fixed latency"""
+
+    def __init__(self, latency_ms: float = 40.0):
+        self.latency = latency_ms / 1000
+        self.message_ids = itertools.count(1)
+        self.calls = {}
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        parameters = request_data.parameters if request_data is not None else {}
+        await asyncio.sleep(self.latency)
+
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        elif endpoint in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": parameters.get("message_id") or next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(parameters.get("chat_id", 0)), "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def install_fake_telegram(bot, request: FakeTelegramRequest):
+    """Route a python-telegram-bot Bot's API calls to the fake (call before bot.initialize())"""
+    bot._request = (request, request)
+
+
+def whatsapp_transport(latency_ms: float = 60.0, sent: dict = None) -> httpx.MockTransport:
+    """Cloud API stand-in accepting every message send"""
+    latency = latency_ms / 1000
+    message_ids = itertools.count(1)
+    sent = sent if sent is not None else {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        sent["messages"] = sent.get("messages", 0) + 1
+        return httpx.Response(200, json={
+            "messaging_product": "whatsapp",
+            "messages": [{"id": f"wamid.benchmark.{next(message_ids)}"}],
+        })
+
+    return httpx.MockTransport(handler)
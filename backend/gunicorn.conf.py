@@ -1,6 +1,17 @@
 import os
+import shutil
 from core.config import settings
 
+# Multiprocess metrics: every worker writes its values to files in this
+# directory, and the master serves their aggregate on METRICS_PORT. Must be
+# set, and the directory exist, before the (preloaded) app imports
+# prometheus_client. Stale files from a previous run are wiped, or they
+# would be summed into the new totals.
+if settings.ENABLE_METRICS:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 # Server socket
 bind = f"{settings.HOST}:{settings.PORT}"
 backlog = 2048
@@ -11,6 +22,9 @@ worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
+# Time a stopping worker gets to drain background work and bot queues: every
+# drain budget, plus a margin for closing clients and pools
+graceful_timeout = settings.shutdown_drain_seconds + 10
 
 # Restart workers after this many requests
 max_requests = 1000
@@ -35,4 +49,27 @@ tmp_upload_dir = None
 
 # SSL (if needed)
 # keyfile = "/path/to/keyfile"
-# certfile = "/path/to/certfile"
\ No newline at end of file
+# certfile = "/path/to/certfile"
+
+
+def when_ready(server):
+    if settings.ENABLE_METRICS:
+        from utils.metrics import start_multiprocess_server
+        start_multiprocess_server(settings.METRICS_PORT)
+
+    # Shared read-only state (parser modules, tokenizer data) is loaded once
+    # here and inherited copy-on-write; clients and pools are per worker
+    if server.cfg.preload_app and settings.WARM_UP_ON_STARTUP:
+        from utils.lifecycle import lifecycle
+        lifecycle.preload()
+
+
+def post_fork(server, worker):
+    from utils.lifecycle import lifecycle
+    lifecycle.after_fork()
+
+
+def child_exit(server, worker):
+    if settings.ENABLE_METRICS:
+        from utils.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from loguru import logger
+import asyncio
+import hmac
+import os
+import threading
+import uuid
+
+from core.config import settings
+from models.user import User
+from schemas.user import UserAccessUpdate, UserAccessResponse
+from utils.auth import require_admin, invalidate_user
+from utils.database import get_db_session
+from utils.profiler import sampling_profiler, dump_tasks, ProfilerBusyError
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0),
+    hz: int = Query(settings.PROFILER_DEFAULT_HZ, ge=1, le=1000),
+    all_threads: bool = False,
+    current_user: User = Depends(require_admin)
+):
+    """Sample the serving worker's stacks and return them in collapsed-stack format (admin only).
+
+    Profiles whichever gunicorn worker handles the request (see X-Worker-Pid);
+    feed the output to flamegraph.pl or speedscope.
+    """
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS}"
+        )
+    
+    loop = asyncio.get_running_loop()
+    try:
+        samples = await asyncio.to_thread(
+            sampling_profiler.profile,
+            seconds,
+            hz,
+            loop,
+            threading.get_ident(),
+            all_threads
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return PlainTextResponse(
+        sampling_profiler.collapsed(samples),
+        headers={
+            "X-Worker-Pid": str(os.getpid()),
+            "X-Sample-Count": str(sampling_profiler.sample_count),
+        }
+    )
+
+
+@router.get("/tasks")
+async def list_tasks(
+    name: Optional[str] = None,
+    current_user: User = Depends(require_admin)
+):
+    """Dump the serving worker's asyncio tasks with their await chains (admin only)"""
+    tasks = dump_tasks(name)
+    return {
+        "pid": os.getpid(),
+        "count": len(tasks),
+        "tasks": tasks,
+    }
+
+
+@router.patch("/users/{user_id}", response_model=UserAccessResponse)
+async def update_user_access(
+    user_id: uuid.UUID,
+    update: UserAccessUpdate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(require_admin)
+):
+    """Change a user's role or deactivate them, effective immediately in every worker (admin only)"""
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if update.role is not None:
+        user.role = update.role.value
+    if update.is_active is not None:
+        user.is_active = update.is_active
+    await db.commit()
+    await db.refresh(user)
+    
+    await invalidate_user(user.id)
+    logger.info(f"Admin {current_user.id} updated user {user.id}: role={user.role}, is_active={user.is_active}")
+    return user
+
+
+@router.post("/hooks/users")
+async def user_changed_hook(
+    request: Request,
+    x_hasura_event_secret: Optional[str] = Header(None)
+):
+    """Hasura event trigger on the users table (update, delete): evict the user from the auth caches"""
+    if not settings.HASURA_EVENT_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_hasura_event_secret or not hmac.compare_digest(x_hasura_event_secret, settings.HASURA_EVENT_SECRET):
+        logger.warning("Invalid Hasura event secret")
+        raise HTTPException(status_code=403, detail="Invalid event secret")
+    
+    payload = await request.json()
+    data = payload.get("event", {}).get("data", {})
+    row = data.get("new") or data.get("old") or {}
+    if not row.get("id"):
+        raise HTTPException(status_code=400, detail="Event has no user id")
+    
+    await invalidate_user(row["id"])
+    return {"status": "ok"}
@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, update, and_, or_, func, cast, Text
 from typing import List, Optional
 from uuid import UUID
-import asyncio
+from datetime import datetime
 
 from utils.database import get_db_session
 from utils.auth import get_current_user
+from utils.http_cache import build_etag, etag_matches, artifact_cache_headers, not_modified_response
+from utils.responses import PreEncodedJSONResponse, encode_text_artifact, encode_json_artifact
 from models.user import User, UserRole
-from models.document import Document, DocumentChatSession, ChatMessage, DocumentStatus
+from models.document import Document, DocumentChatSession, DocumentStatus
 from schemas.document import (
     DocumentResponse, DocumentListResponse, ChatMessageCreate, 
     ChatResponse, ChatSessionResponse, DocumentSummaryResponse,
@@ -17,6 +19,8 @@ from schemas.document import (
 )
 from services.document_service import document_service
 from services.gemini_service import gemini_service
+from services.ai_quota import AIQuotaExceeded
+from services.conversation_engine import conversation_engine, ConversationError
 from core.config import settings
 
 router = APIRouter(prefix="/documents", tags=["documents"])
@@ -69,8 +73,9 @@ async def upload_document(
         await db.commit()
         await db.refresh(document)
         
-        # Start background processing with new database session
-        asyncio.create_task(document_service.process_document_async(str(document.id)))
+        # Process in the background; if this worker is shutting down the
+        # document stays 'uploaded' and another worker's requeue sweep takes it
+        document_service.schedule_processing(str(document.id))
         
         return document
         
@@ -164,95 +169,26 @@ async def chat_with_document(
     current_user: User = Depends(get_current_user)
 ):
     """Start or continue chat with document"""
-    # Get document
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    if document.status != DocumentStatus.processed:
-        raise HTTPException(status_code=400, detail="Document not ready for chat")
-    
-    # Check if user has access
-    if current_user.role == UserRole.STUDENT.value or document.uploaded_by == current_user.id:
-        # Students and document owners can chat
-        pass
-    else:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     try:
-        # Get or create chat session
-        session_result = await db.execute(
-            select(DocumentChatSession).where(
-                and_(
-                    DocumentChatSession.document_id == document_id,
-                    DocumentChatSession.user_id == current_user.id
-                )
-            )
-        )
-        session = session_result.scalar_one_or_none()
-        
-        if not session:
-            session = DocumentChatSession(
-                document_id=document_id,
-                user_id=current_user.id,
-                session_name=f"Chat with {document.original_filename}"
-            )
-            db.add(session)
-            await db.commit()
-            await db.refresh(session)
-        
-        # Save user message
-        user_message = ChatMessage(
-            session_id=session.id,
-            role="user",
-            content=message_data.content
-        )
-        db.add(user_message)
-        await db.commit()
-        await db.refresh(user_message)
-        
-        # Get chat history
-        history_result = await db.execute(
-            select(ChatMessage)
-            .where(ChatMessage.session_id == session.id)
-            .order_by(ChatMessage.created_at.desc())
-            .limit(20)
-        )
-        chat_history = [
-            {"role": msg.role, "content": msg.content} 
-            for msg in reversed(history_result.scalars().all()[:-1])  # Exclude current message
-        ]
-        
-        # Get AI response
-        ai_response_data = await gemini_service.chat_with_document(
-            document.processed_text,
+        turn = await conversation_engine.run_turn(
+            db,
+            document_id,
+            current_user,
             message_data.content,
-            chat_history
-        )
-        
-        # Save AI response
-        ai_message = ChatMessage(
-            session_id=session.id,
-            role="assistant",
-            content=ai_response_data["response"],
-            message_metadata={"model_used": ai_response_data.get("model_used", "unknown")}
-        )
-        db.add(ai_message)
-        await db.commit()
-        await db.refresh(ai_message)
-        
-        return ChatResponse(
-            message=user_message,
-            ai_response=ai_message
+            channel="web"
         )
-        
+    except ConversationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except AIQuotaExceeded:
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+    
+    return ChatResponse(
+        message=turn.user_message,
+        ai_response=turn.ai_message
+    )
 
 
 @router.get("/{document_id}/chat/sessions", response_model=List[ChatSessionResponse])
@@ -291,124 +227,227 @@ async def get_chat_sessions(
     return sessions
 
 
+# Cached AI artifacts: (content column, generated-at column) per artifact kind
+ARTIFACT_COLUMNS = {
+    "summary": (Document.cached_summary, Document.summary_generated_at),
+    "study_questions": (Document.cached_study_questions, Document.questions_generated_at),
+    "mind_map": (Document.cached_mind_map, Document.mind_map_generated_at),
+}
+
+
+async def _get_artifact_row(
+    db: AsyncSession,
+    document_id: UUID,
+    artifact: str,
+    with_content: bool = False
+):
+    """Fetch access fields, validators and optionally the cached artifact without loading the row"""
+    content_column, generated_column = ARTIFACT_COLUMNS[artifact]
+    columns = [
+        Document.status,
+        Document.uploaded_by,
+        generated_column.label("generated_at"),
+        func.md5(cast(content_column, Text)).label("digest"),
+    ]
+    if with_content:
+        # Read as text so JSONB trees come back pre-encoded instead of decoded
+        columns.append(cast(content_column, Text).label("content"))
+    
+    result = await db.execute(select(*columns).where(Document.id == document_id))
+    return result.first()
+
+
+def _require_processed(artifact, current_user: User):
+    """Access check for summary and study questions"""
+    if not artifact:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    if artifact.status != DocumentStatus.processed:
+        raise HTTPException(status_code=400, detail="Document not ready")
+
+
+def _require_mind_map_access(artifact, current_user: User):
+    """Access check for mind maps"""
+    if not artifact:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Students can only access processed documents from instructors or their own
+    if (current_user.role == UserRole.STUDENT.value and 
+        artifact.uploaded_by != current_user.id and 
+        artifact.status != DocumentStatus.processed):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    # Check if document is processed
+    if artifact.status != DocumentStatus.processed:
+        raise HTTPException(status_code=400, detail="Document not ready")
+
+
+async def _load_cached_artifact(
+    request: Request,
+    db: AsyncSession,
+    document_id: UUID,
+    artifact: str,
+    current_user: User,
+    check_access
+):
+    """Answer If-None-Match from validators only, otherwise load the cached artifact.
+
+    Returns (not_modified_response, None) on a match or (None, artifact_row) otherwise.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    
+    if if_none_match:
+        validators = await _get_artifact_row(db, document_id, artifact)
+        check_access(validators, current_user)
+        
+        if validators.generated_at and validators.digest:
+            etag = build_etag(validators.generated_at, validators.digest)
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag), None
+    
+    artifact_row = await _get_artifact_row(db, document_id, artifact, with_content=True)
+    check_access(artifact_row, current_user)
+    return None, artifact_row
+
+
+async def _get_processed_text(db: AsyncSession, document_id: UUID) -> Optional[str]:
+    """Load only the processed text needed to generate an artifact"""
+    result = await db.execute(
+        select(Document.processed_text).where(Document.id == document_id)
+    )
+    return result.scalar_one_or_none()
+
+
 @router.get("/{document_id}/summary", response_model=DocumentSummaryResponse)
 async def get_document_summary(
     document_id: UUID,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get AI-generated summary of document (cached if available)"""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
+    not_modified, artifact = await _load_cached_artifact(
+        request, db, document_id, "summary", current_user, _require_processed
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    if document.status != DocumentStatus.processed:
-        raise HTTPException(status_code=400, detail="Document not ready")
+    if not_modified:
+        return not_modified
     
     # Check if we have a cached summary
-    if document.cached_summary and document.summary_generated_at:
-        return DocumentSummaryResponse(
-            summary=document.cached_summary,
-            success=True
+    if artifact.content and artifact.generated_at:
+        return PreEncodedJSONResponse(
+            encode_text_artifact("summary", artifact.content),
+            headers=artifact_cache_headers(build_etag(artifact.generated_at, artifact.digest))
         )
     
     # Generate new summary and cache it
-    summary_data = await gemini_service.extract_document_summary(document.processed_text)
+    processed_text = await _get_processed_text(db, document_id)
+    summary_data = await gemini_service.extract_document_summary(
+        processed_text, user_id=current_user.id
+    )
     
     if summary_data["success"]:
         # Cache the summary
-        from datetime import datetime
-        document.cached_summary = summary_data["summary"]
-        document.summary_generated_at = datetime.utcnow()
+        await db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(
+                cached_summary=summary_data["summary"],
+                summary_generated_at=datetime.utcnow()
+            )
+        )
         await db.commit()
     
+    # Validators are served from the next request onwards
+    response.headers["Cache-Control"] = "no-cache"
     return DocumentSummaryResponse(**summary_data)
 
 
 @router.get("/{document_id}/study-questions", response_model=StudyQuestionsResponse)
 async def get_study_questions(
     document_id: UUID,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get AI-generated study questions for document (cached if available)"""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
+    not_modified, artifact = await _load_cached_artifact(
+        request, db, document_id, "study_questions", current_user, _require_processed
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    if document.status != DocumentStatus.processed:
-        raise HTTPException(status_code=400, detail="Document not ready")
+    if not_modified:
+        return not_modified
     
     # Check if we have cached study questions
-    if document.cached_study_questions and document.questions_generated_at:
-        return StudyQuestionsResponse(
-            questions=document.cached_study_questions,
-            success=True
+    if artifact.content and artifact.generated_at:
+        return PreEncodedJSONResponse(
+            encode_text_artifact("questions", artifact.content),
+            headers=artifact_cache_headers(build_etag(artifact.generated_at, artifact.digest))
         )
     
     # Generate new questions and cache them
-    questions_data = await gemini_service.suggest_study_questions(document.processed_text)
+    processed_text = await _get_processed_text(db, document_id)
+    questions_data = await gemini_service.suggest_study_questions(
+        processed_text, user_id=current_user.id
+    )
     
     if questions_data["success"]:
         # Cache the questions
-        from datetime import datetime
-        document.cached_study_questions = questions_data["questions"]
-        document.questions_generated_at = datetime.utcnow()
+        await db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(
+                cached_study_questions=questions_data["questions"],
+                questions_generated_at=datetime.utcnow()
+            )
+        )
         await db.commit()
     
+    response.headers["Cache-Control"] = "no-cache"
     return StudyQuestionsResponse(**questions_data)
 
 
 @router.get("/{document_id}/mind-map", response_model=dict)
 async def get_document_mind_map(
     document_id: UUID,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db_session),
     current_user: User = Depends(get_current_user)
 ):
     """Generate mind map for document (cached if available)"""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
+    not_modified, artifact = await _load_cached_artifact(
+        request, db, document_id, "mind_map", current_user, _require_mind_map_access
     )
-    document = result.scalar_one_or_none()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Students can only access processed documents from instructors or their own
-    if (current_user.role == UserRole.STUDENT.value and 
-        document.uploaded_by != current_user.id and 
-        document.status != DocumentStatus.processed):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Check if document is processed
-    if document.status != DocumentStatus.processed:
-        raise HTTPException(status_code=400, detail="Document not ready")
+    if not_modified:
+        return not_modified
     
     # Check if we have a cached mind map
-    if document.cached_mind_map and document.mind_map_generated_at:
-        return {
-            "mind_map": document.cached_mind_map,
-            "success": True
-        }
+    if artifact.content and artifact.generated_at:
+        return PreEncodedJSONResponse(
+            encode_json_artifact("mind_map", artifact.content),
+            headers=artifact_cache_headers(build_etag(artifact.generated_at, artifact.digest))
+        )
     
     # Generate new mind map and cache it
-    mind_map_data = await gemini_service.generate_mind_map(document.processed_text)
+    processed_text = await _get_processed_text(db, document_id)
+    mind_map_data = await gemini_service.generate_mind_map(
+        processed_text, user_id=current_user.id
+    )
     
     if mind_map_data["success"]:
         # Cache the mind map
-        from datetime import datetime
-        document.cached_mind_map = mind_map_data["mind_map"]
-        document.mind_map_generated_at = datetime.utcnow()
+        await db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(
+                cached_mind_map=mind_map_data["mind_map"],
+                mind_map_generated_at=datetime.utcnow()
+            )
+        )
         await db.commit()
     
+    response.headers["Cache-Control"] = "no-cache"
     return mind_map_data
 
 
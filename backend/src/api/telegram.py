@@ -10,7 +10,10 @@ from core.config import settings
 from models.telegram import TelegramUser
 from models.user import User
 from schemas.telegram import TelegramLinkRequest, TelegramLinkResponse, TelegramWebhookData
+from services.chat_context_store import chat_context_store
+from services.linked_identity_cache import linked_identity_cache
 from services.telegram_bot import telegram_bot
+from utils.keyed_worker_pool import QueueFullError
 from utils.database import get_db_session
 from utils.auth import get_current_user
 
@@ -20,10 +23,9 @@ router = APIRouter(prefix="/telegram", tags=["telegram"])
 @router.post("/webhook")
 async def telegram_webhook(
     request: Request,
-    x_telegram_bot_api_secret_token: Optional[str] = Header(None),
-    db: AsyncSession = Depends(get_db_session)
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
 ):
-    """Handle Telegram webhook updates"""
+    """Handle Telegram webhook updates (acknowledged immediately, processed by the update pool)"""
     
     # Verify webhook secret if configured
     if settings.TELEGRAM_WEBHOOK_SECRET:
@@ -33,8 +35,16 @@ async def telegram_webhook(
     
     try:
         update_data = await request.json()
-        await telegram_bot.process_webhook_update(update_data)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid update payload")
+    
+    try:
+        telegram_bot.enqueue_webhook_update(update_data)
         return JSONResponse({"status": "ok"})
+    except QueueFullError as e:
+        # Telegram redelivers later; shedding here keeps the queue bounded
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Busy, retry later")
     except Exception as e:
         logger.error(f"Error processing webhook: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -129,6 +139,7 @@ async def link_telegram_account(
     # REMOVED: This block is no longer needed
     
     await db.commit()
+    linked_identity_cache.invalidate("telegram", telegram_user.telegram_id)
     
     logger.info(f"Successfully linked user {current_user.email} with Telegram {telegram_user.telegram_id}")
     
@@ -176,6 +187,8 @@ async def unlink_telegram_account(
     # REMOVED: This block is no longer needed
     
     await db.commit()
+    linked_identity_cache.invalidate("telegram", telegram_user.telegram_id)
+    await chat_context_store.clear(telegram_user.telegram_id)
     
     logger.info(f"Successfully unlinked user {current_user.email} from Telegram {telegram_user.telegram_id}")
     
@@ -17,8 +17,15 @@ from schemas.whatsapp import (
     WhatsAppUserResponse,
     WhatsAppSendMessageRequest,
     WhatsAppSendMessageResponse,
+    WhatsAppBroadcastRequest,
+    WhatsAppBroadcastResponse,
     WhatsAppVerificationRequest
 )
+from services.chat_context_store import whatsapp_chat_context
+from services.linked_identity_cache import linked_identity_cache
+from services.whatsapp_bot import whatsapp_bot
+from services.whatsapp_sender import whatsapp_sender
+from utils.keyed_worker_pool import QueueFullError
 from utils.database import get_db_session
 from utils.auth import get_current_user
 
@@ -42,256 +49,38 @@ async def verify_webhook(
 
 
 @router.post("/webhook")
-async def whatsapp_webhook(
-    request: Request,
-    db: AsyncSession = Depends(get_db_session)
-):
-    """Handle WhatsApp webhook updates"""
+async def whatsapp_webhook(request: Request):
+    """Handle WhatsApp webhook updates (acknowledged immediately, processed in the background)"""
+    
+    # Validate webhook signature if configured
+    if settings.WHATSAPP_WEBHOOK_SECRET:
+        signature = request.headers.get("x-hub-signature-256")
+        if not signature:
+            logger.warning("Missing webhook signature")
+            raise HTTPException(status_code=403, detail="Missing signature")
+        
+        # TODO: Implement signature verification
+        # This should be implemented by the WhatsApp developer
     
+    # Parse webhook data
     try:
-        webhook_data = await request.json()
-        logger.info(f"Received WhatsApp webhook: {webhook_data}")
-        
-        # Validate webhook signature if configured
-        if settings.WHATSAPP_WEBHOOK_SECRET:
-            signature = request.headers.get("x-hub-signature-256")
-            if not signature:
-                logger.warning("Missing webhook signature")
-                raise HTTPException(status_code=403, detail="Missing signature")
-            
-            # TODO: Implement signature verification
-            # This should be implemented by the WhatsApp developer
-        
-        # Parse webhook data
-        try:
-            parsed_data = WhatsAppWebhookData(**webhook_data)
-        except Exception as e:
-            logger.error(f"Failed to parse webhook data: {str(e)}")
-            raise HTTPException(status_code=400, detail="Invalid webhook data format")
-        
-        # Process webhook entries
-        for entry in parsed_data.entry:
-            for change in entry.changes:
-                if change.get("field") == "messages":
-                    value = change.get("value", {})
-                    
-                    # Process incoming messages
-                    messages = value.get("messages", [])
-                    for message in messages:
-                        await process_whatsapp_message(message, db)
-                    
-                    # Process message statuses
-                    statuses = value.get("statuses", [])
-                    for status in statuses:
-                        await process_whatsapp_status(status, db)
-        
+        parsed_data = WhatsAppWebhookData(**(await request.json()))
+    except Exception as e:
+        logger.error(f"Failed to parse webhook data: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid webhook data format")
+    
+    try:
+        whatsapp_bot.enqueue_webhook(parsed_data)
         return JSONResponse({"status": "ok"})
-        
+    except QueueFullError as e:
+        # Meta redelivers later; shedding here keeps the queue bounded
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Busy, retry later")
     except Exception as e:
         logger.error(f"Error processing WhatsApp webhook: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-async def process_whatsapp_message(message: dict, db: AsyncSession):
-    """Process incoming WhatsApp message"""
-    
-    phone_number = message.get("from")
-    message_type = message.get("type")
-    message_id = message.get("id")
-    
-    logger.info(f"Processing message {message_id} from {phone_number} of type {message_type}")
-    
-    # Get or create WhatsApp user
-    result = await db.execute(
-        select(WhatsAppUser).where(WhatsAppUser.whatsapp_phone == phone_number)
-    )
-    whatsapp_user = result.scalar_one_or_none()
-    
-    if not whatsapp_user:
-        # Create new WhatsApp user
-        whatsapp_user = WhatsAppUser(
-            whatsapp_phone=phone_number,
-            whatsapp_name=message.get("profile", {}).get("name")
-        )
-        db.add(whatsapp_user)
-        await db.commit()
-        await db.refresh(whatsapp_user)
-    
-    # Process different message types
-    if message_type == "text":
-        text_content = message.get("text", {}).get("body", "").strip().lower()
-        
-        if text_content in ["/start", "start", "hi", "hello"]:
-            await send_welcome_message(phone_number)
-        elif text_content in ["/link", "link"]:
-            await handle_link_command(whatsapp_user, db)
-        elif text_content in ["/status", "status"]:
-            await handle_status_command(whatsapp_user, db)
-        elif text_content in ["/unlink", "unlink"]:
-            await handle_unlink_command(whatsapp_user, db)
-        else:
-            await send_help_message(phone_number)
-
-
-async def process_whatsapp_status(status: dict, db: AsyncSession):
-    """Process WhatsApp message status update"""
-    
-    message_id = status.get("id")
-    status_type = status.get("status")
-    
-    logger.info(f"Message {message_id} status: {status_type}")
-    
-    # TODO: Implement status tracking if needed
-    # This can be used for delivery confirmations, read receipts, etc.
-
-
-async def send_welcome_message(phone_number: str):
-    """Send welcome message to WhatsApp user"""
-    
-    message = (
-        "🎓 Welcome to YeetBitz Platform!\n\n"
-        "I can help you take tests and access your study materials.\n\n"
-        "Available commands:\n"
-        "• Send 'link' - Link your account\n"
-        "• Send 'status' - Check linking status\n" 
-        "• Send 'unlink' - Unlink your account\n\n"
-        "To get started, please link your YeeBitz account by sending 'link'"
-    )
-    
-    await send_whatsapp_message(phone_number, message)
-
-
-async def handle_link_command(whatsapp_user: WhatsAppUser, db: AsyncSession):
-    """Handle link command from WhatsApp"""
-    
-    if whatsapp_user.is_linked:
-        message = (
-            "✅ Your account is already linked!\n"
-            "Send 'status' to view details or 'unlink' to disconnect."
-        )
-        await send_whatsapp_message(whatsapp_user.whatsapp_phone, message)
-        return
-    
-    # Generate link token (implement this similar to Telegram)
-    import secrets
-    import string
-    from datetime import timedelta
-    
-    link_token = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
-    expires_at = datetime.utcnow() + timedelta(hours=1)
-    
-    await db.execute(
-        update(WhatsAppUser)
-        .where(WhatsAppUser.id == whatsapp_user.id)
-        .values(
-            link_token=link_token,
-            link_token_expires_at=expires_at
-        )
-    )
-    await db.commit()
-    
-    link_url = f"{settings.CORS_ORIGINS[0]}/whatsapp/link?token={link_token}"
-    
-    message = (
-        f"🔗 Account Linking\n\n"
-        f"To link your YeeBitz account, open this link in your browser:\n\n"
-        f"👉 {link_url}\n\n"
-        f"Or go to the settings page and paste this token:\n"
-        f"{link_token}\n\n"
-        f"⏰ This link expires in 1 hour.\n"
-        f"🔒 For security, don't share this with others."
-    )
-    
-    await send_whatsapp_message(whatsapp_user.whatsapp_phone, message)
-
-
-async def handle_status_command(whatsapp_user: WhatsAppUser, db: AsyncSession):
-    """Handle status command from WhatsApp"""
-    
-    if whatsapp_user.is_linked:
-        # Get linked user details
-        result = await db.execute(
-            select(User).where(User.id == whatsapp_user.user_id)
-        )
-        linked_user = result.scalar_one_or_none()
-        
-        if linked_user:
-            message = (
-                f"✅ Account Status: Linked\n\n"
-                f"👤 YeeBitz Account: {linked_user.full_name}\n"
-                f"📧 Email: {linked_user.email}\n"
-                f"🎭 Role: {linked_user.role}\n"
-                f"🔗 Linked: {whatsapp_user.linked_at.strftime('%Y-%m-%d %H:%M')}\n\n"
-                f"Ready to take tests! 🎓"
-            )
-        else:
-            message = "❌ Error: Linked user not found. Please contact support."
-    else:
-        message = (
-            f"❌ Account Status: Not Linked\n\n"
-            f"Send 'link' to connect your YeeBitz account."
-        )
-    
-    await send_whatsapp_message(whatsapp_user.whatsapp_phone, message)
-
-
-async def handle_unlink_command(whatsapp_user: WhatsAppUser, db: AsyncSession):
-    """Handle unlink command from WhatsApp"""
-    
-    if not whatsapp_user.is_linked:
-        message = (
-            "❌ No linked account found.\n"
-            "Send 'link' to connect your YeeBitz account."
-        )
-        await send_whatsapp_message(whatsapp_user.whatsapp_phone, message)
-        return
-    
-    # Unlink account
-    await db.execute(
-        update(WhatsAppUser)
-        .where(WhatsAppUser.id == whatsapp_user.id)
-        .values(
-            is_linked=False,
-            user_id=None,
-            linked_at=None,
-            link_token=None,
-            link_token_expires_at=None
-        )
-    )
-    await db.commit()
-    
-    message = (
-        "✅ Account unlinked successfully!\n"
-        "Send 'link' to connect again anytime."
-    )
-    
-    await send_whatsapp_message(whatsapp_user.whatsapp_phone, message)
-
-
-async def send_help_message(phone_number: str):
-    """Send help message to WhatsApp user"""
-    
-    message = (
-        "🎓 YeeBitz Platform Bot Help\n\n"
-        "Available commands:\n"
-        "• Send 'start' - Welcome message\n"
-        "• Send 'link' - Link your account\n"
-        "• Send 'status' - Check status\n"
-        "• Send 'unlink' - Disconnect account\n\n"
-        "Need more help? Contact support."
-    )
-    
-    await send_whatsapp_message(phone_number, message)
-
-
-async def send_whatsapp_message(phone_number: str, message: str):
-    """Send WhatsApp message via API"""
-    
-    # TODO: Implement actual WhatsApp API call
-    # This should be implemented by the WhatsApp developer using their preferred method
-    logger.info(f"Sending WhatsApp message to {phone_number}: {message}")
-
-
 @router.get("/link")
 async def whatsapp_link_page(
     token: str,
@@ -378,11 +167,12 @@ async def link_whatsapp_account(
     )
     
     await db.commit()
+    linked_identity_cache.invalidate("whatsapp", whatsapp_user.whatsapp_phone)
     
     logger.info(f"Successfully linked user {current_user.email} with WhatsApp {whatsapp_user.whatsapp_phone}")
     
     # Send confirmation message
-    await send_whatsapp_message(
+    await whatsapp_bot.send_message(
         whatsapp_user.whatsapp_phone,
         f"✅ Account linked successfully!\n\nYour YeeBitz account ({current_user.full_name}) is now connected to WhatsApp.\n\nYou can now take tests and access materials directly from WhatsApp! 🎓"
     )
@@ -430,11 +220,13 @@ async def unlink_whatsapp_account(
     )
     
     await db.commit()
+    linked_identity_cache.invalidate("whatsapp", whatsapp_user.whatsapp_phone)
+    await whatsapp_chat_context.clear(whatsapp_user.whatsapp_phone)
     
     logger.info(f"Successfully unlinked user {current_user.email} from WhatsApp {whatsapp_user.whatsapp_phone}")
     
     # Send confirmation message
-    await send_whatsapp_message(
+    await whatsapp_bot.send_message(
         whatsapp_user.whatsapp_phone,
         "✅ Account unlinked successfully!\n\nYour YeeBitz account has been disconnected from WhatsApp.\n\nSend 'link' to connect again anytime."
     )
@@ -473,11 +265,32 @@ async def get_whatsapp_link_status(
         )
 
 
+def build_message_payload(message_request) -> dict:
+    """Build the Cloud API message body for a send or broadcast request"""
+    
+    if message_request.message_type == "template":
+        if not message_request.template_name:
+            raise HTTPException(status_code=400, detail="template_name is required for template messages")
+        template = {
+            "name": message_request.template_name,
+            "language": {"code": message_request.template_language or "en"}
+        }
+        if message_request.template_components:
+            template["components"] = message_request.template_components
+        return {"type": "template", "template": template}
+    
+    if message_request.message_type == "text":
+        if not message_request.text:
+            raise HTTPException(status_code=400, detail="text is required for text messages")
+        return {"type": "text", "text": {"preview_url": False, "body": message_request.text}}
+    
+    raise HTTPException(status_code=400, detail=f"Unsupported message type: {message_request.message_type}")
+
+
 @router.post("/send")
 async def send_message(
     message_request: WhatsAppSendMessageRequest,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db_session)
+    current_user: User = Depends(get_current_user)
 ):
     """Send WhatsApp message (admin/instructor only)"""
     
@@ -487,15 +300,14 @@ async def send_message(
             detail="Only admins and instructors can send messages"
         )
     
+    payload = build_message_payload(message_request)
+    
     try:
-        # TODO: Implement actual message sending via WhatsApp API
-        # This should be implemented by the WhatsApp developer
-        
-        logger.info(f"Sending WhatsApp message to {message_request.to}: {message_request.text}")
+        message_id = await whatsapp_sender.send(message_request.to, payload)
         
         return WhatsAppSendMessageResponse(
             success=True,
-            message_id="mock_message_id",
+            message_id=message_id,
             error=None
         )
         
@@ -505,4 +317,37 @@ async def send_message(
             success=False,
             message_id=None,
             error=str(e)
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/broadcast")
+async def broadcast_message(
+    broadcast_request: WhatsAppBroadcastRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Send one WhatsApp message to many recipients in batches (admin/instructor only)"""
+    
+    if current_user.role not in ["admin", "instructor"]:
+        raise HTTPException(
+            status_code=403,
+            detail="Only admins and instructors can send messages"
+        )
+    
+    payload = build_message_payload(broadcast_request)
+    outcomes = await whatsapp_sender.broadcast(broadcast_request.to, payload)
+    
+    results = {
+        recipient: WhatsAppSendMessageResponse(
+            success=not isinstance(outcome, Exception),
+            message_id=None if isinstance(outcome, Exception) else outcome,
+            error=str(outcome) if isinstance(outcome, Exception) else None
+        )
+        for recipient, outcome in outcomes.items()
+    }
+    failed = sum(1 for result in results.values() if not result.success)
+    
+    return WhatsAppBroadcastResponse(
+        sent=len(results) - failed,
+        failed=failed,
+        results=results
+    )
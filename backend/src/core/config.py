@@ -23,12 +23,21 @@ class Settings(BaseSettings):
     # Hasura
     HASURA_GRAPHQL_ENDPOINT: str
     HASURA_ADMIN_SECRET: str
+    # Sent by the users table event trigger (X-Hasura-Event-Secret); the hook is disabled when unset
+    HASURA_EVENT_SECRET: Optional[str] = None
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Per-worker auth caches (0 disables). Deactivations and role changes are
+    # evicted in every worker over Redis pub/sub; the TTL bounds staleness
+    # when a signal is missed, or for the other workers without REDIS_URL
+    AUTH_USER_CACHE_TTL: int = 300
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     
@@ -36,11 +45,39 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: set[str] = {".pdf", ".docx", ".txt"}
     UPLOAD_DIR: str = "uploads"
+    # Fetch the NLTK punkt tokenizer over the network when it is missing
+    NLTK_AUTO_DOWNLOAD: bool = False
+    
+    # Load heavy modules and models (Gemini, document parsers) in the lifespan
+    # rather than on the first request that needs them
+    WARM_UP_ON_STARTUP: bool = True
+    
+    # Graceful shutdown: in-flight background work (document processing) gets
+    # this long to finish; whatever is left is put back for another worker
+    BACKGROUND_DRAIN_SECONDS: int = 20
+    # Documents still 'uploaded' after this long are claimed by a worker's sweep
+    DOCUMENT_REQUEUE_AFTER_SECONDS: int = 60
+    # A running worker renews its document's lease every third of this; a
+    # lease left to expire means the worker died (killed mid-extraction) and
+    # the document is swept again
+    DOCUMENT_PROCESSING_LEASE_SECONDS: int = 300
+    DOCUMENT_REQUEUE_INTERVAL: int = 60
+    DOCUMENT_REQUEUE_BATCH: int = 20
     
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: Optional[str] = None
     TELEGRAM_WEBHOOK_URL: Optional[str] = None
     TELEGRAM_WEBHOOK_SECRET: Optional[str] = None
+    TELEGRAM_UPDATE_WORKERS: int = 8
+    TELEGRAM_UPDATE_QUEUE_SIZE: int = 1000
+    TELEGRAM_UPDATE_DRAIN_SECONDS: int = 10
+    TELEGRAM_SENDER_DRAIN_SECONDS: int = 5
+    TELEGRAM_GLOBAL_MESSAGES_PER_SECOND: float = 30
+    TELEGRAM_CHAT_MESSAGES_PER_SECOND: float = 1
+    TELEGRAM_CHAT_BURST: int = 3
+    TELEGRAM_GROUP_MESSAGES_PER_MINUTE: float = 20
+    TELEGRAM_SEND_MAX_ATTEMPTS: int = 3
+    TELEGRAM_STREAM_EDIT_INTERVAL: float = 1.5
     
     # WhatsApp Bot
     WHATSAPP_ACCESS_TOKEN: Optional[str] = None
@@ -51,24 +88,104 @@ class Settings(BaseSettings):
     WHATSAPP_VERIFY_TOKEN: Optional[str] = None
     WHATSAPP_API_VERSION: str = "v18.0"
     WHATSAPP_API_URL: str = "https://graph.facebook.com"
+    WHATSAPP_WEBHOOK_WORKERS: int = 8
+    WHATSAPP_WEBHOOK_QUEUE_SIZE: int = 1000
+    WHATSAPP_WEBHOOK_DRAIN_SECONDS: int = 10
+    WHATSAPP_DEDUPE_SIZE: int = 10000
+    WHATSAPP_MESSAGES_PER_SECOND: float = 80
+    WHATSAPP_RECIPIENT_MESSAGES_PER_SECOND: float = 1
+    WHATSAPP_RECIPIENT_BURST: int = 10
+    WHATSAPP_SEND_CONCURRENCY: int = 20
+    WHATSAPP_SEND_TIMEOUT: float = 10.0
+    WHATSAPP_SEND_MAX_ATTEMPTS: int = 4
+    WHATSAPP_BROADCAST_BATCH_SIZE: int = 50
+    WHATSAPP_STATUS_FLUSH_INTERVAL_MS: int = 500
+    WHATSAPP_STATUS_FLUSH_MAX_EVENTS: int = 2000
+    WHATSAPP_STATUS_BUFFER_MAX: int = 100000
+    WHATSAPP_STATUS_DRAIN_SECONDS: int = 5
     
     # Security
     ALLOWED_HOSTS: List[str] = ["*"]
     
     # Logging
     LOG_LEVEL: str = "INFO"
-    LOG_FORMAT: str = "json"
+    LOG_FORMAT: str = "json"  # json or text
+    # Records waiting for the background writer; new records are dropped beyond this
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_FLUSH_INTERVAL: float = 0.05
+    LOG_MAX_MESSAGE_LENGTH: int = 2000
+    # Per-logger cap on records below WARNING (0 disables)
+    LOG_RATE_LIMIT_PER_SECOND: int = 100
+    # Share of per-message INFO records kept on hot paths (logger.bind(sample=...))
+    LOG_HOT_PATH_SAMPLE_RATE: float = 0.01
     
     # Monitoring
     ENABLE_METRICS: bool = False
     METRICS_PORT: int = 9090
+    METRICS_SAMPLE_INTERVAL: float = 5.0
+    # Per-worker metric files aggregated by the gunicorn master (wiped at startup)
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/edutech-metrics"
+    
+    # Tracing (head-sampled spans, exported off the event loop)
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 0.01
+    TRACE_EXPORT_PATH: str = "traces.jsonl"
+    TRACE_EXPORT_URL: Optional[str] = None  # JSON batches to a collector instead of the file
+    TRACE_BUFFER_MAX: int = 10000
+    TRACE_FLUSH_INTERVAL: float = 1.0
+    
+    # Query monitoring (slow-query log and per-request N+1 detection)
+    QUERY_MONITOR_ENABLED: bool = True
+    SLOW_QUERY_MS: int = 200
+    N_PLUS_ONE_THRESHOLD: int = 5
+    QUERY_COUNT_WARN: int = 50
+    
+    # Admin profiling endpoints (sample one worker's stacks on demand)
+    PROFILER_MAX_SECONDS: int = 60
+    PROFILER_DEFAULT_HZ: int = 100
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     
+    # Redis (shared state across gunicorn workers; per-process fallback when unset)
+    REDIS_URL: Optional[str] = None
+    
+    # Per-worker cache of linked bot identities (telegram_id / WhatsApp phone -> user)
+    LINKED_IDENTITY_CACHE_TTL: int = 60
+    LINKED_IDENTITY_CACHE_SIZE: int = 10000
+    
+    # Document chat (shared by REST, Telegram and WhatsApp)
+    CHAT_HISTORY_LIMIT: int = 20
+    
+    # Bot chat context (active document per user)
+    CHAT_CONTEXT_TTL: int = 7 * 24 * 3600
+    CHAT_CONTEXT_LOCAL_TTL: int = 5
+    CHAT_CONTEXT_LOCAL_MAX_ENTRIES: int = 10000
+    
     # Gemini AI
     GEMINI_API_KEY: Optional[str] = None
     
+    # Per-user AI quota (token bucket shared by REST, Telegram and WhatsApp)
+    AI_QUOTA_ENABLED: bool = True
+    AI_QUOTA_TOKENS_PER_MINUTE: int = 20000
+    AI_QUOTA_BURST_TOKENS: int = 60000
+    AI_QUOTA_OUTPUT_TOKENS: int = 1024
+
+    # HTTP caching of AI artifacts (summary, study questions, mind map)
+    ARTIFACT_CACHE_MAX_AGE: int = 300
+    ARTIFACT_CACHE_PUBLIC: bool = False
+
+    @property
+    def shutdown_drain_seconds(self) -> int:
+        """Upper bound on a worker's shutdown: the sum of every drain budget"""
+        return (
+            self.BACKGROUND_DRAIN_SECONDS
+            + self.TELEGRAM_UPDATE_DRAIN_SECONDS
+            + self.TELEGRAM_SENDER_DRAIN_SECONDS
+            + 2 * self.WHATSAPP_WEBHOOK_DRAIN_SECONDS  # batches, then messages
+            + self.WHATSAPP_STATUS_DRAIN_SECONDS
+        )
+    
     @property
     def is_production(self) -> bool:
         return self.ENVIRONMENT.lower() == "production"
@@ -1,9 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from loguru import logger
-import sys
 import asyncio
 from contextlib import asynccontextmanager
 
@@ -11,9 +10,53 @@ from core.config import settings
 from api.telegram import router as telegram_router
 from api.whatsapp import router as whatsapp_router
 from api.documents import router as documents_router
+from api.admin import router as admin_router
 from services.telegram_bot import telegram_bot
+from services.telegram_sender import telegram_sender
+from services.whatsapp_bot import whatsapp_bot
+from services.document_service import document_service
 from utils.database import init_database, close_database
-from middleware.error_handler import global_exception_handler
+from utils.rate_limiter import check_rate_limit, rate_limiter
+from utils.auth import listen_for_user_invalidations
+from utils.redis_client import close_redis
+from middleware.error_handler import global_exception_handler, ai_quota_exception_handler
+from services.ai_quota import AIQuotaExceeded
+from middleware.metrics import MetricsMiddleware
+from middleware.tracing import TracingMiddleware
+from middleware.query_monitor import QueryMonitorMiddleware
+from middleware.request_context import RequestContextMiddleware
+from utils.metrics import metrics_sampler, start_metrics_server
+from utils.tracing import tracer
+from utils.query_monitor import query_monitor
+from utils.log_pipeline import configure_logging
+from utils.service_registry import service_registry
+from utils.lifecycle import lifecycle
+from utils.task_supervisor import task_supervisor
+
+
+def register_metric_sources():
+    """Queues and caches whose state the metrics sampler exports"""
+    from services.chat_context_store import chat_context_store, whatsapp_chat_context
+    from services.linked_identity_cache import linked_identity_cache
+    from services.whatsapp_status_tracker import whatsapp_status_tracker
+    from utils.auth import token_cache, user_cache
+    from utils.metrics import RATE_LIMIT_FALLBACKS
+    
+    metrics_sampler.register_queue("telegram_updates", lambda: telegram_bot.update_pool.pending_count)
+    metrics_sampler.register_queue("telegram_outbound", lambda: telegram_sender.stats()["queued"])
+    metrics_sampler.register_queue("whatsapp_batches", lambda: whatsapp_bot.batch_pool.pending_count)
+    metrics_sampler.register_queue("whatsapp_messages", lambda: whatsapp_bot.message_pool.pending_count)
+    metrics_sampler.register_queue("whatsapp_statuses", lambda: len(whatsapp_status_tracker.buffer))
+    metrics_sampler.register_queue("background_tasks", lambda: len(task_supervisor.tasks))
+    
+    metrics_sampler.register_cache("auth_token", token_cache)
+    metrics_sampler.register_cache("auth_user", user_cache)
+    metrics_sampler.register_cache("linked_identity", linked_identity_cache.entries)
+    metrics_sampler.register_cache("telegram_chat_context", chat_context_store.local)
+    metrics_sampler.register_cache("whatsapp_chat_context", whatsapp_chat_context.local)
+    
+    metrics_sampler.register_counter("rate_limit_fallbacks", RATE_LIMIT_FALLBACKS, lambda: rate_limiter.fallbacks)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -21,8 +64,33 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Application starting up...")
     
+    # Drop anything inherited from a preloading master (normally done in gunicorn's post_fork)
+    lifecycle.after_fork()
+    
     # Initialize database
     init_database()
+    tracer.start()
+    
+    if settings.WARM_UP_ON_STARTUP:
+        await service_registry.warm_up()
+    
+    # Metrics (served on METRICS_PORT, never on the API port)
+    if settings.ENABLE_METRICS:
+        try:
+            start_metrics_server()
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {settings.METRICS_PORT}: {str(e)}")
+        register_metric_sources()
+        metrics_sampler.start()
+    
+    # Evict users deactivated or changed in other workers from this worker's auth cache
+    task_supervisor.spawn(listen_for_user_invalidations(), kind="user_invalidations", drain=False)
+    
+    # Start WhatsApp webhook processing
+    whatsapp_bot.start()
+    
+    # Pick up documents a previous worker could not process before it stopped
+    task_supervisor.spawn(document_service.requeue_loop(), kind="document_requeue", drain=False)
     
     # Initialize Telegram bot
     try:
@@ -30,7 +98,7 @@ async def lifespan(app: FastAPI):
         
         # Start bot in polling mode for development
         if settings.DEBUG and not settings.TELEGRAM_WEBHOOK_URL:
-            asyncio.create_task(telegram_bot.start_polling())
+            task_supervisor.spawn(telegram_bot.start_polling(), kind="telegram_polling", drain=False)
             logger.info("Telegram bot started in polling mode")
         elif settings.TELEGRAM_WEBHOOK_URL:
             await telegram_bot.start_webhook()
@@ -45,19 +113,24 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Application shutting down...")
     try:
-        await telegram_bot.stop()
+        # Background work and the bots' queues drain side by side, within gunicorn's graceful_timeout
+        await asyncio.gather(
+            task_supervisor.drain(settings.BACKGROUND_DRAIN_SECONDS),
+            telegram_bot.stop(),
+            whatsapp_bot.stop()
+        )
+        await metrics_sampler.stop()
+        tracer.stop()
+        await close_redis()
         await close_database()
+        lifecycle.shutdown()
         logger.info("Application shutdown completed")
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
+    log_sink.stop()
 
 # Configure logging
-logger.remove()
-logger.add(
-    sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO" if not settings.DEBUG else "DEBUG",
-)
+log_sink = configure_logging()
 
 # Initialize FastAPI
 app = FastAPI(
@@ -65,6 +138,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     docs_url="/api/docs" if settings.DEBUG else None,
     redoc_url="/api/redoc" if settings.DEBUG else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -83,13 +157,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request query counts, request tracing and latency metrics
+# (outermost, so they include every other middleware)
+if settings.QUERY_MONITOR_ENABLED:
+    app.add_middleware(QueryMonitorMiddleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+if settings.ENABLE_METRICS:
+    app.add_middleware(MetricsMiddleware)
+# Request id for every log record written while handling the request
+app.add_middleware(RequestContextMiddleware)
+
 # Add global exception handler
 app.add_exception_handler(Exception, global_exception_handler)
+app.add_exception_handler(AIQuotaExceeded, ai_quota_exception_handler)
 
 # Include routers
 app.include_router(telegram_router, prefix="/api")
 app.include_router(whatsapp_router, prefix="/api")
-app.include_router(documents_router, prefix="/api")
+app.include_router(documents_router, prefix="/api", dependencies=[Depends(check_rate_limit)])
+app.include_router(admin_router, prefix="/api")
 
 
 @app.get("/health")
@@ -133,12 +220,25 @@ async def detailed_health_check():
     try:
         if telegram_bot.application:
             health_status["services"]["telegram_bot"] = "healthy"
+            health_status["telegram_updates"] = telegram_bot.update_pool.stats()
+            health_status["telegram_sender"] = telegram_sender.stats()
         else:
             health_status["services"]["telegram_bot"] = "not_initialized"
     except Exception as e:
         health_status["services"]["telegram_bot"] = f"unhealthy: {str(e)}"
         health_status["status"] = "unhealthy"
     
+    # WhatsApp webhook processing
+    health_status["whatsapp_webhooks"] = whatsapp_bot.stats()
+    
+    # Slow queries and N+1 warnings seen by this worker
+    health_status["queries"] = query_monitor.stats()
+    
+    # Lazily loaded modules and models
+    health_status["resources"] = service_registry.stats()
+    health_status["worker"] = lifecycle.stats()
+    health_status["background_tasks"] = task_supervisor.stats()
+    
     status_code = 200 if health_status["status"] == "healthy" else 503
     return JSONResponse(content=health_status, status_code=status_code)
 
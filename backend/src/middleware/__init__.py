@@ -1,3 +1,3 @@
-from .error_handler import global_exception_handler
+from .error_handler import global_exception_handler, ai_quota_exception_handler
 
-__all__ = ["global_exception_handler"]
\ No newline at end of file
+__all__ = ["global_exception_handler", "ai_quota_exception_handler"]
\ No newline at end of file
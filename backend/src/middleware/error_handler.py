@@ -1,21 +1,19 @@
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 from loguru import logger
-import traceback
 from typing import Union
 
+from core.config import settings
+from services.ai_quota import AIQuotaExceeded
+
 
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Global exception handler for the application"""
     
-    # Log the error
-    logger.error(f"Global exception handler caught: {type(exc).__name__}: {str(exc)}")
-    logger.error(f"Request URL: {request.url}")
-    logger.error(f"Request method: {request.method}")
-    
-    # Log full traceback in debug mode
-    if hasattr(request.app.state, 'settings') and request.app.state.settings.DEBUG:
-        logger.error(f"Traceback: {traceback.format_exc()}")
+    # One record per exception; the traceback is formatted by the log writer thread, in debug mode
+    logger.opt(exception=exc if settings.DEBUG else None).error(
+        f"Unhandled {type(exc).__name__} on {request.method} {request.url.path}: {str(exc)}"
+    )
     
     # Handle specific exception types
     if isinstance(exc, HTTPException):
@@ -26,7 +24,6 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
     
     # Handle database connection errors
     if "connection" in str(exc).lower() or "database" in str(exc).lower():
-        logger.error("Database connection error detected")
         return JSONResponse(
             status_code=503,
             content={
@@ -37,7 +34,6 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
     
     # Handle Telegram API errors
     if "telegram" in str(exc).lower() or "bot" in str(exc).lower():
-        logger.error("Telegram API error detected")
         return JSONResponse(
             status_code=502,
             content={
@@ -53,4 +49,17 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
             "error": "Internal server error. Please contact support if the problem persists.",
             "type": "internal_error"
         }
+    )
+
+
+async def ai_quota_exception_handler(request: Request, exc: AIQuotaExceeded) -> JSONResponse:
+    """Fast 429 when a user's AI token bucket is exhausted"""
+    return JSONResponse(
+        status_code=429,
+        content={
+            "error": "AI usage limit reached. Please try again later.",
+            "type": "ai_quota_exceeded",
+            "retry_after": exc.retry_after_header
+        },
+        headers={"Retry-After": exc.retry_after_header}
     )
\ No newline at end of file
@@ -0,0 +1,56 @@
+from typing import Any, Dict
+import time
+
+from utils.metrics import HTTP_REQUEST_DURATION
+
+# endpoint -> route path template, built on first use
+_route_paths: Dict[Any, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled a request, e.g. ``/api/documents/{document_id}``"""
+    # The router leaves the matched endpoint in the scope
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_paths:
+        _route_paths.update(
+            (route.endpoint, route.path)
+            for route in scope["app"].routes
+            if hasattr(route, "endpoint")
+        )
+    return _route_paths.get(endpoint, "unmatched")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template.
+
+    Routes are labelled by their path template (``/api/documents/{document_id}``)
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route_template(scope),
+                str(status)
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,34 @@
+from core.config import settings
+from middleware.metrics import route_template
+from utils.query_monitor import query_monitor
+
+
+class QueryMonitorMiddleware:
+    """Pure ASGI middleware collecting query counts per request for the N+1 detector.
+
+    In DEBUG the response carries ``X-Query-Count`` and ``X-DB-Time-Ms``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with query_monitor.track(f"{scope['method']} {scope['path']}") as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and settings.DEBUG:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.total_time * 1000:.1f}".encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Report under the route template, not the concrete path
+                stats.name = f"{scope['method']} {route_template(scope)}"
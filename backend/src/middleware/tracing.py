@@ -0,0 +1,53 @@
+import re
+
+from middleware.metrics import route_template
+from utils.tracing import tracer
+
+# W3C trace context: version-trace_id-parent_id-flags
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a trace per HTTP request.
+
+    Continues a caller's trace (and its sampling decision) from a
+    ``traceparent`` header, and returns the trace id as ``X-Trace-Id``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        upstream = {}
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                match = TRACEPARENT.match(value.decode("latin-1"))
+                if match:
+                    upstream = {
+                        "trace_id": match.group(1),
+                        "parent_id": match.group(2),
+                        "sampled": bool(int(match.group(3), 16) & 1),
+                    }
+                break
+
+        with tracer.trace(f"HTTP {scope['method']}", **upstream) as span:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.path", scope["path"])
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if span.trace_id is not None:
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (b"x-trace-id", span.trace_id.encode())
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                span.set_attribute("http.route", route_template(scope))
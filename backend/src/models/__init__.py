@@ -1,7 +1,7 @@
 from .base import Base
 from .user import User, UserRole
 from .telegram import TelegramUser
-from .whatsapp import WhatsAppUser
+from .whatsapp import WhatsAppUser, WhatsAppMessageStatus
 from .document import Document, DocumentStatus, DocumentChatSession, ChatMessage
 
-__all__ = ["Base", "User", "UserRole", "TelegramUser", "WhatsAppUser", "Document", "DocumentStatus", "DocumentChatSession", "ChatMessage"]
\ No newline at end of file
+__all__ = ["Base", "User", "UserRole", "TelegramUser", "WhatsAppUser", "WhatsAppMessageStatus", "Document", "DocumentStatus", "DocumentChatSession", "ChatMessage"]
\ No newline at end of file
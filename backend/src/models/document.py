@@ -39,6 +39,8 @@ class Document(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     processed_at = Column(DateTime(timezone=True))
+    # Lease: when a worker last claimed the document or renewed it while processing
+    processing_started_at = Column(DateTime(timezone=True))
     
     # Relationships
     uploader = relationship("User", backref="uploaded_documents")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, BigInteger, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, BigInteger, Boolean, DateTime, ForeignKey, Integer, SmallInteger, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -26,4 +26,23 @@ class WhatsAppUser(Base):
     user = relationship("User", back_populates="whatsapp_user")
     
     def __repr__(self):
-        return f"<WhatsAppUser(phone={self.whatsapp_phone}, name={self.whatsapp_name})>"
\ No newline at end of file
+        return f"<WhatsAppUser(phone={self.whatsapp_phone}, name={self.whatsapp_name})>"
+
+
+class WhatsAppMessageStatus(Base):
+    __tablename__ = "whatsapp_message_statuses"
+    
+    message_id = Column(String(128), primary_key=True)
+    recipient_phone = Column(String(20), nullable=True, index=True)
+    status = Column(String(16), nullable=False, index=True)  # sent, delivered, read, failed
+    status_rank = Column(SmallInteger, nullable=False)
+    status_at = Column(DateTime(timezone=True), nullable=False)
+    conversation_id = Column(String(128), nullable=True)
+    pricing_category = Column(String(32), nullable=True)
+    error_code = Column(Integer, nullable=True)
+    error_title = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<WhatsAppMessageStatus(message_id={self.message_id}, status={self.status})>"
\ No newline at end of file
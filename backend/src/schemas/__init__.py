@@ -28,6 +28,10 @@ from .document import (
     DocumentSummaryResponse,
     StudyQuestionsResponse
 )
+from .user import (
+    UserAccessUpdate,
+    UserAccessResponse
+)
 
 __all__ = [
     "TelegramLinkRequest",
@@ -53,5 +57,7 @@ __all__ = [
     "ChatSessionResponse",
     "ChatResponse",
     "DocumentSummaryResponse",
-    "StudyQuestionsResponse"
+    "StudyQuestionsResponse",
+    "UserAccessUpdate",
+    "UserAccessResponse"
 ]
\ No newline at end of file
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+import uuid
+
+from models.user import UserRole
+
+
+class UserAccessUpdate(BaseModel):
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+
+
+class UserAccessResponse(BaseModel):
+    id: uuid.UUID
+    email: str
+    full_name: str
+    role: str
+    is_active: bool
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -108,6 +108,23 @@ class WhatsAppSendMessageResponse(BaseModel):
     error: Optional[str] = Field(None, description="Error message if failed")
 
 
+class WhatsAppBroadcastRequest(BaseModel):
+    """Request schema for broadcasting a WhatsApp message to many recipients"""
+    to: List[str] = Field(..., min_length=1, max_length=1000, description="Recipient phone numbers")
+    message_type: str = Field("text", description="Message type (text, template, etc.)")
+    text: Optional[str] = Field(None, description="Text message content")
+    template_name: Optional[str] = Field(None, description="Template name for template messages")
+    template_language: Optional[str] = Field("en", description="Template language code")
+    template_components: Optional[List[Dict[str, Any]]] = Field(None, description="Template components")
+
+
+class WhatsAppBroadcastResponse(BaseModel):
+    """Response schema for a WhatsApp broadcast"""
+    sent: int = Field(..., description="Number of recipients the message was sent to")
+    failed: int = Field(..., description="Number of recipients that failed")
+    results: Dict[str, WhatsAppSendMessageResponse] = Field(..., description="Result per recipient")
+
+
 class WhatsAppVerificationRequest(BaseModel):
     """Schema for WhatsApp webhook verification"""
     hub_mode: str = Field(..., alias="hub.mode")
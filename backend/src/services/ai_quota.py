@@ -0,0 +1,73 @@
+from typing import Optional
+from loguru import logger
+import math
+
+from core.config import settings
+from utils.rate_limiter import create_rate_limit_backend
+
+# Rough prompt size heuristic for Gemini models
+CHARS_PER_TOKEN = 4
+
+
+class AIQuotaExceeded(Exception):
+    """Raised when a user's AI token bucket cannot cover a request"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"AI quota exceeded, retry after {retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AIQuotaService:
+    """Per-user token bucket for Gemini usage, shared by REST, Telegram and WhatsApp.
+
+    The estimated cost is charged before a call and corrected with the actual
+    token count afterwards, so cheap cached reads never touch the bucket.
+    """
+
+    def __init__(self, backend=None):
+        self.enabled = settings.AI_QUOTA_ENABLED
+        self.burst_tokens = settings.AI_QUOTA_BURST_TOKENS
+        self.emission_interval = 60 / settings.AI_QUOTA_TOKENS_PER_MINUTE
+        self.backend = backend or create_rate_limit_backend(prefix="aiquota:")
+
+    def estimate_tokens(self, prompt: str) -> int:
+        """Estimate prompt plus expected output tokens, capped at the bucket size"""
+        estimate = len(prompt) // CHARS_PER_TOKEN + settings.AI_QUOTA_OUTPUT_TOKENS
+        return min(estimate, self.burst_tokens)
+
+    async def reserve(self, user_id, tokens: int):
+        """Charge an estimated cost up front, raising AIQuotaExceeded if it does not fit"""
+        if not self.enabled:
+            return
+
+        try:
+            result = await self.backend.check(
+                str(user_id), self.emission_interval, self.burst_tokens, tokens
+            )
+        except Exception as e:
+            logger.warning(f"AI quota backend error, allowing request: {str(e)}")
+            return
+
+        if not result.allowed:
+            raise AIQuotaExceeded(result.retry_after)
+
+    async def reconcile(self, user_id, estimated: int, actual: Optional[int]):
+        """Correct a reservation with the tokens actually used (refunds or extra charge)"""
+        if not self.enabled or actual is None or actual == estimated:
+            return
+
+        try:
+            await self.backend.check(
+                str(user_id), self.emission_interval, self.burst_tokens,
+                actual - estimated, force=True
+            )
+        except Exception as e:
+            logger.warning(f"AI quota reconcile failed for {user_id}: {str(e)}")
+
+
+# Global instance
+ai_quota = AIQuotaService()
@@ -0,0 +1,52 @@
+from typing import Any, Dict, Iterable, List
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.telegram import TelegramUser
+from models.whatsapp import WhatsAppUser
+
+TELEGRAM_PROFILE_COLUMNS = ["telegram_username", "telegram_first_name", "telegram_last_name"]
+WHATSAPP_PROFILE_COLUMNS = ["whatsapp_name"]
+
+
+class BotIdentityRepository:
+    """Registers bot users with a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+    One statement covers a whole batch, so registration is one round trip and
+    concurrent first messages from the same user cannot race on the unique
+    platform id. Callers own the transaction.
+    """
+
+    async def upsert_telegram_users(self, session: AsyncSession, profiles: Iterable[Dict[str, Any]]) -> Dict[int, TelegramUser]:
+        """Register or refresh Telegram users, keyed by telegram_id"""
+        return await self._upsert(session, TelegramUser, "telegram_id", TELEGRAM_PROFILE_COLUMNS, profiles)
+
+    async def upsert_whatsapp_users(self, session: AsyncSession, profiles: Iterable[Dict[str, Any]]) -> Dict[str, WhatsAppUser]:
+        """Register or refresh WhatsApp users, keyed by whatsapp_phone"""
+        return await self._upsert(session, WhatsAppUser, "whatsapp_phone", WHATSAPP_PROFILE_COLUMNS, profiles)
+
+    async def _upsert(self, session: AsyncSession, model, key: str, profile_columns: List[str], profiles) -> Dict[Any, Any]:
+        # A statement may touch each row only once, so the last profile per key wins
+        rows = {}
+        for profile in profiles:
+            rows[profile[key]] = {key: profile[key], **{column: profile.get(column) for column in profile_columns}}
+        if not rows:
+            return {}
+
+        stmt = insert(model).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            # Keep known profile fields when an update carries none
+            set_={
+                column: func.coalesce(stmt.excluded[column], getattr(model, column))
+                for column in profile_columns
+            }
+        ).returning(model)
+
+        result = await session.scalars(stmt, execution_options={"populate_existing": True})
+        return {getattr(record, key): record for record in result}
+
+
+# Global instance
+bot_identity_repository = BotIdentityRepository()
@@ -0,0 +1,111 @@
+from typing import Optional
+from loguru import logger
+
+from core.config import settings
+from utils.cache import TTLCache
+from utils.redis_client import get_redis
+
+
+class InMemoryChatContextBackend:
+    """Per-process backend; the local fake for the shared store in tests"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.entries = TTLCache(maxsize=max_entries)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        self.entries.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self.entries.pop(key)
+
+
+class RedisChatContextBackend:
+    """Shared backend so every gunicorn worker sees the same active document"""
+
+    def __init__(self, client=None, prefix: str = "chatctx:"):
+        self._client = client
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        # Resolved per call so a forked worker never keeps the master's client
+        return self._client or get_redis()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class ChatContextStore:
+    """Active document per bot user, with TTL expiry and an in-process read-through cache.
+
+    The local cache keeps a memory cap and a short TTL, which bounds how long
+    another worker's switch of document can go unnoticed here.
+    """
+
+    def __init__(self, backend=None, channel: str = "telegram"):
+        self.channel = channel
+        self.ttl = settings.CHAT_CONTEXT_TTL
+        self.backend = backend or self._create_backend()
+        self.local = TTLCache(
+            maxsize=settings.CHAT_CONTEXT_LOCAL_MAX_ENTRIES,
+            ttl=settings.CHAT_CONTEXT_LOCAL_TTL
+        )
+
+    @staticmethod
+    def _create_backend():
+        if settings.REDIS_URL:
+            return RedisChatContextBackend()
+        return InMemoryChatContextBackend()
+
+    def _key(self, user_id) -> str:
+        return f"{self.channel}:{user_id}"
+
+    async def get(self, user_id) -> Optional[str]:
+        """Get the user's active document id, if any"""
+        key = self._key(user_id)
+        document_id = self.local.get(key)
+        if document_id is not None:
+            return document_id
+
+        try:
+            document_id = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Chat context backend error for {key}: {str(e)}")
+            return None
+
+        if document_id is not None:
+            self.local.set(key, document_id)
+        return document_id
+
+    async def set(self, user_id, document_id: str):
+        """Make a document the user's active chat context"""
+        key = self._key(user_id)
+        self.local.set(key, document_id)
+        try:
+            await self.backend.set(key, document_id, self.ttl)
+        except Exception as e:
+            logger.warning(f"Chat context backend error for {key}: {str(e)}")
+
+    async def clear(self, user_id):
+        """Forget the user's active chat context"""
+        key = self._key(user_id)
+        self.local.pop(key)
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Chat context backend error for {key}: {str(e)}")
+
+
+# Global instances
+chat_context_store = ChatContextStore()
+whatsapp_chat_context = ChatContextStore(channel="whatsapp")
@@ -0,0 +1,246 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+import time
+import uuid
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.document import Document, DocumentStatus, DocumentChatSession, ChatMessage
+from models.user import User, UserRole
+from services.ai_quota import AIQuotaExceeded
+from services.gemini_service import gemini_service
+from utils.tracing import tracer
+
+FALLBACK_RESPONSE = "I'm sorry, I encountered an error while processing your question. Please try again."
+
+# Session names per channel, as shown in the web app's session list
+SESSION_NAMES = {
+    "web": "Chat with {filename}",
+    "telegram": "Telegram Chat with {filename}",
+    "whatsapp": "WhatsApp Chat with {filename}",
+}
+
+
+class ConversationError(Exception):
+    """Raised when a turn cannot start; status_code is the matching HTTP status"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+@dataclass
+class ConversationTurn:
+    """Outcome of one question/answer exchange"""
+    chat_session: DocumentChatSession
+    user_message: ChatMessage
+    ai_message: ChatMessage
+    success: bool
+    latency: float
+
+    @property
+    def response_text(self) -> str:
+        return self.ai_message.content
+
+
+StreamConsumer = Callable[[AsyncIterator[str]], Awaitable[Optional[str]]]
+
+
+class ConversationEngine:
+    """Document chat for every channel: access, session, history, model call and persistence.
+
+    Channels are thin adapters: REST maps ConversationError onto HTTP errors,
+    the bots turn it into a reply, and streaming channels pass a consumer
+    that delivers chunks as they arrive and returns the full answer.
+    """
+
+    def __init__(self):
+        self.history_limit = settings.CHAT_HISTORY_LIMIT
+        self.turns: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.total_latency: Dict[str, float] = {}
+
+    @staticmethod
+    def can_chat(document: Document, user: User) -> bool:
+        """Students and the document's owner can chat with a document"""
+        return user.role == UserRole.STUDENT.value or document.uploaded_by == user.id
+
+    async def get_document(self, db: AsyncSession, document_id, user: User) -> Document:
+        """Fetch a document the user may chat with, or raise ConversationError"""
+        result = await db.execute(select(Document).where(Document.id == document_id))
+        document = result.scalar_one_or_none()
+
+        if not document:
+            raise ConversationError("Document not found", status_code=404)
+        if document.status != DocumentStatus.processed:
+            raise ConversationError("Document not ready for chat", status_code=400)
+        if not self.can_chat(document, user):
+            raise ConversationError("Access denied", status_code=403)
+        return document
+
+    async def list_documents(self, db: AsyncSession, user: User, limit: int = 10) -> List[Document]:
+        """Most recent documents the user may chat with"""
+        query = select(Document).where(Document.status == DocumentStatus.processed)
+        if user.role != UserRole.STUDENT.value:
+            query = query.where(Document.uploaded_by == user.id)
+        result = await db.execute(query.order_by(Document.created_at.desc(), Document.id).limit(limit))
+        return list(result.scalars().all())
+
+    async def get_chat_session(
+        self,
+        db: AsyncSession,
+        document: Document,
+        user: User,
+        channel: str = "web"
+    ) -> DocumentChatSession:
+        """Get or create the user's chat session for a document (flushed, not committed)"""
+        result = await db.execute(
+            select(DocumentChatSession)
+            .where(
+                and_(
+                    DocumentChatSession.document_id == document.id,
+                    DocumentChatSession.user_id == user.id
+                )
+            )
+            .order_by(DocumentChatSession.created_at)
+            .limit(1)
+        )
+        chat_session = result.scalar_one_or_none()
+
+        if not chat_session:
+            chat_session = DocumentChatSession(
+                document_id=document.id,
+                user_id=user.id,
+                session_name=SESSION_NAMES.get(channel, SESSION_NAMES["web"]).format(filename=document.original_filename)
+            )
+            db.add(chat_session)
+            # Committed with the turn's messages, so a rejected turn leaves nothing behind
+            await db.flush()
+        return chat_session
+
+    async def get_history(self, db: AsyncSession, chat_session: DocumentChatSession) -> List[Dict[str, str]]:
+        """The most recent messages of a session, oldest first"""
+        result = await db.execute(
+            select(ChatMessage.role, ChatMessage.content)
+            .where(ChatMessage.session_id == chat_session.id)
+            .order_by(ChatMessage.created_at.desc())
+            .limit(self.history_limit)
+        )
+        return [{"role": role, "content": content} for role, content in reversed(result.all())]
+
+    async def run_turn(
+        self,
+        db: AsyncSession,
+        document_id,
+        user: User,
+        question: str,
+        channel: str = "web",
+        on_stream: Optional[StreamConsumer] = None
+    ) -> ConversationTurn:
+        """Answer one question about a document and persist the exchange.
+
+        Raises ConversationError before any model call, and AIQuotaExceeded
+        (after rolling back) when the user's AI quota rejects the turn. Model
+        failures do not raise: the turn comes back with success=False and a
+        fallback answer, and only the question is saved.
+        """
+        started = time.monotonic()
+        with tracer.span("chat.context", channel=channel):
+            document = await self.get_document(db, document_id, user)
+            chat_session = await self.get_chat_session(db, document, user, channel)
+            # History is read before this turn, so nothing is persisted if the quota rejects it
+            chat_history = await self.get_history(db, chat_session)
+
+        asked_at = datetime.utcnow()
+        try:
+            with tracer.span("chat.model", streamed=on_stream is not None, history=len(chat_history)):
+                response_text, metadata = await self._answer(document, question, chat_history, user, on_stream)
+        except AIQuotaExceeded:
+            await db.rollback()
+            raise
+        success = bool(response_text)
+
+        user_message = ChatMessage(
+            id=uuid.uuid4(),
+            session_id=chat_session.id,
+            role="user",
+            content=question,
+            message_metadata={"channel": channel},
+            created_at=asked_at
+        )
+        ai_message = ChatMessage(
+            id=uuid.uuid4(),
+            session_id=chat_session.id,
+            role="assistant",
+            content=response_text if success else FALLBACK_RESPONSE,
+            message_metadata=metadata,
+            created_at=datetime.utcnow()
+        )
+        # Failed answers are returned to the caller but kept out of the history
+        with tracer.span("chat.persist"):
+            db.add_all([user_message, ai_message] if success else [user_message])
+            await db.commit()
+
+        latency = time.monotonic() - started
+        self._record(channel, latency, success)
+        return ConversationTurn(chat_session, user_message, ai_message, success, latency)
+
+    async def _answer(
+        self,
+        document: Document,
+        question: str,
+        chat_history: List[Dict[str, str]],
+        user: User,
+        on_stream: Optional[StreamConsumer]
+    ):
+        """Call the model; returns (answer or None, message metadata)"""
+        try:
+            if on_stream is not None:
+                response_text = await on_stream(
+                    gemini_service.stream_chat_with_document(
+                        document.processed_text,
+                        question,
+                        chat_history,
+                        user_id=user.id
+                    )
+                )
+                return response_text, {"model_used": gemini_service.model_name, "streamed": True}
+
+            response = await gemini_service.chat_with_document(
+                document.processed_text,
+                question,
+                chat_history,
+                user_id=user.id
+            )
+            metadata = {"model_used": response.get("model_used", "unknown")}
+            return (response["response"] if response.get("success") else None), metadata
+        except AIQuotaExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in document chat: {str(e)}")
+            return None, {"model_used": gemini_service.model_name}
+
+    def _record(self, channel: str, latency: float, success: bool):
+        self.turns[channel] = self.turns.get(channel, 0) + 1
+        self.total_latency[channel] = self.total_latency.get(channel, 0.0) + latency
+        if not success:
+            self.failures[channel] = self.failures.get(channel, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Turn counts and average end-to-end turn latency per channel"""
+        return {
+            channel: {
+                "turns": turns,
+                "failed": self.failures.get(channel, 0),
+                "avg_turn_latency_ms": round(self.total_latency[channel] / turns * 1000, 2),
+            }
+            for channel, turns in self.turns.items()
+        }
+
+
+# Global instance
+conversation_engine = ConversationEngine()
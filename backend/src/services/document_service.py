@@ -5,19 +5,42 @@ from typing import Optional, Dict, Any
 import mimetypes
 from loguru import logger
 import asyncio
+import time
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from datetime import datetime, timedelta
+import importlib
 
-# Document processing imports
-import pypdf
-from docx import Document as DocxDocument
-import nltk
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, func, and_, or_
 
 from models.document import Document, DocumentStatus
 from core.config import settings
 from utils.database import get_db_session
+from utils.lifecycle import lifecycle
+from utils.metrics import EXTRACTION_DURATION
+from utils.service_registry import service_registry
+from utils.task_supervisor import task_supervisor
+from utils.tracing import tracer
+
+
+def _load_punkt():
+    """Make sure the NLTK punkt tokenizer is installed; only downloads when allowed"""
+    import nltk
+    try:
+        return nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        if not settings.NLTK_AUTO_DOWNLOAD:
+            logger.warning("NLTK punkt tokenizer not installed and NLTK_AUTO_DOWNLOAD is off")
+            return None
+        nltk.download('punkt', quiet=True)
+        return nltk.data.find('tokenizers/punkt')
+
+
+# Document parsers are imported by the first extraction (or the startup warm-up).
+# Read-only once loaded, so a preloading master shares them with its workers.
+pypdf_module = service_registry.register("pypdf", lambda: importlib.import_module("pypdf"), fork_safe=True)
+docx_module = service_registry.register("docx", lambda: importlib.import_module("docx"), fork_safe=True)
+punkt_tokenizer = service_registry.register("punkt", _load_punkt, fork_safe=True)
 
 
 class DocumentProcessingService:
@@ -31,13 +54,11 @@ class DocumentProcessingService:
             self.upload_dir = project_root / settings.UPLOAD_DIR
         
         self.upload_dir.mkdir(exist_ok=True)
-        self.executor = ThreadPoolExecutor(max_workers=2)
-        
-        # Ensure NLTK data is available
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """This worker's extraction pool (never inherited from a preloading master)"""
+        return lifecycle.executor("document-extract", 2)
     
     async def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
         """Save uploaded file to disk and return file path"""
@@ -68,6 +89,7 @@ class DocumentProcessingService:
     
     async def extract_text_from_file(self, file_path: str, mime_type: str) -> Optional[str]:
         """Extract text content from uploaded file"""
+        started = time.perf_counter()
         try:
             # Resolve the file path to handle both absolute and relative paths
             resolved_path = self._resolve_file_path(file_path)
@@ -93,9 +115,11 @@ class DocumentProcessingService:
                 logger.warning(f"Unsupported file type: {mime_type}")
                 return None
             
+            EXTRACTION_DURATION.labels(mime_type, "success").observe(time.perf_counter() - started)
             return text
             
         except Exception as e:
+            EXTRACTION_DURATION.labels(mime_type or "unknown", "error").observe(time.perf_counter() - started)
             logger.error(f"Error extracting text from {resolved_path}: {str(e)}")
             return None
     
@@ -103,14 +127,14 @@ class DocumentProcessingService:
         """Extract text from PDF file (synchronous)"""
         text = ""
         with open(file_path, 'rb') as file:
-            pdf_reader = pypdf.PdfReader(file)
+            pdf_reader = pypdf_module.get().PdfReader(file)
             for page in pdf_reader.pages:
                 text += page.extract_text() + "\n"
         return text.strip()
     
     def _extract_docx_text(self, file_path: str) -> str:
         """Extract text from DOCX file (synchronous)"""
-        doc = DocxDocument(file_path)
+        doc = docx_module.get().Document(file_path)
         text = ""
         for paragraph in doc.paragraphs:
             text += paragraph.text + "\n"
@@ -129,38 +153,47 @@ class DocumentProcessingService:
                 logger.error(f"Document {document_id} not found")
                 return False
             
-            # Update status to processing
+            # Update status to processing; the lease lets a sweep recover it if this worker dies
             document.status = DocumentStatus.processing
+            document.processing_started_at = func.now()
             await db.commit()
             
-            # Extract text
-            extracted_text = await self.extract_text_from_file(
-                document.file_path, 
-                document.mime_type
-            )
+            # Renewed while this run is alive, so only a dead worker's lease expires
+            heartbeat = asyncio.create_task(self._renew_lease(document_id), name=f"document-lease-{document_id}")
+            try:
+                # Extract text
+                with tracer.span("document.extract", mime_type=document.mime_type, file_size=document.file_size):
+                    extracted_text = await self.extract_text_from_file(
+                        document.file_path, 
+                        document.mime_type
+                    )
             
-            if extracted_text:
-                # Clean and process text
-                processed_text = await self._clean_text(extracted_text)
+                if extracted_text:
+                    # Clean and process text
+                    with tracer.span("document.clean", characters=len(extracted_text)):
+                        processed_text = await self._clean_text(extracted_text)
                 
-                # Update document with extracted text
-                document.raw_text = extracted_text
-                document.processed_text = processed_text
-                document.status = DocumentStatus.processed
-                document.processed_at = datetime.utcnow()
+                    # Update document with extracted text
+                    document.raw_text = extracted_text
+                    document.processed_text = processed_text
+                    document.status = DocumentStatus.processed
+                    document.processed_at = datetime.utcnow()
                 
-                # Add metadata
-                document.file_metadata = {
-                    "word_count": len(processed_text.split()),
-                    "character_count": len(processed_text),
-                    "extraction_successful": True
-                }
-            else:
-                document.status = DocumentStatus.failed
-                document.file_metadata = {"extraction_error": "Failed to extract text"}
+                    # Add metadata
+                    document.file_metadata = {
+                        "word_count": len(processed_text.split()),
+                        "character_count": len(processed_text),
+                        "extraction_successful": True
+                    }
+                else:
+                    document.status = DocumentStatus.failed
+                    document.file_metadata = {"extraction_error": "Failed to extract text"}
             
-            await db.commit()
-            return document.status == DocumentStatus.processed
+                with tracer.span("document.save"):
+                    await db.commit()
+                return document.status == DocumentStatus.processed
+            finally:
+                heartbeat.cancel()
             
         except Exception as e:
             logger.error(f"Error processing document {document_id}: {str(e)}")
@@ -178,13 +211,131 @@ class DocumentProcessingService:
                 pass
             return False
     
+    async def _renew_lease(self, document_id: str):
+        """Refresh a running document's lease every third of its length (runs until cancelled)"""
+        interval = settings.DOCUMENT_PROCESSING_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async for db in get_db_session():
+                    await db.execute(
+                        update(Document)
+                        .where(Document.id == document_id, Document.status == DocumentStatus.processing)
+                        .values(processing_started_at=func.now())
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Could not renew the processing lease of document {document_id}: {str(e)}")
+    
     async def process_document_async(self, document_id: str) -> bool:
         """Process document with its own database session"""
+        with tracer.trace("document.process", document_id=str(document_id)):
+            async for db in get_db_session():
+                try:
+                    return await self.process_document(db, document_id)
+                finally:
+                    await db.close()
+    
+    def schedule_processing(self, document_id: str) -> bool:
+        """Process a document in the background; False if this worker is shutting down.
+
+        A document that is not processed here stays 'uploaded' (or is put
+        back there if the shutdown interrupts it) and is picked up by
+        requeue_stale_documents in a running worker, as is one whose worker
+        died mid-run once its lease expires.
+        """
+        task = task_supervisor.spawn(
+            self.process_document_async(document_id),
+            kind="document_processing",
+            name=f"process-document-{document_id}",
+            on_abandon=lambda: self.requeue_document(document_id)
+        )
+        return task is not None
+    
+    async def requeue_document(self, document_id: str):
+        """Put a document whose processing was interrupted (or never started) back to 'uploaded' and release its lease"""
         async for db in get_db_session():
+            await db.execute(
+                update(Document)
+                .where(
+                    Document.id == document_id,
+                    Document.status.in_([DocumentStatus.uploaded, DocumentStatus.processing])
+                )
+                .values(status=DocumentStatus.uploaded, processing_started_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        logger.info(f"Requeued document {document_id}")
+    
+    async def requeue_stale_documents(self) -> int:
+        """Claim unfinished documents nobody holds a live lease on and process them.
+
+        That is documents left 'uploaded' by a refused or interrupted run,
+        and documents stuck 'processing' because their worker was killed.
+        A claim only takes the lease (status is untouched), so a claim that
+        is never scheduled is released below, or at worst expires.
+        """
+        if not task_supervisor.accepting:
+            return 0
+        
+        now = func.now()
+        lease_expired = now - timedelta(seconds=settings.DOCUMENT_PROCESSING_LEASE_SECONDS)
+        # SKIP LOCKED lets every worker sweep at once without claiming the same document
+        stale = (
+            select(Document.id)
+            .where(or_(
+                and_(
+                    Document.status == DocumentStatus.uploaded,
+                    Document.created_at < now - timedelta(seconds=settings.DOCUMENT_REQUEUE_AFTER_SECONDS),
+                    or_(Document.processing_started_at.is_(None), Document.processing_started_at < lease_expired)
+                ),
+                and_(
+                    Document.status == DocumentStatus.processing,
+                    func.coalesce(Document.processing_started_at, Document.created_at) < lease_expired
+                )
+            ))
+            .limit(settings.DOCUMENT_REQUEUE_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        document_ids = []
+        scheduled = 0
+        try:
+            async for db in get_db_session():
+                result = await db.execute(
+                    update(Document)
+                    .where(Document.id.in_(stale.scalar_subquery()))
+                    .values(processing_started_at=now)
+                    .returning(Document.id)
+                    .execution_options(synchronize_session=False)
+                )
+                document_ids = [str(document_id) for document_id in result.scalars().all()]
+                await db.commit()
+            
+            for document_id in document_ids:
+                if not self.schedule_processing(document_id):
+                    break
+                scheduled += 1
+        finally:
+            # Refused (shutdown began) or cancelled before scheduling: give the claims back
+            for document_id in document_ids[scheduled:]:
+                try:
+                    await self.requeue_document(document_id)
+                except Exception as e:
+                    logger.error(f"Could not release claim on document {document_id}: {str(e)}")
+        
+        if scheduled:
+            logger.info(f"Requeued {scheduled} unprocessed documents")
+        return scheduled
+    
+    async def requeue_loop(self):
+        """Sweep for stale documents every DOCUMENT_REQUEUE_INTERVAL seconds"""
+        while True:
             try:
-                return await self.process_document(db, document_id)
-            finally:
-                await db.close()
+                await self.requeue_stale_documents()
+            except Exception as e:
+                logger.error(f"Document requeue sweep failed: {str(e)}")
+            await asyncio.sleep(settings.DOCUMENT_REQUEUE_INTERVAL)
     
     async def _clean_text(self, text: str) -> str:
         """Clean and preprocess extracted text"""
@@ -1,31 +1,55 @@
-import google.generativeai as genai
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from loguru import logger
 import asyncio
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from core.config import settings
+from services.ai_quota import ai_quota, AIQuotaExceeded
+from utils.lifecycle import lifecycle
+from utils.metrics import observe_gemini
+from utils.service_registry import service_registry
+from utils.tracing import tracer
+
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+def _load_model():
+    # google.generativeai (and grpc under it) is only imported once a model is needed
+    import google.generativeai as genai
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+
+gemini_model = service_registry.register("gemini_model", _load_model, warm=bool(settings.GEMINI_API_KEY))
 
 
 class GeminiService:
     def __init__(self):
         self.api_key = settings.GEMINI_API_KEY
-        self.model_name = "gemini-2.0-flash"
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.model_name = GEMINI_MODEL
         
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
-        else:
+        if not self.api_key:
             logger.warning("Gemini API key not configured")
-            self.model = None
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """This worker's pool for blocking Gemini calls (never inherited from a preloading master)"""
+        return lifecycle.executor("gemini", 4)
+    
+    @property
+    def model(self):
+        """The Gemini model, created on first use (None without an API key)"""
+        return gemini_model.get() if self.api_key else None
     
     async def chat_with_document(
         self,
         document_text: str,
         question: str,
-        chat_history: Optional[List[Dict[str, str]]] = None
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[Any] = None
     ) -> Dict[str, Any]:
         """
         Chat with a document using Gemini API
@@ -34,43 +58,10 @@ class GeminiService:
             raise ValueError("Gemini API not configured")
         
         try:
-            # Create system prompt for document chat
-            system_prompt = f"""
-            You are an AI assistant helping students understand and learn from documents. 
-            You have access to the following document content:
-            
-            {document_text[:8000]}...
-            
-            Please answer questions about this document accurately and helpfully.
-            If the question cannot be answered from the document content, politely say so.
-            Provide clear, educational responses that help the student learn.
-            """
-            
-            # Build conversation context
-            conversation_parts = [system_prompt]
-            
-            # Add chat history if provided
-            if chat_history:
-                for msg in chat_history[-10:]:  # Keep last 10 messages for context
-                    role = msg.get("role", "user")
-                    content = msg.get("content", "")
-                    if role == "user":
-                        conversation_parts.append(f"Student: {content}")
-                    else:
-                        conversation_parts.append(f"Assistant: {content}")
-            
-            # Add current question
-            conversation_parts.append(f"Student: {question}")
-            
-            full_prompt = "\n\n".join(conversation_parts)
+            full_prompt = self._build_chat_prompt(document_text, question, chat_history)
             
             # Generate response using thread executor for async compatibility
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                self.executor,
-                self._generate_response,
-                full_prompt
-            )
+            response = await self._generate(full_prompt, user_id)
             
             return {
                 "response": response.text,
@@ -78,6 +69,8 @@ class GeminiService:
                 "model_used": self.model_name
             }
             
+        except AIQuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error in document chat: {str(e)}")
             return {
@@ -86,11 +79,162 @@ class GeminiService:
                 "error": str(e)
             }
     
+    async def stream_chat_with_document(
+        self,
+        document_text: str,
+        question: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        user_id: Optional[Any] = None
+    ) -> AsyncIterator[str]:
+        """
+        Chat with a document, yielding the answer as text chunks while Gemini generates it
+        """
+        if not self.model:
+            raise ValueError("Gemini API not configured")
+        
+        prompt = self._build_chat_prompt(document_text, question, chat_history)
+        async for chunk in self._generate_stream(prompt, user_id):
+            yield chunk
+    
+    def _build_chat_prompt(
+        self,
+        document_text: str,
+        question: str,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """Build the document chat prompt from the document, history and question"""
+        # Create system prompt for document chat
+        system_prompt = f"""
+        You are an AI assistant helping students understand and learn from documents. 
+        You have access to the following document content:
+        
+        {document_text[:8000]}...
+        
+        Please answer questions about this document accurately and helpfully.
+        If the question cannot be answered from the document content, politely say so.
+        Provide clear, educational responses that help the student learn.
+        """
+        
+        # Build conversation context
+        conversation_parts = [system_prompt]
+        
+        # Add chat history if provided
+        if chat_history:
+            for msg in chat_history[-10:]:  # Keep last 10 messages for context
+                role = msg.get("role", "user")
+                content = msg.get("content", "")
+                if role == "user":
+                    conversation_parts.append(f"Student: {content}")
+                else:
+                    conversation_parts.append(f"Assistant: {content}")
+        
+        # Add current question
+        conversation_parts.append(f"Student: {question}")
+        
+        return "\n\n".join(conversation_parts)
+    
     def _generate_response(self, prompt: str):
         """Synchronous wrapper for model generation"""
         return self.model.generate_content(prompt)
     
-    async def extract_document_summary(self, document_text: str) -> Dict[str, Any]:
+    async def _generate(self, prompt: str, user_id: Optional[Any] = None):
+        """Run generation in the executor, charging the user's AI quota if given"""
+        estimated = ai_quota.estimate_tokens(prompt)
+        if user_id is not None:
+            await ai_quota.reserve(user_id, estimated)
+        
+        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        with tracer.span("gemini.generate", model=self.model_name, estimated_tokens=estimated) as span:
+            try:
+                response = await loop.run_in_executor(
+                    self.executor,
+                    self._generate_response,
+                    prompt
+                )
+            except Exception:
+                observe_gemini("generate", started, "error")
+                if user_id is not None:
+                    await ai_quota.reconcile(user_id, estimated, 0)
+                raise
+            
+            usage = getattr(response, "usage_metadata", None)
+            span.set_attribute("total_tokens", getattr(usage, "total_token_count", None))
+        observe_gemini("generate", started, "success", usage)
+        if user_id is not None:
+            actual = getattr(usage, "total_token_count", None) if usage else None
+            await ai_quota.reconcile(user_id, estimated, actual)
+        
+        return response
+    
+    async def _generate_stream(self, prompt: str, user_id: Optional[Any] = None) -> AsyncIterator[str]:
+        """Stream generation from the executor, charging the user's AI quota if given"""
+        estimated = ai_quota.estimate_tokens(prompt)
+        if user_id is not None:
+            await ai_quota.reserve(user_id, estimated)
+        
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        abandoned = threading.Event()
+        
+        def produce():
+            # Runs in the executor; hands chunks to the event loop as they arrive
+            try:
+                response = self.model.generate_content(prompt, stream=True)
+                for chunk in response:
+                    if abandoned.is_set():
+                        response = None
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. only a finish reason)
+                        continue
+                    if text:
+                        loop.call_soon_threadsafe(chunks.put_nowait, text)
+                return getattr(response, "usage_metadata", None)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, finished)
+        
+        started = time.perf_counter()
+        # Not made current: the caller's own work runs between our yields
+        span = tracer.span("gemini.stream", activate=False, model=self.model_name, estimated_tokens=estimated)
+        producer = loop.run_in_executor(self.executor, produce)
+        # An abandoned stream keeps its estimated charge; a failed one is refunded
+        actual = None
+        outcome = "abandoned"
+        error = None
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is finished:
+                    break
+                yield chunk
+            usage = await producer
+            actual = getattr(usage, "total_token_count", None) if usage else None
+            outcome = "success"
+            observe_gemini("stream", started, outcome, usage)
+            span.set_attribute("total_tokens", actual)
+        except Exception as e:
+            actual = 0
+            outcome = "error"
+            error = e
+            raise
+        finally:
+            abandoned.set()
+            if outcome != "success":
+                observe_gemini("stream", started, outcome)
+            span.set_attribute("outcome", outcome)
+            span.end(error)
+            if user_id is not None:
+                await ai_quota.reconcile(user_id, estimated, actual)
+    
+    async def extract_document_summary(
+        self,
+        document_text: str,
+        user_id: Optional[Any] = None
+    ) -> Dict[str, Any]:
         """
         Extract a summary of the document using Gemini
         """
@@ -107,18 +251,15 @@ class GeminiService:
             Summary:
             """
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                self.executor,
-                self._generate_response,
-                prompt
-            )
+            response = await self._generate(prompt, user_id)
             
             return {
                 "summary": response.text,
                 "success": True
             }
             
+        except AIQuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating summary: {str(e)}")
             return {
@@ -127,7 +268,11 @@ class GeminiService:
                 "error": str(e)
             }
     
-    async def suggest_study_questions(self, document_text: str) -> Dict[str, Any]:
+    async def suggest_study_questions(
+        self,
+        document_text: str,
+        user_id: Optional[Any] = None
+    ) -> Dict[str, Any]:
         """
         Generate study questions based on document content
         """
@@ -145,18 +290,15 @@ class GeminiService:
             Please format as a numbered list of questions:
             """
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                self.executor,
-                self._generate_response,
-                prompt
-            )
+            response = await self._generate(prompt, user_id)
             
             return {
                 "questions": response.text,
                 "success": True
             }
             
+        except AIQuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating study questions: {str(e)}")
             return {
@@ -165,7 +307,11 @@ class GeminiService:
                 "error": str(e)
             }
     
-    async def generate_mind_map(self, document_text: str) -> Dict[str, Any]:
+    async def generate_mind_map(
+        self,
+        document_text: str,
+        user_id: Optional[Any] = None
+    ) -> Dict[str, Any]:
         """
         Generate a mind map structure based on document content
         """
@@ -220,12 +366,7 @@ class GeminiService:
             6. Return ONLY the JSON structure, no additional text
             """
             
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                self.executor,
-                self._generate_response,
-                prompt
-            )
+            response = await self._generate(prompt, user_id)
             
             # Try to parse the JSON response
             import json
@@ -271,6 +412,8 @@ class GeminiService:
                     "error": "Failed to parse AI response as JSON"
                 }
             
+        except AIQuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating mind map: {str(e)}")
             return {
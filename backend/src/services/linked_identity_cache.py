@@ -0,0 +1,79 @@
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.telegram import TelegramUser
+from models.user import User
+from models.whatsapp import WhatsAppUser
+from utils.cache import TTLCache
+
+# channel -> (link model, column holding the platform identity)
+CHANNELS = {
+    "telegram": (TelegramUser, TelegramUser.telegram_id),
+    "whatsapp": (WhatsAppUser, WhatsAppUser.whatsapp_phone),
+}
+
+
+def _snapshot(instance) -> Dict[str, Any]:
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(type(instance)).column_attrs}
+
+
+class LinkedIdentityCache:
+    """Per-worker cache of linked bot accounts and the YeeBitz user behind them.
+
+    Only linked identities are cached, so a fresh link is seen on the next
+    message; link and unlink paths invalidate, and the TTL bounds how long an
+    unlink in another worker can go unnoticed here.
+    """
+
+    def __init__(self):
+        self.entries = TTLCache(
+            maxsize=settings.LINKED_IDENTITY_CACHE_SIZE,
+            ttl=settings.LINKED_IDENTITY_CACHE_TTL
+        )
+
+    async def lookup(self, session: AsyncSession, channel: str, external_id) -> Tuple[Optional[Any], Optional[User]]:
+        """Return (link record, linked user); the user is None unless the account is linked"""
+        model, identity_column = CHANNELS[channel]
+
+        cached = self.get(channel, external_id)
+        if cached is not None:
+            return cached
+
+        result = await session.execute(
+            select(model, User)
+            .outerjoin(User, model.user_id == User.id)
+            .where(identity_column == external_id)
+        )
+        row = result.first()
+        if not row:
+            return None, None
+
+        link, user = row
+        if not link.is_linked or user is None:
+            return link, None
+
+        self.entries.set(f"{channel}:{external_id}", (_snapshot(link), _snapshot(user)))
+        return link, user
+
+    def get(self, channel: str, external_id) -> Optional[Tuple[Any, User]]:
+        """Return a cached (link record, linked user) without touching the database"""
+        cached = self.entries.get(f"{channel}:{external_id}")
+        if cached is None:
+            return None
+        # Fresh detached instances, so callers never share mutable state
+        model = CHANNELS[channel][0]
+        link_snapshot, user_snapshot = cached
+        return model(**link_snapshot), User(**user_snapshot)
+
+    def invalidate(self, channel: str, external_id):
+        """Drop a cached identity after it is linked or unlinked"""
+        self.entries.pop(f"{channel}:{external_id}")
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Global instance
+linked_identity_cache = LinkedIdentityCache()
@@ -1,8 +1,9 @@
 import asyncio
 import secrets
 import string
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Callable
+from typing import Optional, Callable, AsyncIterator
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler, MessageHandler, filters
@@ -11,15 +12,31 @@ from sqlalchemy import select
 from sqlalchemy import update as sqlalchemy_update  # Import with an alias
 from sqlalchemy.ext.asyncio import AsyncSession  # <-- FIX 1: Add this import
 from core.config import settings
+from services.ai_quota import AIQuotaExceeded
+from services.chat_context_store import chat_context_store
+from services.conversation_engine import conversation_engine, ConversationError
+from services.bot_identity_repository import bot_identity_repository
+from services.linked_identity_cache import linked_identity_cache
+from services.telegram_sender import telegram_sender, MAX_MESSAGE_LENGTH
+from utils.keyed_worker_pool import KeyedWorkerPool
+from utils.text import split_message, split_point
+from utils.tracing import tracer
+from utils.query_monitor import query_monitor
 
-# In-memory store for user chat sessions
-user_chat_contexts = {}
+# Shown at the end of a reply that is still being generated
+STREAM_CURSOR = " ▌"
 
 
 class TelegramBotService:
     def __init__(self):
         self.application = None
         self.db_session_factory = None
+        self.update_pool = KeyedWorkerPool(
+            self._handle_update,
+            name="telegram-updates",
+            workers=settings.TELEGRAM_UPDATE_WORKERS,
+            max_pending=settings.TELEGRAM_UPDATE_QUEUE_SIZE
+        )
         
     async def initialize(self):
         """Initialize the Telegram bot application"""
@@ -57,6 +74,8 @@ class TelegramBotService:
             
         await self.application.initialize()
         await self.application.start()
+        telegram_sender.start(self.application.bot)
+        self.update_pool.start()
         await self.application.bot.set_webhook(
             url=settings.TELEGRAM_WEBHOOK_URL,
             secret_token=settings.TELEGRAM_WEBHOOK_SECRET
@@ -70,51 +89,135 @@ class TelegramBotService:
             
         await self.application.initialize()
         await self.application.start()
+        telegram_sender.start(self.application.bot)
         await self.application.updater.start_polling()
         logger.info("Bot started in polling mode")
         
     async def stop(self):
         """Stop the bot"""
+        await self.update_pool.stop(timeout=settings.TELEGRAM_UPDATE_DRAIN_SECONDS)
+        await telegram_sender.stop(timeout=settings.TELEGRAM_SENDER_DRAIN_SECONDS)
         if self.application:
             await self.application.stop()
             await self.application.shutdown()
             
-    async def process_webhook_update(self, update_data: dict):
-        """Process webhook update"""
+    def enqueue_webhook_update(self, update_data: dict) -> bool:
+        """Validate a webhook update and queue it; returns False for duplicates.
+
+        Updates are processed sequentially per chat and in parallel across chats.
+        Raises QueueFullError when the pool is saturated.
+        """
         if not self.application:
-            return
+            return False
             
         update = Update.de_json(update_data, self.application.bot)
-        await self.application.process_update(update)
+        if update.effective_chat:
+            key = update.effective_chat.id
+        elif update.effective_user:
+            key = update.effective_user.id
+        else:
+            key = update.update_id
+        
+        return self.update_pool.submit(key, update, item_id=update.update_id)
+    
+    async def _handle_update(self, update: Update):
+        """Run an update through the bot's handlers (pool worker)"""
+        with tracer.trace("telegram.update", update_id=update.update_id), query_monitor.track("telegram.update"):
+            await self.application.process_update(update)
+        
+    async def _reply(self, update: Update, text: str, **kwargs):
+        """Send a message to the update's chat through the rate-limited sender"""
+        chat_id = update.effective_chat.id
+        parts = split_message(text, MAX_MESSAGE_LENGTH)
+        # Over-long texts go out as consecutive messages; markup stays on the last one
+        for part in parts[:-1]:
+            await self._send(chat_id, part)
+        return await self._send(chat_id, parts[-1], **kwargs)
+    
+    async def _send(self, chat_id: int, text: str, **kwargs):
+        """Send a single message through the rate-limited sender"""
+        if not telegram_sender.running:
+            return await self.application.bot.send_message(chat_id, text, **kwargs)
+        return await telegram_sender.send_message(chat_id, text, **kwargs)
+    
+    async def _edit(self, query, text: str, **kwargs):
+        """Edit a callback query's message through the rate-limited sender"""
+        return await self._edit_message(query.message.chat_id, query.message.message_id, text, **kwargs)
+    
+    async def _edit_message(self, chat_id: int, message_id: int, text: str, **kwargs):
+        """Edit a message by id through the rate-limited sender"""
+        if not telegram_sender.running:
+            return await self.application.bot.edit_message_text(
+                text, chat_id=chat_id, message_id=message_id, **kwargs
+            )
+        return await telegram_sender.edit_message_text(chat_id, message_id, text, **kwargs)
+    
+    async def _stream_reply(self, update: Update, chunks: AsyncIterator[str]) -> str:
+        """Post a placeholder and grow it with throttled edits as chunks arrive; returns the full text
+        
+        Text past Telegram's length limit continues in a new message, so a long
+        answer ends up as several consecutive messages.
+        """
+        chat_id = update.effective_chat.id
+        message = await self._reply(update, "💭 Thinking...")
+        limit = MAX_MESSAGE_LENGTH - len(STREAM_CURSOR)
+        text = ""
+        offset = 0  # start of the part shown in the current message
+        shown = ""
+        last_edit = time.monotonic()
+        
+        try:
+            async for chunk in chunks:
+                text += chunk
+                
+                # Finish full messages and continue in a new one
+                while len(text) - offset > limit:
+                    cut = offset + split_point(text[offset:], limit)
+                    await self._edit_message(chat_id, message.message_id, text[offset:cut].rstrip())
+                    offset = cut
+                    shown = text[offset:offset + limit].strip()
+                    message = await self._send(chat_id, (shown or "…") + STREAM_CURSOR)
+                    last_edit = time.monotonic()
+                
+                visible = text[offset:].strip()
+                throttled = time.monotonic() - last_edit < settings.TELEGRAM_STREAM_EDIT_INTERVAL
+                if visible and visible != shown and not throttled:
+                    shown = visible
+                    last_edit = time.monotonic()
+                    try:
+                        await self._edit_message(chat_id, message.message_id, visible + STREAM_CURSOR)
+                    except Exception as e:
+                        # Intermediate edits are best effort; the final edit carries the full text
+                        logger.warning(f"Streaming edit failed for chat {chat_id}: {str(e)}")
+            
+            if not text.strip():
+                raise ValueError("Empty response from Gemini")
+            
+            await self._edit_message(chat_id, message.message_id, text[offset:].strip() or "…")
+            return text
+        except Exception:
+            if not text.strip():
+                try:
+                    await self.application.bot.delete_message(chat_id, message.message_id)
+                except Exception:
+                    pass
+            raise
         
     def generate_link_token(self) -> str:
         """Generate a secure link token"""
         return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
         
     async def get_or_create_telegram_user(self, session: AsyncSession, telegram_id: int, user_data: dict):
-        """Get or create telegram user record"""
-        # Import here to avoid circular imports
-        from models.telegram import TelegramUser
+        """Get or create telegram user record (one upsert, safe under concurrent first messages)"""
+        telegram_users = await bot_identity_repository.upsert_telegram_users(session, [{
+            "telegram_id": telegram_id,
+            "telegram_username": user_data.get('username'),
+            "telegram_first_name": user_data.get('first_name'),
+            "telegram_last_name": user_data.get('last_name')
+        }])
+        await session.commit()
         
-        # Check if telegram user exists
-        result = await session.execute(
-            select(TelegramUser).where(TelegramUser.telegram_id == telegram_id)
-        )
-        telegram_user = result.scalar_one_or_none()
-        
-        if not telegram_user:
-            # Create new telegram user
-            telegram_user = TelegramUser(
-                telegram_id=telegram_id,
-                telegram_username=user_data.get('username'),
-                telegram_first_name=user_data.get('first_name'),
-                telegram_last_name=user_data.get('last_name')
-            )
-            session.add(telegram_user)
-            await session.commit()
-            await session.refresh(telegram_user)
-            
-        return telegram_user
+        return telegram_users[telegram_id]
             
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -151,7 +254,7 @@ class TelegramBotService:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await update.message.reply_text(welcome_message, reply_markup=reply_markup)
+            await self._reply(update, welcome_message, reply_markup=reply_markup)
         
     async def link_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /link command"""
@@ -170,7 +273,8 @@ class TelegramBotService:
             telegram_user = result.scalar_one_or_none()
             
             if telegram_user:
-                await update.message.reply_text(
+                await self._reply(
+                    update,
                     "✅ Your account is already linked!\n"
                     "Use /status to view details or /unlink to disconnect."
                 )
@@ -216,7 +320,7 @@ class TelegramBotService:
             )
             
             # We send the message without any buttons (reply_markup)
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self._reply(update, message, parse_mode='Markdown')
             
     async def unlink_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /unlink command"""
@@ -231,7 +335,8 @@ class TelegramBotService:
             telegram_user = result.scalar_one_or_none()
             
             if not telegram_user or not telegram_user.is_linked:
-                await update.message.reply_text(
+                await self._reply(
+                    update,
                     "❌ No linked account found.\n"
                     "Use /link to connect your YeeBitz account."
                 )
@@ -250,8 +355,11 @@ class TelegramBotService:
                 )
             )
             await session.commit()
+            linked_identity_cache.invalidate("telegram", user.id)
+            await chat_context_store.clear(user.id)
             
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "✅ Account unlinked successfully!\n"
                 "Use /link to connect again anytime."
             )
@@ -272,7 +380,8 @@ class TelegramBotService:
             row = result.first()
             
             if not row or not row[0]:
-                await update.message.reply_text(
+                await self._reply(
+                    update,
                     "❌ No account record found.\n"
                     "Use /start to initialize and /link to connect."
                 )
@@ -295,68 +404,39 @@ class TelegramBotService:
                     f"Use /link to connect your YeeBitz account."
                 )
                 
-            await update.message.reply_text(status_message)
+            await self._reply(update, status_message)
 
-    async def _check_user_linked(self, telegram_id: int) -> Optional[dict]:
-        """Check if user is linked and return user data"""
-        from models.telegram import TelegramUser
-        from models.user import User
-        
-        async with self.db_session_factory() as session:
-            result = await session.execute(
-                select(TelegramUser, User)
-                .outerjoin(User, TelegramUser.user_id == User.id)
-                .where(TelegramUser.telegram_id == telegram_id)
-            )
-            row = result.first()
-            
-            if not row or not row[0] or not row[0].is_linked or not row[1]:
-                return None
-                
-            telegram_user, linked_user = row
-            return {
-                "telegram_user": telegram_user,
-                "user": linked_user
-            }
+    async def _check_user_linked(self, session: AsyncSession, telegram_id: int) -> Optional[dict]:
+        """Check if user is linked and return user data (cached; queries only on a miss)"""
+        telegram_user, linked_user = await linked_identity_cache.lookup(session, "telegram", telegram_id)
+        if linked_user is None:
+            return None
+            
+        return {
+            "telegram_user": telegram_user,
+            "user": linked_user
+        }
 
     async def documents_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /documents command"""
         user = update.effective_user
         
-        # Check if user is linked
-        user_data = await self._check_user_linked(user.id)
-        if not user_data:
-            await update.message.reply_text(
-                "❌ Please link your account first using /link to access documents."
-            )
-            return
-            
-        # Get user's accessible documents
-        from models.document import Document, DocumentStatus
-        from models.user import UserRole
-        
         async with self.db_session_factory() as session:
-            current_user = user_data["user"]
-            
-            # Build query based on user role
-            query = select(Document).where(Document.status == DocumentStatus.processed)
-            
-            if current_user.role == UserRole.INSTRUCTOR.value:
-                # Instructors can see their own documents and all processed ones
-                from sqlalchemy import or_
-                query = query.where(
-                    or_(
-                        Document.uploaded_by == current_user.id,
-                        Document.status == DocumentStatus.processed
-                    )
+            # Check if user is linked
+            user_data = await self._check_user_linked(session, user.id)
+            if not user_data:
+                await self._reply(
+                    update,
+                    "❌ Please link your account first using /link to access documents."
                 )
-            # Students can only see processed documents (already filtered above)
+                return
             
-            result = await session.execute(query.order_by(Document.created_at.desc()).limit(10))
-            documents = result.scalars().all()
+            # Only documents the user may chat with, so every listed choice works
+            documents = await conversation_engine.list_documents(session, user_data["user"], limit=10)
             
             if not documents:
-                await update.message.reply_text(
+                await self._reply(
+                    update,
                     "📚 No documents available at the moment.\n"
                     "Contact your instructor to upload study materials."
                 )
@@ -374,7 +454,8 @@ class TelegramBotService:
             
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "📚 Available Documents:\n\nSelect a document to interact with:",
                 reply_markup=reply_markup
             )
@@ -384,23 +465,27 @@ class TelegramBotService:
         user = update.effective_user
         
         # Check if user is linked
-        user_data = await self._check_user_linked(user.id)
+        async with self.db_session_factory() as session:
+            user_data = await self._check_user_linked(session, user.id)
         if not user_data:
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "❌ Please link your account first using /link to chat with documents."
             )
             return
             
         # Parse command arguments
         if context.args:
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "💬 To chat with a document:\n"
                 "1. Use /documents to see available documents\n"
                 "2. Select a document and choose 'Chat'\n"
                 "3. Then type your questions normally"
             )
         else:
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "💬 Document Chat\n\n"
                 "First, select a document using /documents, then you can chat with it!\n"
                 "Or use /documents to see available documents."
@@ -411,14 +496,17 @@ class TelegramBotService:
         user = update.effective_user
         
         # Check if user is linked
-        user_data = await self._check_user_linked(user.id)
+        async with self.db_session_factory() as session:
+            user_data = await self._check_user_linked(session, user.id)
         if not user_data:
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "❌ Please link your account first using /link to get study questions."
             )
             return
             
-        await update.message.reply_text(
+        await self._reply(
+            update,
             "❓ Study Questions\n\n"
             "To get study questions for a document:\n"
             "1. Use /documents to see available documents\n"
@@ -431,14 +519,17 @@ class TelegramBotService:
         user = update.effective_user
         
         # Check if user is linked
-        user_data = await self._check_user_linked(user.id)
+        async with self.db_session_factory() as session:
+            user_data = await self._check_user_linked(session, user.id)
         if not user_data:
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "❌ Please link your account first using /link to get document summaries."
             )
             return
             
-        await update.message.reply_text(
+        await self._reply(
+            update,
             "📝 Document Summary\n\n"
             "To get a summary of a document:\n"
             "1. Use /documents to see available documents\n"
@@ -451,29 +542,31 @@ class TelegramBotService:
         user = update.effective_user
         message_text = update.message.text
         
-        # Check if user is linked
-        user_data = await self._check_user_linked(user.id)
-        if not user_data:
-            await update.message.reply_text(
-                "❌ Please link your account first using /link to chat with documents."
-            )
-            return
-        
-        # Check if user has an active chat session
-        if user.id not in user_chat_contexts:
-            await update.message.reply_text(
-                "💬 No active document chat session.\n\n"
-                "To start chatting with a document:\n"
-                "1. Use /documents to see available documents\n"
-                "2. Select a document and choose 'Chat'"
-            )
-            return
-        
-        # Get active document ID
-        document_id = user_chat_contexts[user.id]
-        
-        # Process the chat message
-        await self._process_chat_message(update, document_id, message_text, user_data["user"])
+        # One session for identity resolution, the document fetch and the chat turn
+        async with self.db_session_factory() as session:
+            # Check if user is linked
+            user_data = await self._check_user_linked(session, user.id)
+            if not user_data:
+                await self._reply(
+                    update,
+                    "❌ Please link your account first using /link to chat with documents."
+                )
+                return
+            
+            # Check if user has an active chat session
+            document_id = await chat_context_store.get(user.id)
+            if document_id is None:
+                await self._reply(
+                    update,
+                    "💬 No active document chat session.\n\n"
+                    "To start chatting with a document:\n"
+                    "1. Use /documents to see available documents\n"
+                    "2. Select a document and choose 'Chat'"
+                )
+                return
+            
+            # Process the chat message
+            await self._process_chat_message(update, session, document_id, message_text, user_data["user"])
 
     async def _show_document_options(self, query, document_id: str):
         """Show options for a selected document"""
@@ -484,7 +577,8 @@ class TelegramBotService:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
+        await self._edit(
+            query,
             "📄 Document Options:\n\nWhat would you like to do with this document?",
             reply_markup=reply_markup
         )
@@ -494,106 +588,49 @@ class TelegramBotService:
         user_id = query.from_user.id
         
         # Set user's active chat context
-        user_chat_contexts[user_id] = document_id
+        await chat_context_store.set(user_id, document_id)
         
-        await query.edit_message_text(
+        await self._edit(
+            query,
             "💬 Chat session started!\n\n"
             "You can now type your questions about this document.\n"
             "I'll answer based on the document content.\n\n"
             "Type any question to get started!"
         )
 
-    async def _process_chat_message(self, update: Update, document_id: str, message: str, user):
+    async def _process_chat_message(self, update: Update, session: AsyncSession, document_id: str, message: str, user):
         """Process a chat message with the document"""
         try:
-            from models.document import Document, DocumentChatSession, ChatMessage
-            from services.gemini_service import gemini_service
-            from sqlalchemy import and_
+            # Send typing indicator
+            await update.effective_chat.send_action("typing")
             
-            async with self.db_session_factory() as session:
-                # Get document
-                doc_result = await session.execute(
-                    select(Document).where(Document.id == document_id)
-                )
-                document = doc_result.scalar_one_or_none()
-                
-                if not document:
-                    await update.message.reply_text("❌ Document not found.")
-                    return
-                
-                # Get or create chat session
-                session_result = await session.execute(
-                    select(DocumentChatSession).where(
-                        and_(
-                            DocumentChatSession.document_id == document_id,
-                            DocumentChatSession.user_id == user.id
-                        )
-                    )
-                )
-                chat_session = session_result.scalar_one_or_none()
-                
-                if not chat_session:
-                    chat_session = DocumentChatSession(
-                        document_id=document_id,
-                        user_id=user.id,
-                        session_name=f"Telegram Chat with {document.original_filename}"
-                    )
-                    session.add(chat_session)
-                    await session.commit()
-                    await session.refresh(chat_session)
-                
-                # Save user message
-                user_message = ChatMessage(
-                    session_id=chat_session.id,
-                    role="user",
-                    content=message
-                )
-                session.add(user_message)
-                await session.commit()
-                
-                # Get chat history
-                history_result = await session.execute(
-                    select(ChatMessage)
-                    .where(ChatMessage.session_id == chat_session.id)
-                    .order_by(ChatMessage.created_at.desc())
-                    .limit(20)
-                )
-                chat_history = [
-                    {"role": msg.role, "content": msg.content} 
-                    for msg in reversed(history_result.scalars().all()[:-1])
-                ]
-                
-                # Send typing indicator
-                await update.message.chat.send_action("typing")
-                
-                # Get AI response
-                ai_response_data = await gemini_service.chat_with_document(
-                    document.processed_text,
-                    message,
-                    chat_history
+            # Stream the AI response (charged against the linked user's AI quota)
+            turn = await conversation_engine.run_turn(
+                session,
+                document_id,
+                user,
+                message,
+                channel="telegram",
+                on_stream=lambda chunks: self._stream_reply(update, chunks)
+            )
+            
+            if not turn.success:
+                await self._reply(
+                    update,
+                    "😔 Sorry, I encountered an error while processing your question. Please try again."
                 )
                 
-                if ai_response_data["success"]:
-                    # Save AI response
-                    ai_message = ChatMessage(
-                        session_id=chat_session.id,
-                        role="assistant",
-                        content=ai_response_data["response"],
-                        message_metadata={"model_used": ai_response_data.get("model_used", "unknown")}
-                    )
-                    session.add(ai_message)
-                    await session.commit()
-                    
-                    # Send response to user
-                    await update.message.reply_text(ai_response_data["response"])
-                else:
-                    await update.message.reply_text(
-                        "😔 Sorry, I encountered an error while processing your question. Please try again."
-                    )
-                    
+        except ConversationError as e:
+            await self._reply(update, f"❌ {str(e)}.")
+        except AIQuotaExceeded as e:
+            await self._reply(
+                update,
+                f"⏳ You've reached your AI usage limit. Please try again in {e.retry_after_header} seconds."
+            )
         except Exception as e:
             logger.error(f"Error in chat processing: {str(e)}")
-            await update.message.reply_text(
+            await self._reply(
+                update,
                 "😔 An error occurred while processing your message. Please try again."
             )
 
@@ -604,6 +641,12 @@ class TelegramBotService:
             from services.gemini_service import gemini_service
             
             async with self.db_session_factory() as session:
+                # AI usage is charged to the linked account, the same budget as the web app
+                user_data = await self._check_user_linked(session, query.from_user.id)
+                if not user_data:
+                    await self._edit(query, "❌ Please link your account first using /link to get study questions.")
+                    return
+                
                 # Get document
                 result = await session.execute(
                     select(Document).where(Document.id == document_id)
@@ -611,21 +654,24 @@ class TelegramBotService:
                 document = result.scalar_one_or_none()
                 
                 if not document:
-                    await query.edit_message_text("❌ Document not found.")
+                    await self._edit(query, "❌ Document not found.")
                     return
                 
                 # Check if we have cached questions
                 if document.cached_study_questions:
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         f"❓ Study Questions for {document.original_filename}:\n\n"
                         f"{document.cached_study_questions}"
                     )
                     return
                 
                 # Generate new questions
-                await query.edit_message_text("⏳ Generating study questions...")
+                await self._edit(query, "⏳ Generating study questions...")
                 
-                questions_data = await gemini_service.suggest_study_questions(document.processed_text)
+                questions_data = await gemini_service.suggest_study_questions(
+                    document.processed_text, user_id=user_data["user"].id
+                )
                 
                 if questions_data["success"]:
                     # Cache the questions
@@ -633,18 +679,26 @@ class TelegramBotService:
                     document.questions_generated_at = datetime.utcnow()
                     await session.commit()
                     
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         f"❓ Study Questions for {document.original_filename}:\n\n"
                         f"{questions_data['questions']}"
                     )
                 else:
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         "😔 Sorry, I couldn't generate study questions at the moment. Please try again."
                     )
                     
+        except AIQuotaExceeded as e:
+            await self._edit(
+                query,
+                f"⏳ You've reached your AI usage limit. Please try again in {e.retry_after_header} seconds."
+            )
         except Exception as e:
             logger.error(f"Error generating questions: {str(e)}")
-            await query.edit_message_text(
+            await self._edit(
+                query,
                 "😔 An error occurred while generating questions. Please try again."
             )
 
@@ -655,6 +709,12 @@ class TelegramBotService:
             from services.gemini_service import gemini_service
             
             async with self.db_session_factory() as session:
+                # AI usage is charged to the linked account, the same budget as the web app
+                user_data = await self._check_user_linked(session, query.from_user.id)
+                if not user_data:
+                    await self._edit(query, "❌ Please link your account first using /link to get document summaries.")
+                    return
+                
                 # Get document
                 result = await session.execute(
                     select(Document).where(Document.id == document_id)
@@ -662,21 +722,24 @@ class TelegramBotService:
                 document = result.scalar_one_or_none()
                 
                 if not document:
-                    await query.edit_message_text("❌ Document not found.")
+                    await self._edit(query, "❌ Document not found.")
                     return
                 
                 # Check if we have cached summary
                 if document.cached_summary:
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         f"📝 Summary of {document.original_filename}:\n\n"
                         f"{document.cached_summary}"
                     )
                     return
                 
                 # Generate new summary
-                await query.edit_message_text("⏳ Generating summary...")
+                await self._edit(query, "⏳ Generating summary...")
                 
-                summary_data = await gemini_service.extract_document_summary(document.processed_text)
+                summary_data = await gemini_service.extract_document_summary(
+                    document.processed_text, user_id=user_data["user"].id
+                )
                 
                 if summary_data["success"]:
                     # Cache the summary
@@ -684,18 +747,26 @@ class TelegramBotService:
                     document.summary_generated_at = datetime.utcnow()
                     await session.commit()
                     
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         f"📝 Summary of {document.original_filename}:\n\n"
                         f"{summary_data['summary']}"
                     )
                 else:
-                    await query.edit_message_text(
+                    await self._edit(
+                        query,
                         "😔 Sorry, I couldn't generate a summary at the moment. Please try again."
                     )
                     
+        except AIQuotaExceeded as e:
+            await self._edit(
+                query,
+                f"⏳ You've reached your AI usage limit. Please try again in {e.retry_after_header} seconds."
+            )
         except Exception as e:
             logger.error(f"Error generating summary: {str(e)}")
-            await query.edit_message_text(
+            await self._edit(
+                query,
                 "😔 An error occurred while generating summary. Please try again."
             )
             
@@ -725,7 +796,7 @@ class TelegramBotService:
                 "• /unlink - Disconnect account\n\n"
                 "Need more help? Contact support."
             )
-            await query.edit_message_text(help_message)
+            await self._edit(query, help_message)
         elif query.data == "regenerate_link":
             await self.link_command(update, context)
         elif query.data.startswith("doc_"):
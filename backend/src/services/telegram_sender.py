@@ -0,0 +1,296 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+from loguru import logger
+import asyncio
+import heapq
+import itertools
+import time
+
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from core.config import settings
+from utils.rate_limiter import InMemoryRateLimitBackend
+
+# Lower value is sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Telegram rejects message texts longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+@dataclass
+class OutboundMessage:
+    method: str  # "send_message" or "edit_message_text"
+    chat_id: int
+    priority: int
+    seq: int
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    coalesce_key: Optional[Tuple[int, int]] = None
+
+
+class TelegramSender:
+    """Outbound scheduler that keeps the bot inside Telegram's rate limits.
+
+    Messages queue FIFO per chat; across chats the scheduler dispatches the
+    highest-priority head whose chat and the global bucket both have capacity.
+    Flood-wait errors park the chat for the requested time and retry, and a
+    pending edit of a message absorbs later edits of the same message.
+    """
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        self.buckets = InMemoryRateLimitBackend()
+        self.global_interval = 1 / settings.TELEGRAM_GLOBAL_MESSAGES_PER_SECOND
+        self.chat_interval = 1 / settings.TELEGRAM_CHAT_MESSAGES_PER_SECOND
+        self.group_interval = 60 / settings.TELEGRAM_GROUP_MESSAGES_PER_MINUTE
+
+        self.chats: Dict[int, Deque[OutboundMessage]] = {}
+        self.ready: List[Tuple[int, int, int]] = []  # (priority, seq, chat_id)
+        self.waiting: List[Tuple[float, int]] = []  # (ready_at, chat_id)
+        self.in_flight: set = set()
+        self.deliveries: Dict[asyncio.Task, OutboundMessage] = {}
+        self.pending_edits: Dict[Hashable, OutboundMessage] = {}
+        self.seq = itertools.count()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+        self.started_at = time.monotonic()
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self, bot):
+        """Start the dispatcher on the running event loop"""
+        self.bot = bot
+        if self.running:
+            return
+        self.wakeup = asyncio.Event()
+        self.started_at = time.monotonic()
+        self.task = asyncio.create_task(self._dispatch_loop(), name="telegram-sender")
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued messages up to `timeout` to go out, then stop; whatever is left fails"""
+        if not self.running:
+            return
+        deadline = time.monotonic() + timeout
+        while (self.chats or self.in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+        deliveries = dict(self.deliveries)
+        for task in deliveries:
+            task.cancel()
+        await asyncio.gather(*deliveries, return_exceptions=True)
+
+        # Nothing will send these any more; release everyone awaiting them
+        error = RuntimeError("Telegram sender stopped")
+        abandoned = list(deliveries.values()) + [message for queue in self.chats.values() for message in queue]
+        for message in abandoned:
+            if not message.future.done():
+                message.future.set_exception(error)
+                # Fire-and-forget callers never retrieve it
+                message.future.exception()
+        if abandoned:
+            logger.warning(f"Telegram sender stopped with {len(abandoned)} messages unsent")
+        self.chats.clear()
+        self.ready.clear()
+        self.waiting.clear()
+        self.in_flight.clear()
+        self.pending_edits.clear()
+
+    async def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Queue a new message and wait until Telegram accepts it"""
+        return await self._enqueue("send_message", chat_id, priority, dict(chat_id=chat_id, text=text, **kwargs))
+
+    async def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        priority: int = PRIORITY_INTERACTIVE,
+        **kwargs
+    ):
+        """Queue an edit; a still-pending edit of the same message is replaced instead"""
+        coalesce_key = (chat_id, message_id)
+        pending = self.pending_edits.get(coalesce_key)
+        if pending is not None:
+            pending.kwargs.update(text=text, **kwargs)
+            pending.priority = min(pending.priority, priority)
+            self.coalesced += 1
+            return await asyncio.shield(pending.future)
+
+        return await self._enqueue(
+            "edit_message_text",
+            chat_id,
+            priority,
+            dict(chat_id=chat_id, message_id=message_id, text=text, **kwargs),
+            coalesce_key=coalesce_key
+        )
+
+    async def _enqueue(self, method, chat_id, priority, kwargs, coalesce_key=None):
+        if not self.running:
+            raise RuntimeError("Telegram sender is not running")
+        message = OutboundMessage(
+            method=method,
+            chat_id=chat_id,
+            priority=priority,
+            seq=next(self.seq),
+            kwargs=kwargs,
+            future=asyncio.get_running_loop().create_future(),
+            coalesce_key=coalesce_key
+        )
+        if coalesce_key is not None:
+            self.pending_edits[coalesce_key] = message
+
+        queue = self.chats.get(chat_id)
+        if queue is None:
+            queue = self.chats[chat_id] = deque()
+            queue.append(message)
+            self._schedule(chat_id)
+        else:
+            queue.append(message)
+
+        self.wakeup.set()
+        return await asyncio.shield(message.future)
+
+    def _schedule(self, chat_id: int, ready_at: float = 0.0):
+        """Put a chat with queued messages back in line"""
+        queue = self.chats.get(chat_id)
+        if not queue or chat_id in self.in_flight:
+            return
+        if ready_at > time.monotonic():
+            heapq.heappush(self.waiting, (ready_at, chat_id))
+        else:
+            head = queue[0]
+            heapq.heappush(self.ready, (head.priority, head.seq, chat_id))
+
+    async def _dispatch_loop(self):
+        while True:
+            now = time.monotonic()
+            while self.waiting and self.waiting[0][0] <= now:
+                _, chat_id = heapq.heappop(self.waiting)
+                self._schedule(chat_id)
+
+            if not self.ready:
+                timeout = self.waiting[0][0] - now if self.waiting else None
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Global bucket first, so a denied chat never burns a global token
+            result = await self.buckets.check("global", self.global_interval, 1)
+            if not result.allowed:
+                await asyncio.sleep(result.retry_after)
+                continue
+
+            _, _, chat_id = heapq.heappop(self.ready)
+            interval = self.group_interval if chat_id < 0 else self.chat_interval
+            result = await self.buckets.check(
+                f"chat:{chat_id}", interval, settings.TELEGRAM_CHAT_BURST
+            )
+            if not result.allowed:
+                await self.buckets.check("global", self.global_interval, 1, cost=-1, force=True)
+                heapq.heappush(self.waiting, (time.monotonic() + result.retry_after, chat_id))
+                continue
+
+            message = self.chats[chat_id].popleft()
+            if message.coalesce_key is not None:
+                self.pending_edits.pop(message.coalesce_key, None)
+            self.in_flight.add(chat_id)
+            task = asyncio.create_task(self._deliver(message), name=f"telegram-deliver-{chat_id}")
+            self.deliveries[task] = message
+            task.add_done_callback(self._delivered)
+
+    def _delivered(self, task: asyncio.Task):
+        self.deliveries.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error(f"Telegram delivery task failed: {str(task.exception())}")
+
+    async def _deliver(self, message: OutboundMessage):
+        chat_id = message.chat_id
+        ready_at = 0.0
+        message.attempts += 1
+        try:
+            result = await getattr(self.bot, message.method)(**message.kwargs)
+        except RetryAfter as e:
+            self.flood_waits += 1
+            ready_at = self._requeue(message, float(e.retry_after))
+        except (TimedOut, NetworkError) as e:
+            if message.attempts < settings.TELEGRAM_SEND_MAX_ATTEMPTS:
+                self.retries += 1
+                ready_at = self._requeue(message, 0.5 * 2 ** message.attempts)
+            else:
+                self._finish(message, error=e)
+        except Exception as e:
+            self._finish(message, error=e)
+        else:
+            self._finish(message, result=result)
+        finally:
+            self.in_flight.discard(chat_id)
+            if not self.chats.get(chat_id):
+                self.chats.pop(chat_id, None)
+            else:
+                self._schedule(chat_id, ready_at)
+            self.wakeup.set()
+
+    def _requeue(self, message: OutboundMessage, delay: float) -> float:
+        """Put a message back at the head of its chat and park the chat for `delay`"""
+        self.chats.setdefault(message.chat_id, deque()).appendleft(message)
+        if message.coalesce_key is not None:
+            self.pending_edits.setdefault(message.coalesce_key, message)
+        logger.warning(f"Telegram send to {message.chat_id} deferred {delay:.1f}s (attempt {message.attempts})")
+        return time.monotonic() + delay
+
+    def _finish(self, message: OutboundMessage, result: Any = None, error: Exception = None):
+        latency = time.monotonic() - message.enqueued_at
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if error is not None:
+            self.failed += 1
+            logger.error(f"Telegram {message.method} to {message.chat_id} failed: {str(error)}")
+            if not message.future.done():
+                message.future.set_exception(error)
+        else:
+            self.sent += 1
+            if not message.future.done():
+                message.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, latency and throughput counters"""
+        finished = self.sent + self.failed
+        uptime = time.monotonic() - self.started_at
+        return {
+            "queued": sum(len(queue) for queue in self.chats.values()),
+            "queued_chats": len(self.chats),
+            "in_flight": len(self.in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced_edits": self.coalesced,
+            "retries": self.retries,
+            "flood_waits": self.flood_waits,
+            "avg_queue_latency_ms": round(self.total_latency / finished * 1000, 2) if finished else 0.0,
+            "max_queue_latency_ms": round(self.max_latency * 1000, 2),
+            "messages_per_sec": round(self.sent / uptime, 2) if uptime else 0.0,
+        }
+
+
+# Global instance
+telegram_sender = TelegramSender()
@@ -0,0 +1,453 @@
+from datetime import datetime
+from typing import Optional, Dict, List, Any
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.whatsapp import WhatsAppUser
+from models.user import User
+from schemas.whatsapp import WhatsAppWebhookData
+from services.ai_quota import AIQuotaExceeded
+from services.bot_identity_repository import bot_identity_repository
+from services.chat_context_store import whatsapp_chat_context
+from services.conversation_engine import conversation_engine, ConversationError
+from services.linked_identity_cache import linked_identity_cache
+from services.whatsapp_sender import whatsapp_sender, MAX_TEXT_LENGTH
+from services.whatsapp_status_tracker import whatsapp_status_tracker
+from utils.cache import TTLCache
+from utils.keyed_worker_pool import KeyedWorkerPool, QueueFullError
+from utils.text import split_message
+from utils.tracing import tracer
+from utils.query_monitor import query_monitor
+
+
+class WhatsAppBotService:
+    """WhatsApp bot: webhook batches are acknowledged immediately and processed in the background.
+
+    A single batch stage dedupes messages, resolves every sender in one query
+    and fans messages out to a worker pool keyed by sender, so different
+    senders run concurrently while each sender's messages stay in order.
+    """
+
+    def __init__(self):
+        self.db_session_factory = None
+        self.seen = TTLCache(maxsize=settings.WHATSAPP_DEDUPE_SIZE)
+        self.duplicates = 0
+        self.batch_pool = KeyedWorkerPool(
+            self._process_batch,
+            name="whatsapp-batches",
+            workers=1,
+            max_pending=settings.WHATSAPP_WEBHOOK_QUEUE_SIZE
+        )
+        self.message_pool = KeyedWorkerPool(
+            self._handle_message,
+            name="whatsapp-messages",
+            workers=settings.WHATSAPP_WEBHOOK_WORKERS,
+            max_pending=settings.WHATSAPP_WEBHOOK_QUEUE_SIZE
+        )
+
+    def start(self):
+        """Start the background processors"""
+        from utils.database import init_database, async_session_factory
+        init_database()
+        self.db_session_factory = async_session_factory
+
+        whatsapp_sender.start()
+        whatsapp_status_tracker.start(self.db_session_factory)
+        self.batch_pool.start()
+        self.message_pool.start()
+
+    async def stop(self):
+        """Drain queued batches, then queued messages"""
+        await self.batch_pool.stop(timeout=settings.WHATSAPP_WEBHOOK_DRAIN_SECONDS)
+        await self.message_pool.stop(timeout=settings.WHATSAPP_WEBHOOK_DRAIN_SECONDS)
+        await whatsapp_sender.stop()
+        await whatsapp_status_tracker.stop(timeout=settings.WHATSAPP_STATUS_DRAIN_SECONDS)
+
+    def enqueue_webhook(self, webhook: WhatsAppWebhookData) -> int:
+        """Queue a webhook payload's new messages and buffer its statuses; returns the number of new messages.
+
+        Raises QueueFullError when the batch queue is saturated, so Meta redelivers later.
+        """
+        messages = []
+        statuses = 0
+        profile_names = {}
+        batch_ids = set()
+        for entry in webhook.entry:
+            for change in entry.changes:
+                if change.get("field") != "messages":
+                    continue
+                value = change.get("value", {})
+                # Statuses are write-behind: buffered here, flushed to the database in batches
+                for status in value.get("statuses", []):
+                    whatsapp_status_tracker.record(status)
+                    statuses += 1
+                for contact in value.get("contacts", []):
+                    profile_names[contact.get("wa_id")] = contact.get("profile", {}).get("name")
+                for message in value.get("messages", []):
+                    message_id = message.get("id")
+                    if message_id in batch_ids or (message_id and self.seen.get(message_id) is not None):
+                        self.duplicates += 1
+                        continue
+                    batch_ids.add(message_id)
+                    messages.append(message)
+
+        if not messages:
+            return 0
+
+        self.batch_pool.submit("batches", {
+            "messages": messages,
+            "profile_names": profile_names
+        })
+
+        # Only mark messages seen once accepted, so a rejected payload is processed on redelivery
+        for message_id in batch_ids:
+            if message_id:
+                self.seen.set(message_id, True)
+
+        logger.debug(f"Queued WhatsApp webhook with {len(messages)} messages and {statuses} statuses")
+        return len(messages)
+
+    async def _process_batch(self, batch: Dict[str, Any]):
+        """Resolve all senders of a batch at once and fan messages out per sender (batch worker)"""
+        async with self.db_session_factory() as session:
+            senders = await self.resolve_senders(batch["messages"], batch["profile_names"], session)
+
+        for message in batch["messages"]:
+            phone_number = message.get("from")
+            whatsapp_user = senders.get(phone_number)
+            if whatsapp_user is None:
+                logger.warning(f"Dropping WhatsApp message {message.get('id')} without a sender")
+                continue
+
+            # Wait for room rather than drop; the batch queue absorbs the backpressure
+            try:
+                await self.message_pool.wait_submit(phone_number, (message, whatsapp_user))
+            except QueueFullError:
+                logger.warning(f"Dropping WhatsApp message {message.get('id')}: shutting down")
+
+    async def _handle_message(self, item):
+        """Process one message in its own session (message worker)"""
+        message, whatsapp_user = item
+        with tracer.trace("whatsapp.message", message_type=message.get("type")), query_monitor.track("whatsapp.message"):
+            async with self.db_session_factory() as session:
+                await self.process_message(message, whatsapp_user, session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and dedupe counters for both stages"""
+        return {
+            "duplicates": self.duplicates,
+            "batches": self.batch_pool.stats(),
+            "messages": self.message_pool.stats(),
+            "sender": whatsapp_sender.stats(),
+            "statuses": whatsapp_status_tracker.stats(),
+        }
+
+    async def resolve_senders(
+        self,
+        messages: List[dict],
+        profile_names: Dict[str, Optional[str]],
+        db: AsyncSession
+    ) -> Dict[str, WhatsAppUser]:
+        """Resolve the WhatsApp user behind every message: linked users from cache, the rest in one upsert"""
+        
+        senders = {}
+        profiles = {}
+        for message in messages:
+            phone_number = message.get("from")
+            if phone_number in senders or phone_number in profiles:
+                continue
+            
+            cached = linked_identity_cache.get("whatsapp", phone_number)
+            if cached is not None:
+                senders[phone_number] = cached[0]
+            else:
+                profiles[phone_number] = {
+                    "whatsapp_phone": phone_number,
+                    "whatsapp_name": profile_names.get(phone_number) or message.get("profile", {}).get("name")
+                }
+        
+        if profiles:
+            senders.update(await bot_identity_repository.upsert_whatsapp_users(db, profiles.values()))
+            await db.commit()
+        
+        return senders
+
+    async def process_message(self, message: dict, whatsapp_user: WhatsAppUser, db: AsyncSession):
+        """Process incoming WhatsApp message"""
+        
+        phone_number = message.get("from")
+        message_type = message.get("type")
+        message_id = message.get("id")
+        
+        logger.bind(sample=settings.LOG_HOT_PATH_SAMPLE_RATE).info(
+            f"Processing message {message_id} from {phone_number} of type {message_type}"
+        )
+        
+        # Process different message types
+        if message_type == "text":
+            raw_text = message.get("text", {}).get("body", "").strip()
+            text_content = raw_text.lower()
+            
+            if text_content in ["/start", "start", "hi", "hello"]:
+                await self.send_welcome_message(phone_number)
+            elif text_content in ["/link", "link"]:
+                await self.handle_link_command(whatsapp_user, db)
+            elif text_content in ["/status", "status"]:
+                await self.handle_status_command(whatsapp_user, db)
+            elif text_content in ["/unlink", "unlink"]:
+                await self.handle_unlink_command(whatsapp_user, db)
+            elif text_content in ["/documents", "documents", "docs"]:
+                await self.handle_documents_command(phone_number, db)
+            elif text_content.startswith(("/chat", "chat ")) or text_content == "chat":
+                await self.handle_chat_command(phone_number, text_content.split()[1:], db)
+            elif text_content in ["/end", "end"]:
+                await whatsapp_chat_context.clear(phone_number)
+                await self.send_message(phone_number, "👋 Document chat ended. Send 'documents' to pick another one.")
+            elif await whatsapp_chat_context.get(phone_number) is not None:
+                await self.handle_chat_message(phone_number, raw_text, db)
+            else:
+                await self.send_help_message(phone_number)
+
+    async def _linked_user(self, phone_number: str, db: AsyncSession) -> Optional[User]:
+        """The YeeBitz user behind a phone number, or None after telling them to link"""
+        _, user = await linked_identity_cache.lookup(db, "whatsapp", phone_number)
+        if user is None:
+            await self.send_message(phone_number, "❌ Please link your account first by sending 'link'.")
+        return user
+
+    async def handle_documents_command(self, phone_number: str, db: AsyncSession):
+        """List the documents the user can chat with"""
+        
+        user = await self._linked_user(phone_number, db)
+        if user is None:
+            return
+        
+        documents = await conversation_engine.list_documents(db, user)
+        if not documents:
+            await self.send_message(
+                phone_number,
+                "📚 No documents available at the moment.\n"
+                "Contact your instructor to upload study materials."
+            )
+            return
+        
+        lines = [f"{i}. 📄 {doc.original_filename}" for i, doc in enumerate(documents, start=1)]
+        message = (
+            "📚 Available Documents:\n\n"
+            + "\n".join(lines)
+            + "\n\nSend 'chat <number>' to start chatting with a document."
+        )
+        await self.send_message(phone_number, message)
+
+    async def handle_chat_command(self, phone_number: str, args: List[str], db: AsyncSession):
+        """Make a listed document the user's active chat context"""
+        
+        user = await self._linked_user(phone_number, db)
+        if user is None:
+            return
+        
+        documents = await conversation_engine.list_documents(db, user)
+        if not args or not args[0].isdigit() or not 1 <= int(args[0]) <= len(documents):
+            await self.send_message(
+                phone_number,
+                "💬 To chat with a document, send 'documents' and then 'chat <number>'."
+            )
+            return
+        
+        document = documents[int(args[0]) - 1]
+        await whatsapp_chat_context.set(phone_number, str(document.id))
+        await self.send_message(
+            phone_number,
+            f"💬 Chat session started with {document.original_filename}!\n\n"
+            "Send any question about this document. Send 'end' to stop."
+        )
+
+    async def handle_chat_message(self, phone_number: str, question: str, db: AsyncSession):
+        """Answer a question about the user's active document"""
+        
+        user = await self._linked_user(phone_number, db)
+        if user is None:
+            return
+        
+        document_id = await whatsapp_chat_context.get(phone_number)
+        try:
+            turn = await conversation_engine.run_turn(db, document_id, user, question, channel="whatsapp")
+        except ConversationError as e:
+            await whatsapp_chat_context.clear(phone_number)
+            await self.send_message(phone_number, f"❌ {str(e)}. Send 'documents' to pick another one.")
+            return
+        except AIQuotaExceeded as e:
+            await self.send_message(
+                phone_number,
+                f"⏳ You've reached your AI usage limit. Please try again in {e.retry_after_header} seconds."
+            )
+            return
+        except Exception as e:
+            logger.error(f"Error in WhatsApp chat for {phone_number}: {str(e)}")
+            await db.rollback()
+            turn = None
+        
+        if turn is None or not turn.success:
+            await self.send_message(
+                phone_number,
+                "😔 Sorry, I encountered an error while processing your question. Please try again."
+            )
+            return
+        
+        for part in split_message(turn.response_text, MAX_TEXT_LENGTH):
+            await self.send_message(phone_number, part)
+
+    async def send_welcome_message(self, phone_number: str):
+        """Send welcome message to WhatsApp user"""
+        
+        message = (
+            "🎓 Welcome to YeetBitz Platform!\n\n"
+            "I can help you take tests and access your study materials.\n\n"
+            "Available commands:\n"
+            "• Send 'link' - Link your account\n"
+            "• Send 'status' - Check linking status\n" 
+            "• Send 'unlink' - Unlink your account\n"
+            "• Send 'documents' - Chat with your study materials\n\n"
+            "To get started, please link your YeeBitz account by sending 'link'"
+        )
+        
+        await self.send_message(phone_number, message)
+
+    async def handle_link_command(self, whatsapp_user: WhatsAppUser, db: AsyncSession):
+        """Handle link command from WhatsApp"""
+        
+        if whatsapp_user.is_linked:
+            message = (
+                "✅ Your account is already linked!\n"
+                "Send 'status' to view details or 'unlink' to disconnect."
+            )
+            await self.send_message(whatsapp_user.whatsapp_phone, message)
+            return
+        
+        # Generate link token (implement this similar to Telegram)
+        import secrets
+        import string
+        from datetime import timedelta
+        
+        link_token = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        
+        await db.execute(
+            update(WhatsAppUser)
+            .where(WhatsAppUser.id == whatsapp_user.id)
+            .values(
+                link_token=link_token,
+                link_token_expires_at=expires_at
+            )
+        )
+        await db.commit()
+        
+        link_url = f"{settings.CORS_ORIGINS[0]}/whatsapp/link?token={link_token}"
+        
+        message = (
+            f"🔗 Account Linking\n\n"
+            f"To link your YeeBitz account, open this link in your browser:\n\n"
+            f"👉 {link_url}\n\n"
+            f"Or go to the settings page and paste this token:\n"
+            f"{link_token}\n\n"
+            f"⏰ This link expires in 1 hour.\n"
+            f"🔒 For security, don't share this with others."
+        )
+        
+        await self.send_message(whatsapp_user.whatsapp_phone, message)
+
+    async def handle_status_command(self, whatsapp_user: WhatsAppUser, db: AsyncSession):
+        """Handle status command from WhatsApp"""
+        
+        if whatsapp_user.is_linked:
+            # Get linked user details
+            result = await db.execute(
+                select(User).where(User.id == whatsapp_user.user_id)
+            )
+            linked_user = result.scalar_one_or_none()
+            
+            if linked_user:
+                message = (
+                    f"✅ Account Status: Linked\n\n"
+                    f"👤 YeeBitz Account: {linked_user.full_name}\n"
+                    f"📧 Email: {linked_user.email}\n"
+                    f"🎭 Role: {linked_user.role}\n"
+                    f"🔗 Linked: {whatsapp_user.linked_at.strftime('%Y-%m-%d %H:%M')}\n\n"
+                    f"Ready to take tests! 🎓"
+                )
+            else:
+                message = "❌ Error: Linked user not found. Please contact support."
+        else:
+            message = (
+                "❌ Account Status: Not Linked\n\n"
+                "Send 'link' to connect your YeeBitz account."
+            )
+        
+        await self.send_message(whatsapp_user.whatsapp_phone, message)
+
+    async def handle_unlink_command(self, whatsapp_user: WhatsAppUser, db: AsyncSession):
+        """Handle unlink command from WhatsApp"""
+        
+        if not whatsapp_user.is_linked:
+            message = (
+                "❌ No linked account found.\n"
+                "Send 'link' to connect your YeeBitz account."
+            )
+            await self.send_message(whatsapp_user.whatsapp_phone, message)
+            return
+        
+        # Unlink account
+        await db.execute(
+            update(WhatsAppUser)
+            .where(WhatsAppUser.id == whatsapp_user.id)
+            .values(
+                is_linked=False,
+                user_id=None,
+                linked_at=None,
+                link_token=None,
+                link_token_expires_at=None
+            )
+        )
+        await db.commit()
+        linked_identity_cache.invalidate("whatsapp", whatsapp_user.whatsapp_phone)
+        await whatsapp_chat_context.clear(whatsapp_user.whatsapp_phone)
+        
+        message = (
+            "✅ Account unlinked successfully!\n"
+            "Send 'link' to connect again anytime."
+        )
+        
+        await self.send_message(whatsapp_user.whatsapp_phone, message)
+
+    async def send_help_message(self, phone_number: str):
+        """Send help message to WhatsApp user"""
+        
+        message = (
+            "🎓 YeeBitz Platform Bot Help\n\n"
+            "Available commands:\n"
+            "• Send 'start' - Welcome message\n"
+            "• Send 'link' - Link your account\n"
+            "• Send 'status' - Check status\n"
+            "• Send 'unlink' - Disconnect account\n"
+            "• Send 'documents' - List documents\n"
+            "• Send 'chat <number>' - Chat with a document\n"
+            "• Send 'end' - Stop chatting\n\n"
+            "Need more help? Contact support."
+        )
+        
+        await self.send_message(phone_number, message)
+
+    async def send_message(self, phone_number: str, message: str) -> Optional[str]:
+        """Send WhatsApp message via the pooled Cloud API sender"""
+        
+        try:
+            return await whatsapp_sender.send_text(phone_number, message)
+        except Exception:
+            # The sender already logged the failure; a reply must not break the handler
+            return None
+
+
+# Global instance
+whatsapp_bot = WhatsAppBotService()
@@ -0,0 +1,219 @@
+from typing import Any, Dict, Iterable, List, Optional
+from loguru import logger
+import asyncio
+import importlib.util
+import time
+
+import httpx
+
+from core.config import settings
+from utils.lifecycle import lifecycle
+from utils.rate_limiter import InMemoryRateLimitBackend
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# The Cloud API rejects text bodies longer than this
+MAX_TEXT_LENGTH = 4096
+
+
+class WhatsAppSendError(Exception):
+    """Raised when the Cloud API rejects a message or retries are exhausted"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class WhatsAppSender:
+    """Outbound WhatsApp Cloud API client on one shared, connection-pooled httpx.AsyncClient.
+
+    Sends to the same number go out in order and are paced per recipient;
+    across recipients they share a global rate and a concurrency bound.
+    429 and 5xx responses are retried with backoff, honouring Retry-After.
+    """
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        access_token: Optional[str] = None,
+        phone_number_id: Optional[str] = None
+    ):
+        self.api_url = api_url or settings.WHATSAPP_API_URL
+        self.access_token = access_token or settings.WHATSAPP_ACCESS_TOKEN
+        self.phone_number_id = phone_number_id or settings.WHATSAPP_PHONE_NUMBER_ID
+        self.client: Optional[httpx.AsyncClient] = None
+
+        self.buckets = InMemoryRateLimitBackend()
+        self.global_interval = 1 / settings.WHATSAPP_MESSAGES_PER_SECOND
+        self.recipient_interval = 1 / settings.WHATSAPP_RECIPIENT_MESSAGES_PER_SECOND
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        # recipient -> [lock, users]; dropped once nobody holds or waits on it
+        self.recipient_locks: Dict[str, list] = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.paced = 0
+        self.total_latency = 0.0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.access_token and self.phone_number_id)
+
+    @property
+    def running(self) -> bool:
+        return self.client is not None
+
+    def start(self):
+        """Create the shared HTTP client (idempotent)"""
+        if self.client is not None:
+            return
+        self.semaphore = asyncio.Semaphore(settings.WHATSAPP_SEND_CONCURRENCY)
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.api_url.rstrip('/')}/{settings.WHATSAPP_API_VERSION}/{self.phone_number_id}",
+            headers={"Authorization": f"Bearer {self.access_token}"},
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.WHATSAPP_SEND_CONCURRENCY,
+                max_keepalive_connections=settings.WHATSAPP_SEND_CONCURRENCY,
+                keepalive_expiry=30
+            ),
+            timeout=httpx.Timeout(settings.WHATSAPP_SEND_TIMEOUT)
+        )
+
+    def after_fork(self):
+        """Forget the client and locks a preloading master may have created"""
+        self.client = None
+        self.semaphore = None
+        self.recipient_locks = {}
+
+    async def stop(self):
+        """Close pooled connections; later sends fail until start() is called again"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def send_text(self, to: str, text: str) -> Optional[str]:
+        """Send a text message; returns the WhatsApp message id"""
+        return await self.send(to, {
+            "type": "text",
+            "text": {"preview_url": False, "body": text}
+        })
+
+    async def send_template(
+        self,
+        to: str,
+        name: str,
+        language: str = "en",
+        components: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[str]:
+        """Send a template message; returns the WhatsApp message id"""
+        template = {"name": name, "language": {"code": language}}
+        if components:
+            template["components"] = components
+        return await self.send(to, {"type": "template", "template": template})
+
+    async def send(self, to: str, message: Dict[str, Any]) -> Optional[str]:
+        """Send a Cloud API message payload to one recipient, in order with earlier sends to them"""
+        if not self.configured:
+            logger.debug(f"WhatsApp not configured, not sending {message.get('type')} message to {to}")
+            return None
+        if not self.running:
+            # Never reopen a client after shutdown: nothing would close it
+            logger.warning(f"WhatsApp sender is not running, not sending {message.get('type')} message to {to}")
+            raise WhatsAppSendError("WhatsApp sender is not running")
+
+        payload = {"messaging_product": "whatsapp", "recipient_type": "individual", "to": to, **message}
+        entry = self.recipient_locks.setdefault(to, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._pace(f"to:{to}", self.recipient_interval, settings.WHATSAPP_RECIPIENT_BURST)
+                return await self._post(to, payload)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.recipient_locks[to]
+
+    async def broadcast(self, recipients: Iterable[str], message: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one payload to many recipients in concurrent batches.
+
+        Returns recipient -> message id, or the exception for failed sends.
+        """
+        recipients = list(dict.fromkeys(recipients))
+        results: Dict[str, Any] = {}
+        batch_size = settings.WHATSAPP_BROADCAST_BATCH_SIZE
+        for i in range(0, len(recipients), batch_size):
+            batch = recipients[i:i + batch_size]
+            outcomes = await asyncio.gather(
+                *(self.send(to, message) for to in batch),
+                return_exceptions=True
+            )
+            results.update(zip(batch, outcomes))
+        return results
+
+    async def _pace(self, key: str, interval: float, burst: int):
+        """Wait until a GCRA bucket has room"""
+        while True:
+            result = await self.buckets.check(key, interval, burst)
+            if result.allowed:
+                return
+            self.paced += 1
+            await asyncio.sleep(result.retry_after)
+
+    async def _post(self, to: str, payload: Dict[str, Any]) -> Optional[str]:
+        started = time.monotonic()
+        for attempt in range(1, settings.WHATSAPP_SEND_MAX_ATTEMPTS + 1):
+            await self._pace("global", self.global_interval, 1)
+            try:
+                async with self.semaphore:
+                    response = await self.client.post("/messages", json=payload)
+            except httpx.TransportError as e:
+                error = WhatsAppSendError(f"Transport error: {str(e)}")
+                delay = 0.5 * 2 ** attempt
+            else:
+                if response.status_code < 300:
+                    self.sent += 1
+                    self.total_latency += time.monotonic() - started
+                    messages = response.json().get("messages") or [{}]
+                    return messages[0].get("id")
+
+                error = WhatsAppSendError(
+                    f"Cloud API error {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+                try:
+                    delay = float(response.headers["retry-after"])
+                except (KeyError, ValueError):
+                    delay = 0.5 * 2 ** attempt
+
+            if attempt < settings.WHATSAPP_SEND_MAX_ATTEMPTS:
+                self.retries += 1
+                logger.warning(f"WhatsApp send to {to} retrying in {delay:.1f}s (attempt {attempt}): {str(error)}")
+                await asyncio.sleep(delay)
+
+        self.failed += 1
+        logger.error(f"WhatsApp send to {to} failed: {str(error)}")
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """Delivery counters"""
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "paced": self.paced,
+            "waiting_recipients": len(self.recipient_locks),
+            "avg_send_latency_ms": round(self.total_latency / self.sent * 1000, 2) if self.sent else 0.0,
+        }
+
+
+# Global instance
+whatsapp_sender = WhatsAppSender()
+lifecycle.on_fork("whatsapp_sender", whatsapp_sender.after_fork)
@@ -0,0 +1,191 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from loguru import logger
+import asyncio
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from models.whatsapp import WhatsAppMessageStatus
+
+# Later lifecycle stages win, whatever order the webhooks arrive in
+STATUS_RANKS = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+# Rows per INSERT statement, well under Postgres' bind parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+
+def parse_status_event(status: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Turn a Cloud API status webhook object into a statuses row, or None if unusable"""
+    message_id = status.get("id")
+    rank = STATUS_RANKS.get(status.get("status"))
+    if not message_id or rank is None:
+        return None
+
+    try:
+        status_at = datetime.fromtimestamp(int(status.get("timestamp")), tz=timezone.utc)
+    except (TypeError, ValueError):
+        status_at = datetime.now(timezone.utc)
+
+    error = (status.get("errors") or [{}])[0]
+    return {
+        "message_id": message_id,
+        "recipient_phone": status.get("recipient_id"),
+        "status": status["status"],
+        "status_rank": rank,
+        "status_at": status_at,
+        "conversation_id": (status.get("conversation") or {}).get("id"),
+        "pricing_category": (status.get("pricing") or {}).get("category"),
+        "error_code": error.get("code"),
+        "error_title": error.get("title"),
+    }
+
+
+def _supersedes(row: Dict[str, Any], current: Optional[Dict[str, Any]]) -> bool:
+    return current is None or (row["status_rank"], row["status_at"]) > (current["status_rank"], current["status_at"])
+
+
+class WhatsAppStatusTracker:
+    """Write-behind store for delivery statuses.
+
+    Events are coalesced in memory to the latest status per message and
+    flushed as multi-row upserts every WHATSAPP_STATUS_FLUSH_INTERVAL_MS or
+    once WHATSAPP_STATUS_FLUSH_MAX_EVENTS messages are pending, so bursts
+    of callbacks never cost a database round trip per event.
+    """
+
+    def __init__(self):
+        self.db_session_factory = None
+        self.buffer: Dict[str, Dict[str, Any]] = {}
+        self.flush_interval = settings.WHATSAPP_STATUS_FLUSH_INTERVAL_MS / 1000
+        self.flush_max_events = settings.WHATSAPP_STATUS_FLUSH_MAX_EVENTS
+        self.max_buffered = settings.WHATSAPP_STATUS_BUFFER_MAX
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def start(self, db_session_factory):
+        """Start the background flusher on the running event loop"""
+        self.db_session_factory = db_session_factory
+        if self.task is not None and not self.task.done():
+            return
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._flush_loop(), name="whatsapp-status-flusher")
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Stop the flusher and write whatever is still buffered, giving up after `timeout`"""
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        pending = len(self.buffer)
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += pending
+            logger.warning(f"WhatsApp status tracker stopped before writing {pending} statuses")
+
+    def record(self, status: Dict[str, Any]):
+        """Buffer a status webhook event (no I/O)"""
+        row = parse_status_event(status)
+        if row is None:
+            return
+        self.received += 1
+        self._merge(row)
+
+        if len(self.buffer) >= self.flush_max_events and self.wakeup is not None:
+            self.wakeup.set()
+
+    def _merge(self, row: Dict[str, Any]):
+        current = self.buffer.get(row["message_id"])
+        if current is not None:
+            self.coalesced += 1
+            if _supersedes(row, current):
+                self.buffer[row["message_id"]] = row
+            return
+
+        if len(self.buffer) >= self.max_buffered:
+            # The database is not keeping up; shed instead of growing without bound
+            self.dropped += 1
+            return
+        self.buffer[row["message_id"]] = row
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write buffered statuses in batched upserts; returns the number of rows written"""
+        if not self.buffer or self.db_session_factory is None:
+            return 0
+
+        rows = list(self.buffer.values())
+        self.buffer = {}
+        try:
+            await self._write(rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Failed to flush {len(rows)} WhatsApp statuses: {str(e)}")
+            # Put them back for the next flush, unless newer events arrived meanwhile
+            for row in rows:
+                if _supersedes(row, self.buffer.get(row["message_id"])):
+                    self._merge(row)
+            return 0
+
+        self.flushes += 1
+        self.rows_written += len(rows)
+        return len(rows)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        table = WhatsAppMessageStatus.__table__
+        async with self.db_session_factory() as session:
+            for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                stmt = insert(table).values(rows[i:i + UPSERT_CHUNK_SIZE])
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.message_id],
+                    set_={
+                        "status": excluded.status,
+                        "status_rank": excluded.status_rank,
+                        "status_at": excluded.status_at,
+                        "recipient_phone": func.coalesce(excluded.recipient_phone, table.c.recipient_phone),
+                        "conversation_id": func.coalesce(excluded.conversation_id, table.c.conversation_id),
+                        "pricing_category": func.coalesce(excluded.pricing_category, table.c.pricing_category),
+                        "error_code": excluded.error_code,
+                        "error_title": excluded.error_title,
+                        "updated_at": func.now(),
+                    },
+                    # Never let a late or lesser event overwrite a newer status
+                    where=tuple_(excluded.status_rank, excluded.status_at)
+                    > tuple_(table.c.status_rank, table.c.status_at)
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer and flush counters"""
+        return {
+            "buffered": len(self.buffer),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+# Global instance
+whatsapp_status_tracker = WhatsAppStatusTracker()
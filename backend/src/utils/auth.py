@@ -2,51 +2,171 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, inspect
 from datetime import datetime
+from typing import Optional
+from loguru import logger
+import asyncio
+import time
 
 from core.config import settings
-from models.user import User
+from models.user import User, UserRole
+from utils.cache import TTLCache
 from utils.database import get_db_session
+from utils.redis_client import get_redis
+from utils.tracing import tracer
 
 security = HTTPBearer()
 
+# Per-worker caches: verified token -> user id, and user id -> User column snapshot.
+# Deactivations and role changes evict the snapshot in every worker through
+# invalidate_user(); the TTL only bounds staleness when a signal is lost.
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE)
+user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+_user_columns = [attr.key for attr in inspect(User).column_attrs]
+
+# Redis pub/sub channel carrying evictions to the other workers ("*" drops every user)
+USER_INVALIDATION_CHANNEL = "auth:user-invalidations"
+_ALL_USERS = "*"
+
+
+def _evict(user_id: str):
+    if user_id == _ALL_USERS:
+        user_cache.clear()
+        token_cache.clear()
+    else:
+        user_cache.pop(user_id)
+
+
+async def _publish(user_id: str):
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.publish(USER_INVALIDATION_CHANNEL, user_id)
+    except Exception as e:
+        logger.warning(f"Could not publish user cache invalidation for {user_id}: {str(e)}")
+
+
+async def invalidate_user(user_id) -> None:
+    """Drop a cached user in every worker, e.g. after deactivation or a role change"""
+    _evict(str(user_id))
+    await _publish(str(user_id))
+
+
+async def invalidate_all_users() -> None:
+    """Drop every cached user and verified token in every worker"""
+    _evict(_ALL_USERS)
+    await _publish(_ALL_USERS)
+
+
+async def listen_for_user_invalidations(retry_delay: float = 1.0):
+    """Apply other workers' invalidations to this worker's caches (runs until cancelled).
+
+    Without REDIS_URL an invalidation only reaches the worker that made it.
+    Messages sent while the subscription is down are lost, so every
+    (re)subscribe starts from an empty user cache.
+    """
+    if get_redis() is None:
+        return
+    
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+            user_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _evict(message["data"].decode())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"User invalidation subscription lost, retrying: {str(e)}")
+            await asyncio.sleep(retry_delay)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
+
+
+def _token_ttl(payload: dict) -> Optional[float]:
+    """Seconds a verified token may be served from cache (never past its exp claim)"""
+    exp = payload.get("exp")
+    if exp is None:
+        return settings.AUTH_USER_CACHE_TTL
+    return float(exp) - time.time()
+
+
+def _cached_user(user_id: str) -> Optional[User]:
+    """Build a fresh, detached User from the cached snapshot"""
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        return None
+    return User(**snapshot)
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db_session)
 ) -> User:
     """Get current authenticated user from JWT token"""
-    
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
+    with tracer.span("auth.current_user") as span:
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        user_id: str = payload.get("sub")
+
+        token = credentials.credentials
+        user_id: Optional[str] = token_cache.get(token)
+
         if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    # Get user from database
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
-    if user is None:
-        raise credentials_exception
-    
-    if not user.is_active:
+            try:
+                payload = jwt.decode(
+                    token,
+                    settings.SECRET_KEY,
+                    algorithms=[settings.ALGORITHM]
+                )
+                user_id = payload.get("sub")
+                if user_id is None:
+                    raise credentials_exception
+            except JWTError:
+                raise credentials_exception
+
+            ttl = _token_ttl(payload)
+            if ttl > 0:
+                token_cache.set(token, user_id, ttl=ttl)
+
+        user = _cached_user(user_id) if settings.AUTH_USER_CACHE_TTL > 0 else None
+        span.set_attribute("cached", user is not None)
+
+        if user is None:
+            # Get user from database
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalar_one_or_none()
+
+            if user is None:
+                raise credentials_exception
+
+            if settings.AUTH_USER_CACHE_TTL > 0:
+                user_cache.set(user_id, {key: getattr(user, key) for key in _user_columns})
+
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Inactive user"
+            )
+
+        return user
+
+
+async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Dependency allowing only admin users"""
+    if current_user.role != UserRole.ADMIN.value:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Inactive user"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
         )
-    
-    return user
\ No newline at end of file
+    return current_user
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from typing import AsyncGenerator
 from core.config import settings
+from utils.lifecycle import lifecycle
 
 # Global variables for engine and session factory
 engine = None
@@ -19,6 +20,11 @@ def init_database():
             else:
                 raise ValueError("DATABASE_URL must be a PostgreSQL connection string")
         
+        engine_options = {}
+        if settings.ENABLE_METRICS:
+            from utils.metrics import InstrumentedQueuePool
+            engine_options["poolclass"] = InstrumentedQueuePool
+        
         engine = create_async_engine(
             database_url,
             echo=settings.DEBUG,
@@ -26,9 +32,20 @@ def init_database():
             pool_pre_ping=True,
             pool_recycle=300,
             pool_size=settings.DATABASE_POOL_SIZE,
-            max_overflow=settings.DATABASE_MAX_OVERFLOW
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            **engine_options
         )
         
+        if settings.ENABLE_METRICS:
+            from utils.metrics import instrument_engine
+            instrument_engine(engine)
+        if settings.TRACING_ENABLED:
+            from utils.tracing import tracer
+            tracer.instrument_engine(engine)
+        if settings.QUERY_MONITOR_ENABLED:
+            from utils.query_monitor import query_monitor
+            query_monitor.instrument_engine(engine)
+        
         async_session_factory = async_sessionmaker(
             engine,
             class_=AsyncSession,
@@ -46,6 +63,13 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+def _reset_after_fork():
+    """Give a forked worker its own pool; inherited connections belong to the master"""
+    if engine is not None:
+        engine.sync_engine.dispose(close=False)
+
+lifecycle.on_fork("database", _reset_after_fork)
+
 async def close_database():
     """Close database engine"""
     global engine
@@ -0,0 +1,50 @@
+from fastapi import Response
+from datetime import datetime
+from typing import Optional, Dict
+
+from core.config import settings
+
+
+def build_etag(generated_at: datetime, digest: str) -> str:
+    """Build a strong ETag from an artifact's generation time and content hash"""
+    return f'"{digest}-{int(generated_at.timestamp() * 1_000_000):x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 7232)"""
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def artifact_cache_headers(etag: str) -> Dict[str, str]:
+    """Caching headers for a cached AI artifact response"""
+    max_age = settings.ARTIFACT_CACHE_MAX_AGE
+
+    if settings.ARTIFACT_CACHE_PUBLIC:
+        # Only enable behind a proxy that authenticates requests itself
+        cache_control = f"public, max-age={max_age}, s-maxage={max_age}"
+    else:
+        cache_control = f"private, max-age={max_age}, must-revalidate"
+
+    return {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Vary": "Authorization",
+    }
+
+
+def not_modified_response(etag: str) -> Response:
+    """Empty 304 response carrying the current validators"""
+    return Response(status_code=304, headers=artifact_cache_headers(etag))
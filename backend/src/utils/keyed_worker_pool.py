@@ -0,0 +1,149 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+from loguru import logger
+import asyncio
+import time
+
+from utils.cache import TTLCache
+
+
+class QueueFullError(Exception):
+    """Raised when the pool cannot accept more work (backpressure)"""
+
+
+class KeyedWorkerPool:
+    """Bounded worker pool: items run sequentially per key and in parallel across keys.
+
+    Items carrying an id are deduplicated against a bounded seen-set, so
+    redelivered webhooks are dropped instead of processed twice.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        name: str,
+        workers: int = 8,
+        max_pending: int = 1000,
+        dedupe_size: int = 10000
+    ):
+        self.handler = handler
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.seen = TTLCache(maxsize=dedupe_size)
+
+        # key -> items waiting behind the one currently running for that key
+        self.pending: Dict[Hashable, Deque[Tuple[float, Any]]] = {}
+        self.ready: Optional[asyncio.Queue] = None
+        # Set whenever a pending item is taken (or the pool stops), waking wait_submit()
+        self.room: Optional[asyncio.Event] = None
+        self.tasks: List[asyncio.Task] = []
+        self.accepting = False
+
+        self.pending_count = 0
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    def start(self):
+        """Start worker tasks on the running event loop"""
+        if self.tasks:
+            return
+        self.ready = asyncio.Queue()
+        self.room = asyncio.Event()
+        self.accepting = True
+        self.tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    def submit(self, key: Hashable, item: Any, item_id: Optional[Hashable] = None) -> bool:
+        """Enqueue an item; returns False for duplicates, raises QueueFullError when saturated"""
+        if item_id is not None and self.seen.get(item_id) is not None:
+            self.duplicates += 1
+            return False
+
+        if not self.accepting or self.pending_count >= self.max_pending:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.pending_count} pending)")
+
+        if item_id is not None:
+            self.seen.set(item_id, True)
+
+        queue = self.pending.get(key)
+        if queue is None:
+            queue = self.pending[key] = deque()
+            self.ready.put_nowait(key)
+
+        queue.append((time.monotonic(), item))
+        self.pending_count += 1
+        return True
+
+    async def wait_submit(self, key: Hashable, item: Any, item_id: Optional[Hashable] = None) -> bool:
+        """Enqueue an item, waiting for room instead of raising; raises QueueFullError once the pool stops"""
+        while self.accepting and self.pending_count >= self.max_pending:
+            self.room.clear()
+            await self.room.wait()
+        return self.submit(key, item, item_id)
+
+    async def _worker(self):
+        while True:
+            key = await self.ready.get()
+            queue = self.pending[key]
+            enqueued_at, item = queue.popleft()
+            self.pending_count -= 1
+            self.room.set()
+            self.active += 1
+            self.total_wait += time.monotonic() - enqueued_at
+
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"{self.name} handler failed for key {key}: {str(e)}")
+            finally:
+                self.active -= 1
+                # Requeue the key behind other keys so one busy chat cannot starve the rest
+                if queue:
+                    self.ready.put_nowait(key)
+                else:
+                    del self.pending[key]
+                self.ready.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop accepting work, drain what is queued for up to `timeout`, then cancel workers"""
+        self.accepting = False
+        if not self.tasks:
+            return
+        self.room.set()
+
+        try:
+            await asyncio.wait_for(self.ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{self.name} stopped with {self.pending_count} pending and {self.active} active items"
+            )
+
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Backpressure and throughput counters"""
+        started = self.processed + self.failed + self.active
+        return {
+            "pending": self.pending_count,
+            "pending_keys": len(self.pending),
+            "active": self.active,
+            "max_pending": self.max_pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+        }
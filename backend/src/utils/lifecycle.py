@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from loguru import logger
+import gc
+import os
+import threading
+
+from utils.service_registry import service_registry
+
+
+class WorkerLifecycle:
+    """Per-process resources under a preloaded (forking) gunicorn master.
+
+    With preload_app the app is imported once in the master and every
+    worker is a fork of it. Threads do not survive fork, and sockets,
+    connection pools and clients would be shared by every worker, so:
+
+    - thread pools come from executor(), created on first use in the
+      process that uses them and never inherited
+    - modules holding such state register an on_fork() hook that drops
+      what the worker inherited (gunicorn's post_fork runs after_fork())
+    - the master preloads fork-safe, read-only resources (parser modules,
+      tokenizer data) and freezes the GC so workers share those pages
+      copy-on-write instead of each loading their own
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.fork_hooks: Dict[str, Callable[[], None]] = {}
+        self.executors: Dict[str, ThreadPoolExecutor] = {}
+        self.lock = threading.Lock()
+
+    def on_fork(self, name: str, hook: Callable[[], None]):
+        """Run hook in each new worker to discard state inherited from the master"""
+        self.fork_hooks[name] = hook
+
+    def executor(self, name: str, max_workers: int) -> ThreadPoolExecutor:
+        """This process's thread pool for name"""
+        executor = self.executors.get(name)
+        if executor is None:
+            with self.lock:
+                executor = self.executors.get(name)
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                    self.executors[name] = executor
+        return executor
+
+    def preload(self):
+        """Load fork-safe resources in the master, then freeze them out of the GC (call before forking)"""
+        service_registry.preload()
+        # Collections in the workers would otherwise touch (and copy) every preloaded object
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Preloaded shared resources; {gc.get_freeze_count()} objects frozen")
+
+    def after_fork(self):
+        """Drop inherited executors, clients and pools in a new worker (idempotent)"""
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        # The inherited pools have no threads in this process; never shut them down here
+        self.executors = {}
+        self.lock = threading.Lock()
+        for name, hook in self.fork_hooks.items():
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Fork hook {name} failed in worker {self.pid}: {str(e)}")
+
+    def shutdown(self):
+        """Stop this worker's thread pools without waiting for queued work"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.executors = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": self.pid,
+            "executors": {name: executor._max_workers for name, executor in self.executors.items()},
+            "gc_frozen": gc.get_freeze_count(),
+        }
+
+
+# Global instance
+lifecycle = WorkerLifecycle()
+lifecycle.on_fork("service_registry", service_registry.after_fork)
@@ -0,0 +1,257 @@
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, TextIO, Tuple
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+
+import orjson
+from loguru import logger
+
+from core.config import settings
+from utils.tracing import tracer
+
+# Set per HTTP request by RequestContextMiddleware
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Records at or above this level are never rate limited or sampled
+WARNING_LEVEL = 30
+
+
+def truncate(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}… (+{len(text) - limit} chars)"
+    return text
+
+
+class LogRateLimiter:
+    """Per-logger budget of records per one-second window"""
+
+    def __init__(self, per_second: int):
+        self.per_second = per_second
+        self.windows: Dict[str, list] = {}  # logger name -> [window start, records]
+        self.suppressed: Counter = Counter()
+        self.total_suppressed = 0
+
+    def allow(self, name: str) -> bool:
+        if not self.per_second:
+            return True
+        now = time.monotonic()
+        window = self.windows.get(name)
+        if window is None or now - window[0] >= 1:
+            self.windows[name] = [now, 1]
+            return True
+        if window[1] < self.per_second:
+            window[1] += 1
+            return True
+        self.suppressed[name] += 1
+        self.total_suppressed += 1
+        return False
+
+
+class QueuedLogSink:
+    """loguru sink that hands records to a writer thread instead of writing them inline.
+
+    The logging call only captures the record with the current request and
+    trace ids and appends it to a bounded queue; formatting (JSON or text),
+    truncation and the blocking write happen on the writer thread. When the
+    queue is full new records are dropped and counted, so a log storm can
+    slow the writer but never the event loop.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        json_format: bool = True,
+        max_queue: int = 10000,
+        max_message_length: int = 2000,
+        rate_limit: int = 0,
+        flush_interval: float = 0.05
+    ):
+        self.stream = stream or sys.stdout
+        self.json_format = json_format
+        self.max_queue = max_queue
+        self.max_message_length = max_message_length
+        self.flush_interval = flush_interval
+        self.limiter = LogRateLimiter(rate_limit)
+        self.queue: Deque[Tuple[Dict[str, Any], Optional[str], Optional[str]]] = deque()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write out everything queued and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def after_fork(self):
+        """Restart the writer in a forked child (the parent's thread did not survive the fork)"""
+        running = self.thread is not None
+        # Records queued before the fork are the master's to write
+        self.queue.clear()
+        self.thread = None
+        if running:
+            self.start()
+
+    def filter(self, record: Dict[str, Any]) -> bool:
+        """Per-call sampling (``logger.bind(sample=0.01)``) and per-logger rate limits below WARNING"""
+        if record["level"].no >= WARNING_LEVEL:
+            return True
+        sample = record["extra"].get("sample")
+        if sample is not None and random.random() >= sample:
+            self.sampled_out += 1
+            return False
+        return self.limiter.allow(record["name"])
+
+    def __call__(self, message):
+        # Runs in the logging thread: capture the context, defer everything else
+        if len(self.queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self.queue.append((message.record, request_id_var.get(), tracer.current_trace_id()))
+
+    def _run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        lines = []
+        while self.queue:
+            try:
+                lines.append(self.format(*self.queue.popleft()))
+            except IndexError:
+                break
+            except Exception as e:
+                lines.append(f"Failed to format log record: {e!r}\n")
+
+        suppressed = self.limiter.suppressed
+        if suppressed:
+            self.limiter.suppressed = Counter()
+            for name, count in suppressed.items():
+                lines.append(self._suppressed_line(name, count))
+
+        if not lines:
+            return
+        try:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+            self.written += len(lines)
+        except Exception:
+            # Nowhere left to report it
+            self.dropped += len(lines)
+
+    def format(self, record: Dict[str, Any], request_id: Optional[str], trace_id: Optional[str]) -> str:
+        message = truncate(record["message"], self.max_message_length)
+        exception = None
+        if record["exception"] is not None:
+            exc_type, exc_value, exc_traceback = record["exception"]
+            exception = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+
+        if not self.json_format:
+            ids = "".join(f" [{label}={value}]" for label, value in (("req", request_id), ("trace", trace_id)) if value)
+            line = (
+                f"{record['time']:%Y-%m-%d %H:%M:%S} | {record['level'].name: <8} | "
+                f"{record['name']}:{record['function']}:{record['line']} - {message}{ids}\n"
+            )
+            return line + exception if exception else line
+
+        entry = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": message,
+            "pid": record["process"].id,
+        }
+        if request_id:
+            entry["request_id"] = request_id
+        if trace_id:
+            entry["trace_id"] = trace_id
+        extra = {key: value for key, value in record["extra"].items() if key != "sample"}
+        if extra:
+            entry["extra"] = extra
+        if exception:
+            # The end of a traceback (innermost frame and the error) matters most
+            limit = self.max_message_length * 4
+            entry["exception"] = exception if len(exception) <= limit else "…" + exception[-limit:]
+        return orjson.dumps(entry, default=str).decode() + "\n"
+
+    def _suppressed_line(self, name: str, count: int) -> str:
+        message = f"Rate limited {count} log records from {name}"
+        if not self.json_format:
+            return f"{time.strftime('%Y-%m-%d %H:%M:%S')} | WARNING  | {name} - {message}\n"
+        return orjson.dumps({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "level": "WARNING",
+            "logger": name,
+            "message": message,
+            "suppressed": count,
+            "pid": os.getpid(),
+        }).decode() + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.queue),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "rate_limited": self.limiter.total_suppressed,
+        }
+
+
+# The sink installed by configure_logging(), restarted in forked children
+_active_sink: Optional[QueuedLogSink] = None
+
+
+def _after_fork_in_child():
+    if _active_sink is not None:
+        _active_sink.after_fork()
+
+
+# Registered once: at-fork hooks cannot be removed, so they must not hold on to a sink
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> QueuedLogSink:
+    """Route loguru through a queued sink honouring LOG_FORMAT and LOG_LEVEL, replacing any previous one"""
+    global _active_sink
+    sink = QueuedLogSink(
+        stream=stream,
+        json_format=settings.LOG_FORMAT.lower() == "json",
+        max_queue=settings.LOG_QUEUE_SIZE,
+        max_message_length=settings.LOG_MAX_MESSAGE_LENGTH,
+        rate_limit=settings.LOG_RATE_LIMIT_PER_SECOND,
+        flush_interval=settings.LOG_FLUSH_INTERVAL
+    )
+    logger.remove()
+    logger.add(
+        sink,
+        level="DEBUG" if settings.DEBUG else settings.LOG_LEVEL,
+        format="{message}",
+        filter=sink.filter,
+        backtrace=False,
+        diagnose=False
+    )
+    if _active_sink is not None:
+        _active_sink.stop()
+    _active_sink = sink
+    sink.start()
+    return sink
@@ -0,0 +1,197 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from loguru import logger
+import asyncio
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.config import settings
+from utils.lifecycle import lifecycle
+
+# Set (by gunicorn.conf.py) before prometheus_client is imported; values then
+# live in per-process files that the gunicorn master aggregates
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections checked out of the pool",
+    multiprocess_mode="livesum"
+)
+
+GEMINI_REQUEST_DURATION = Histogram(
+    "gemini_request_duration_seconds",
+    "Gemini generation latency",
+    ["mode", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+)
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total",
+    "Tokens reported by Gemini usage metadata",
+    ["kind"]
+)
+
+EXTRACTION_DURATION = Histogram(
+    "document_extraction_duration_seconds",
+    "Text extraction time per uploaded document",
+    ["mime_type", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Items waiting in in-process queues",
+    ["queue"],
+    multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process cache lookups by result",
+    ["cache", "result"]
+)
+RATE_LIMIT_FALLBACKS = Counter(
+    "rate_limit_fallbacks_total",
+    "Rate limit checks enforced per worker because the shared backend failed"
+)
+
+# Usage metadata attribute -> token kind label
+TOKEN_KINDS = {
+    "prompt_token_count": "prompt",
+    "candidates_token_count": "completion",
+}
+
+
+def observe_gemini(mode: str, started: float, outcome: str, usage: Any = None):
+    """Record one Gemini call; usage is the response's usage_metadata, if any"""
+    GEMINI_REQUEST_DURATION.labels(mode, outcome).observe(time.perf_counter() - started)
+    if usage is None:
+        return
+    for attribute, kind in TOKEN_KINDS.items():
+        count = getattr(usage, attribute, None)
+        if count:
+            GEMINI_TOKENS.labels(kind).inc(count)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that times how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Track checked-out connections of an engine built with InstrumentedQueuePool"""
+    event.listen(engine.sync_engine, "checkout", lambda *args: DB_POOL_IN_USE.inc())
+    event.listen(engine.sync_engine, "checkin", lambda *args: DB_POOL_IN_USE.dec())
+
+
+class MetricsSampler:
+    """Periodically copies queue depths and cache hit counters into Prometheus.
+
+    Queues and caches keep plain counters on their hot paths; sampling them
+    every METRICS_SAMPLE_INTERVAL seconds costs nothing per operation and
+    works in multiprocess mode, where scrape-time callbacks cannot.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, Callable[[], int]] = {}
+        self.caches: Dict[str, Any] = {}
+        self.counters: Dict[str, Tuple[Counter, Callable[[], int]]] = {}
+        self.reported: Dict[str, Tuple[int, int]] = {}
+        self.reported_counts: Dict[str, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def register_queue(self, name: str, depth: Callable[[], int]):
+        self.queues[name] = depth
+
+    def register_cache(self, name: str, cache):
+        """Register a TTLCache (anything with hits and misses counters)"""
+        self.caches[name] = cache
+
+    def register_counter(self, name: str, counter: Counter, value: Callable[[], int]):
+        """Export a plain, ever-increasing count through a Prometheus counter"""
+        self.counters[name] = (counter, value)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run(), name="metrics-sampler")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Metrics sampling failed: {str(e)}")
+            await asyncio.sleep(settings.METRICS_SAMPLE_INTERVAL)
+
+    def sample(self):
+        for name, depth in self.queues.items():
+            QUEUE_DEPTH.labels(name).set(depth())
+
+        for name, cache in self.caches.items():
+            hits, misses = self.reported.get(name, (0, 0))
+            if cache.hits > hits:
+                CACHE_REQUESTS.labels(name, "hit").inc(cache.hits - hits)
+            if cache.misses > misses:
+                CACHE_REQUESTS.labels(name, "miss").inc(cache.misses - misses)
+            self.reported[name] = (cache.hits, cache.misses)
+
+        for name, (counter, value) in self.counters.items():
+            count = value()
+            reported = self.reported_counts.get(name, 0)
+            if count > reported:
+                counter.inc(count - reported)
+            self.reported_counts[name] = count
+
+
+def start_metrics_server():
+    """Serve this process's metrics on METRICS_PORT (single-process deployments only)"""
+    if MULTIPROCESS:
+        # The gunicorn master serves the aggregate of every worker
+        return
+    start_http_server(settings.METRICS_PORT)
+    logger.info(f"Metrics served on port {settings.METRICS_PORT}")
+
+
+def start_multiprocess_server(port: int):
+    """Serve metrics aggregated across all worker processes (call in the gunicorn master)"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    server, _ = start_http_server(port, registry=registry)
+    # Workers forked after this inherit the listening socket; close their copy
+    lifecycle.on_fork("metrics_server", server.socket.close)
+    logger.info(f"Multiprocess metrics served on port {port}")
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges from the aggregate"""
+    multiprocess.mark_process_dead(pid)
+
+
+# Global instance
+metrics_sampler = MetricsSampler()
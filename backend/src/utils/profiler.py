@@ -0,0 +1,135 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import asyncio
+import os
+import sys
+import threading
+import time
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running in this worker"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> List[str]:
+    """Frame labels from the outermost call to the innermost"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Statistical wall-clock profiler for a running worker.
+
+    A background thread samples every thread's Python stack (or only the
+    event loop's) at a fixed rate and counts identical stacks, which is cheap
+    enough to attach in production for a few seconds. Stacks on the event
+    loop thread are prefixed with the asyncio task that was running, so time
+    can be attributed to individual handlers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+    def profile(
+        self,
+        seconds: float,
+        hz: int,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        loop_thread_id: Optional[int] = None,
+        all_threads: bool = False
+    ) -> Counter:
+        """Sample for the given time (blocking the calling thread) and return stack counts.
+
+        Run it off the event loop (e.g. asyncio.to_thread), passing the loop
+        and its thread id, which the caller reads on the loop thread.
+        """
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running in this worker")
+        try:
+            self.samples = Counter()
+            self.sample_count = 0
+            interval = 1 / hz
+            me = threading.get_ident()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample(me, loop, loop_thread_id, all_threads, thread_names)
+                time.sleep(interval)
+            return self.samples
+        finally:
+            self.lock.release()
+
+    def _sample(self, me: int, loop, loop_thread_id, all_threads: bool, thread_names: Dict[int, str]):
+        self.sample_count += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            if not all_threads and loop_thread_id is not None and thread_id != loop_thread_id:
+                continue
+
+            stack = _collapse(frame)
+            if thread_id == loop_thread_id:
+                task = asyncio.current_task(loop)
+                root = f"task:{task.get_name()}" if task is not None else "event-loop"
+            else:
+                root = f"thread:{thread_names.get(thread_id, thread_id)}"
+            self.samples[";".join([root] + stack)] += 1
+
+    @staticmethod
+    def collapsed(samples: Counter) -> str:
+        """Brendan Gregg's collapsed-stack format, one ``stack count`` per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+def await_chain(coro) -> List[str]:
+    """What a coroutine is waiting on, from the task's own coroutine down to the innermost await"""
+    chain = []
+    while coro is not None and len(chain) < 64:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        if frame is not None:
+            chain.append(f"{name} ({frame.f_code.co_filename}:{frame.f_lineno})")
+        else:
+            chain.append(name)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return chain
+
+
+def dump_tasks(name_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Every asyncio task of the running loop with its await chain"""
+    current = asyncio.current_task()
+    tasks = []
+    for task in asyncio.all_tasks():
+        if task is current:
+            continue
+        name = task.get_name()
+        coro = task.get_coro()
+        chain = await_chain(coro)
+        # Match the task name or anything it is awaiting, e.g. "process_document_async"
+        if name_filter and name_filter not in name and not any(name_filter in entry for entry in chain):
+            continue
+        tasks.append({
+            "name": name,
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "done": task.done(),
+            "cancelling": task.cancelling() if hasattr(task, "cancelling") else None,
+            "await_chain": chain,
+        })
+    tasks.sort(key=lambda entry: entry["coroutine"])
+    return tasks
+
+
+# Global instance
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,187 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+from loguru import logger
+import re
+import time
+
+from core.config import settings
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Statement with literals and bind placeholders normalised, so repeats compare equal"""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _LITERAL.sub("?", normalized)
+    return _IN_LIST.sub("(?...)", normalized)
+
+
+def bind_shape(parameters: Any, executemany: bool = False) -> str:
+    """Types (never values) of a statement's bind parameters"""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)} x {bind_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class QueryStats:
+    """Statements executed within one request, bot update or background job"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints: Counter = Counter()
+        self.slow: List[Dict[str, Any]] = []
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Fingerprints executed at least threshold times (likely N+1 loops)"""
+        return {fp: n for fp, n in self.fingerprints.items() if n >= threshold}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "queries": self.count,
+            "db_time_ms": round(self.total_time * 1000, 2),
+            "distinct": len(self.fingerprints),
+            "slow": len(self.slow),
+        }
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when a block runs more statements than allowed"""
+
+
+class QueryMonitor:
+    """Slow-query log and N+1 detector on the engine's cursor events.
+
+    Every statement slower than SLOW_QUERY_MS is logged with its bind
+    shape. Inside track() blocks (one per HTTP request or bot update) it
+    also counts statements and DB time per fingerprint, and warns when one
+    fingerprint repeats N_PLUS_ONE_THRESHOLD times or the block runs more
+    than QUERY_COUNT_WARN statements.
+    """
+
+    def __init__(self):
+        self.slow_threshold = settings.SLOW_QUERY_MS / 1000
+        self.n_plus_one_threshold = settings.N_PLUS_ONE_THRESHOLD
+        self.count_warning = settings.QUERY_COUNT_WARN
+        self.slow_queries = 0
+        self.n_plus_one_warnings = 0
+
+    def instrument_engine(self, engine):
+        from sqlalchemy import event
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._query_started = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_query_started", None)
+            if started is None:
+                return
+            duration = time.perf_counter() - started
+
+            stats = _current_stats.get()
+            if stats is not None:
+                stats.record(statement, duration)
+
+            if duration >= self.slow_threshold:
+                self._log_slow(statement, parameters, executemany, duration, stats)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+    def _log_slow(self, statement: str, parameters, executemany: bool, duration: float, stats: Optional[QueryStats]):
+        self.slow_queries += 1
+        entry = {
+            "fingerprint": fingerprint(statement),
+            "duration_ms": round(duration * 1000, 2),
+            "binds": bind_shape(parameters, executemany),
+        }
+        if stats is not None:
+            stats.slow.append(entry)
+        logger.warning(
+            f"Slow query ({entry['duration_ms']}ms) in {stats.name if stats else 'background'}: "
+            f"{entry['fingerprint'][:500]} binds={entry['binds']}"
+        )
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[QueryStats]:
+        """Collect per-block query stats; nested blocks count towards the outermost one"""
+        current = _current_stats.get()
+        if current is not None:
+            yield current
+            return
+
+        stats = QueryStats(name)
+        token = _current_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_stats.reset(token)
+            self._report(stats)
+
+    def _report(self, stats: QueryStats):
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        if repeated:
+            self.n_plus_one_warnings += 1
+            worst, times = max(repeated.items(), key=lambda item: item[1])
+            logger.warning(
+                f"Possible N+1 in {stats.name}: {times} x {worst[:300]} "
+                f"({stats.count} queries, {stats.total_time * 1000:.1f}ms DB)"
+            )
+        elif stats.count > self.count_warning:
+            logger.warning(
+                f"{stats.name} ran {stats.count} queries ({stats.total_time * 1000:.1f}ms DB)"
+            )
+
+    def current(self) -> Optional[QueryStats]:
+        return _current_stats.get()
+
+    @contextmanager
+    def query_budget(self, max_queries: int, name: str = "query budget") -> Iterator[QueryStats]:
+        """Fail with QueryBudgetExceeded if the block runs more than max_queries statements.
+
+        Always opens its own stats, so it also works inside a tracked request.
+        """
+        stats = QueryStats(name)
+        token = _current_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_stats.reset(token)
+
+        if stats.count > max_queries:
+            statements = "\n".join(f"  {n} x {fp}" for fp, n in stats.fingerprints.most_common())
+            raise QueryBudgetExceeded(
+                f"{name}: {stats.count} queries, budget {max_queries}\n{statements}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slow_queries": self.slow_queries,
+            "n_plus_one_warnings": self.n_plus_one_warnings,
+        }
+
+
+# Global instance
+query_monitor = QueryMonitor()
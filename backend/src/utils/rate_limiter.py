@@ -1,45 +1,164 @@
 from fastapi import Request, HTTPException
-from typing import Dict
+from typing import NamedTuple
+from loguru import logger
+import math
 import time
-from collections import defaultdict, deque
+
 from core.config import settings
+from utils.cache import TTLCache
+from utils.redis_client import get_redis
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: float  # seconds until the request would be allowed (0 when allowed)
+
+
+class InMemoryRateLimitBackend:
+    """Per-process GCRA state: one theoretical arrival time (TAT) per key.
+
+    Keys are evicted as soon as their bucket is full again (TAT in the past),
+    so memory is O(active keys) regardless of request rate. Also serves as
+    the local fake for the shared backend in tests and benchmarks.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.tats = TTLCache(maxsize=max_keys)
+
+    async def check(
+        self,
+        key: str,
+        emission_interval: float,
+        burst: float,
+        cost: float = 1.0,
+        force: bool = False
+    ) -> RateLimitResult:
+        now = time.monotonic()
+        tat = max(self.tats.get(key, now), now)
+        new_tat = tat + emission_interval * cost
+        allow_at = new_tat - emission_interval * burst
+
+        if allow_at > now and not force:
+            return RateLimitResult(False, allow_at - now)
+
+        self.tats.set(key, new_tat, ttl=max(new_tat - now, 0))
+        return RateLimitResult(True, 0.0)
+
+
+# Atomic GCRA step; Redis' own clock keeps all workers consistent
+_GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + emission * cost
+local allow_at = new_tat - emission * burst
+if allow_at > now and force == 0 then
+    return {0, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now)))
+return {1, 0}
+"""
+
+
+class RedisRateLimitBackend:
+    """Shared GCRA state in Redis so limits hold across all gunicorn workers.
+
+    Without an explicit client, the process's shared client is resolved on
+    every call, so a forked worker uses (and close_redis() closes) its own
+    pool rather than one captured from the master at import time.
+    """
+
+    def __init__(self, client=None, prefix: str = "ratelimit:"):
+        self._client = client
+        self.prefix = prefix
+        self.script = None
+
+    @property
+    def client(self):
+        return self._client or get_redis()
+
+    async def check(
+        self,
+        key: str,
+        emission_interval: float,
+        burst: float,
+        cost: float = 1.0,
+        force: bool = False
+    ) -> RateLimitResult:
+        client = self.client
+        if self.script is None:
+            # Registered once for its SHA; each call runs on the current client
+            self.script = client.register_script(_GCRA_SCRIPT)
+        allowed, retry_after_ms = await self.script(
+            keys=[self.prefix + key],
+            args=[emission_interval * 1000, burst, cost, int(force)],
+            client=client
+        )
+        return RateLimitResult(bool(allowed), float(retry_after_ms) / 1000)
+
+
+def create_rate_limit_backend(prefix: str = "ratelimit:"):
+    """Redis backend when REDIS_URL is configured, otherwise per-process state"""
+    if settings.REDIS_URL:
+        return RedisRateLimitBackend(prefix=prefix)
+    return InMemoryRateLimitBackend()
 
 
 class RateLimiter:
-    def __init__(self, max_requests: int = None, window_seconds: int = 60):
+    """GCRA limiter: max_requests per window, spread evenly, with a full-window burst"""
+
+    def __init__(self, max_requests: int = None, window_seconds: int = 60, backend=None):
         self.max_requests = max_requests or settings.RATE_LIMIT_PER_MINUTE
         self.window_seconds = window_seconds
-        self.requests: Dict[str, deque] = defaultdict(deque)
-    
-    def is_allowed(self, identifier: str) -> bool:
+        self.emission_interval = window_seconds / self.max_requests
+        self.backend = backend or create_rate_limit_backend()
+        self.fallback = InMemoryRateLimitBackend()
+        # Checks served by the fallback (exported as rate_limit_fallbacks_total)
+        self.fallbacks = 0
+        self.degraded = False
+
+    async def check(self, identifier: str, cost: float = 1.0) -> RateLimitResult:
+        """Check and consume capacity for a request"""
+        try:
+            result = await self.backend.check(
+                identifier, self.emission_interval, self.max_requests, cost
+            )
+        except Exception as e:
+            # Never fail requests because the shared store is down; log the
+            # outage once rather than on every request it affects
+            self.fallbacks += 1
+            if not self.degraded:
+                self.degraded = True
+                logger.warning(f"Rate limit backend error, enforcing per-worker limits until it recovers: {str(e)}")
+            return await self.fallback.check(
+                identifier, self.emission_interval, self.max_requests, cost
+            )
+
+        if self.degraded:
+            self.degraded = False
+            logger.info(f"Rate limit backend recovered ({self.fallbacks} checks enforced per worker so far)")
+        return result
+
+    async def is_allowed(self, identifier: str) -> bool:
         """Check if request is allowed based on rate limiting"""
-        now = time.time()
-        window_start = now - self.window_seconds
-        
-        # Clean old requests
-        request_times = self.requests[identifier]
-        while request_times and request_times[0] < window_start:
-            request_times.popleft()
-        
-        # Check if under limit
-        if len(request_times) >= self.max_requests:
-            return False
-        
-        # Add current request
-        request_times.append(now)
-        return True
-    
+        return (await self.check(identifier)).allowed
+
     def get_client_identifier(self, request: Request) -> str:
         """Get client identifier for rate limiting"""
         # Try to get real IP from headers (for reverse proxy setups)
         forwarded_for = request.headers.get("X-Forwarded-For")
         if forwarded_for:
             return forwarded_for.split(",")[0].strip()
-        
+
         real_ip = request.headers.get("X-Real-IP")
         if real_ip:
             return real_ip
-        
+
         # Fallback to direct client IP
         return request.client.host if request.client else "unknown"
 
@@ -52,12 +171,13 @@ async def check_rate_limit(request: Request):
     """Rate limiting dependency"""
     if not settings.is_production:
         return  # Skip rate limiting in development
-    
+
     identifier = rate_limiter.get_client_identifier(request)
-    
-    if not rate_limiter.is_allowed(identifier):
+    result = await rate_limiter.check(identifier)
+
+    if not result.allowed:
         raise HTTPException(
             status_code=429,
             detail="Too many requests. Please try again later.",
-            headers={"Retry-After": "60"}
-        )
\ No newline at end of file
+            headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))}
+        )
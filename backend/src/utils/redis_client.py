@@ -0,0 +1,34 @@
+from core.config import settings
+from utils.lifecycle import lifecycle
+
+# Shared client, created lazily so workers never inherit a connection pool
+redis_client = None
+
+
+def get_redis():
+    """Get the shared asyncio Redis client, or None when REDIS_URL is not configured"""
+    global redis_client
+    
+    if redis_client is None and settings.REDIS_URL:
+        import redis.asyncio as redis
+        
+        redis_client = redis.from_url(settings.REDIS_URL)
+    
+    return redis_client
+
+
+def _reset_after_fork():
+    # The inherited pool's sockets belong to the master: drop them, never close them
+    global redis_client
+    redis_client = None
+
+
+lifecycle.on_fork("redis", _reset_after_fork)
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        redis_client = None
@@ -0,0 +1,30 @@
+from fastapi.responses import Response
+from typing import Dict, Optional
+import orjson
+
+
+class PreEncodedJSONResponse(Response):
+    """JSON response whose body is already encoded and needs no further work"""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        body: bytes,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        super().__init__(content=body, status_code=status_code, headers=headers)
+
+
+def encode_text_artifact(field: str, content: str) -> bytes:
+    """Encode a cached text artifact as {field: content, "success": true}"""
+    return orjson.dumps({field: content, "success": True})
+
+
+def encode_json_artifact(field: str, raw_json: str) -> bytes:
+    """Splice an already-encoded JSON document into {field: ..., "success": true}.
+
+    Used for JSONB columns read as text, so the tree is never decoded or re-validated.
+    """
+    return b'{"' + field.encode() + b'":' + raw_json.encode() + b',"success":true}'
@@ -0,0 +1,110 @@
+from typing import Any, Callable, Dict, Iterable, Optional
+from loguru import logger
+import asyncio
+import threading
+import time
+
+
+class LazyResource:
+    """A heavy module, client or model built on first use.
+
+    fork_safe resources (modules, read-only data) may be loaded in a
+    preloading master and shared with its workers; the others (clients
+    holding sockets or threads) are reset in every worker.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], warm: bool = True, fork_safe: bool = False):
+        self.name = name
+        self.loader = loader
+        self.warm = warm
+        self.fork_safe = fork_safe
+        self.value: Any = None
+        self.loaded = False
+        self.load_time: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.loaded:
+            return self.value
+        # Executor threads and the warm-up may ask at the same time; load once
+        with self.lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                self.value = self.loader()
+                self.load_time = time.perf_counter() - started
+                self.loaded = True
+                logger.info(f"Loaded {self.name} in {self.load_time * 1000:.0f}ms")
+        return self.value
+
+
+class ServiceRegistry:
+    """Heavy imports and model/tokenizer loading, deferred until first use.
+
+    Services register loaders at import time instead of importing
+    google.generativeai, pypdf or nltk at module level, so importing the
+    app stays cheap. The lifespan can warm resources before traffic
+    arrives; anything not warmed loads on its first get().
+    """
+
+    def __init__(self):
+        self.resources: Dict[str, LazyResource] = {}
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warm: bool = True,
+        fork_safe: bool = False
+    ) -> LazyResource:
+        resource = LazyResource(name, loader, warm, fork_safe)
+        self.resources[name] = resource
+        return resource
+
+    def get(self, name: str) -> Any:
+        return self.resources[name].get()
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Load resources off the event loop; failures are logged and left for first use"""
+        names = list(names) if names is not None else [
+            name for name, resource in self.resources.items() if resource.warm
+        ]
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.resources[name].get) for name in names),
+            return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up of {name} failed, it will load on first use: {str(result)}")
+        logger.info(f"Warmed up {len(names)} resources in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def preload(self):
+        """Load the fork-safe resources in this process (the master, before forking)"""
+        for name, resource in self.resources.items():
+            if resource.warm and resource.fork_safe:
+                try:
+                    resource.get()
+                except Exception as e:
+                    logger.warning(f"Preload of {name} failed, workers will load it: {str(e)}")
+
+    def after_fork(self):
+        """Forget resources a worker must not share with the master"""
+        for resource in self.resources.values():
+            resource.lock = threading.Lock()
+            if not resource.fork_safe:
+                resource.value = None
+                resource.loaded = False
+                resource.load_time = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "loaded": resource.loaded,
+                "load_ms": round(resource.load_time * 1000, 1) if resource.load_time is not None else None,
+            }
+            for name, resource in self.resources.items()
+        }
+
+
+# Global instance
+service_registry = ServiceRegistry()
@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Any, Awaitable, Callable, Coroutine, Dict, NamedTuple, Optional
+from loguru import logger
+import asyncio
+
+
+class TaskInfo(NamedTuple):
+    kind: str
+    on_abandon: Optional[Callable[[], Awaitable[None]]]
+    drain: bool
+
+
+class TaskSupervisor:
+    """Tracks a worker's fire-and-forget background tasks so shutdown can drain them.
+
+    Work is started with spawn() instead of asyncio.create_task. Once
+    drain() begins no new work is accepted (spawn returns None and the
+    caller leaves the work queued elsewhere); in-flight tasks get the grace
+    period to finish, and whatever is still running is cancelled and handed
+    to its on_abandon callback to checkpoint or requeue it. Tasks spawned
+    with drain=False (periodic loops) are cancelled straight away.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[asyncio.Task, TaskInfo] = {}
+        self.accepting = True
+
+        self.spawned = 0
+        self.completed = 0
+        self.failed = 0
+        self.refused = 0
+        self.abandoned = 0
+
+    def spawn(
+        self,
+        coro: Coroutine[Any, Any, Any],
+        kind: str,
+        name: Optional[str] = None,
+        on_abandon: Optional[Callable[[], Awaitable[None]]] = None,
+        drain: bool = True
+    ) -> Optional[asyncio.Task]:
+        """Start a tracked task; None (and the coroutine is closed) once shutdown has begun"""
+        if not self.accepting:
+            coro.close()
+            self.refused += 1
+            logger.warning(f"Shutting down, not starting {name or kind}")
+            return None
+
+        task = asyncio.create_task(coro, name=name or kind)
+        self.tasks[task] = TaskInfo(kind, on_abandon, drain)
+        self.spawned += 1
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        info = self.tasks.pop(task, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.failed += 1
+            logger.opt(exception=error).error(
+                f"Background task {task.get_name()} ({info.kind if info else 'unknown'}) failed: {str(error)}"
+            )
+        else:
+            self.completed += 1
+
+    async def drain(self, timeout: float) -> int:
+        """Refuse new work, wait up to timeout for in-flight tasks, then abandon the rest; returns how many were abandoned"""
+        self.accepting = False
+        for task, info in list(self.tasks.items()):
+            if not info.drain:
+                task.cancel()
+
+        running = {task: info for task, info in self.tasks.items() if info.drain}
+        if not running:
+            return 0
+        logger.info(f"Draining {len(running)} background tasks (up to {timeout}s)")
+
+        _, unfinished = await asyncio.wait(running, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+
+        for task in unfinished:
+            self.abandoned += 1
+            info = running[task]
+            logger.warning(f"Background task {task.get_name()} ({info.kind}) did not finish before shutdown")
+            if info.on_abandon is not None:
+                try:
+                    await info.on_abandon()
+                except Exception as e:
+                    logger.error(f"Could not requeue {task.get_name()}: {str(e)}")
+        return len(unfinished)
+
+    def live(self) -> Dict[str, int]:
+        """Running tasks per kind"""
+        return dict(Counter(info.kind for info in self.tasks.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "accepting": self.accepting,
+            "live": self.live(),
+            "spawned": self.spawned,
+            "completed": self.completed,
+            "failed": self.failed,
+            "refused": self.refused,
+            "abandoned": self.abandoned,
+        }
+
+
+# Global instance
+task_supervisor = TaskSupervisor()
@@ -0,0 +1,25 @@
+from typing import List
+
+
+def split_point(text: str, limit: int) -> int:
+    """Index to cut an over-long text at, preferring paragraph, line and word breaks"""
+    if len(text) <= limit:
+        return len(text)
+    window = text[:limit]
+    for separator in ("\n\n", "\n", " "):
+        cut = window.rfind(separator)
+        if cut > limit // 2:
+            return cut
+    return limit
+
+
+def split_message(text: str, limit: int) -> List[str]:
+    """Split a text into parts no longer than a messaging platform accepts"""
+    parts = []
+    while len(text) > limit:
+        cut = split_point(text, limit)
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text or not parts:
+        parts.append(text)
+    return parts
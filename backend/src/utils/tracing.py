@@ -0,0 +1,312 @@
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+from loguru import logger
+import random
+import threading
+import time
+import urllib.request
+
+import orjson
+
+from core.config import settings
+from utils.lifecycle import lifecycle
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class NoopSpan:
+    """Stand-in when tracing is off or the trace was not sampled"""
+
+    __slots__ = ()
+    sampled = False
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    """One timed operation; entering it makes it the current span of the context"""
+
+    __slots__ = (
+        "tracer", "trace_id", "span_id", "parent_id", "name", "attributes",
+        "sampled", "start_time", "started", "duration", "error", "activate", "token"
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        attributes: Dict[str, Any],
+        activate: bool = True
+    ):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.sampled = sampled
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.activate = activate
+        self.token = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None):
+        """Finish the span (idempotent); sampled spans are handed to the exporter"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.sampled:
+            self.tracer.exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self):
+        if self.activate:
+            self.token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc)
+        if self.token is not None:
+            _current_span.reset(self.token)
+            self.token = None
+        return False
+
+
+class SpanExporter:
+    """Ships finished spans from a background thread, so recording never blocks the event loop.
+
+    Spans go to a bounded in-memory queue (the oldest are dropped when it is
+    full) and are written every TRACE_FLUSH_INTERVAL seconds as JSON lines to
+    TRACE_EXPORT_PATH, or POSTed in batches to TRACE_EXPORT_URL when set.
+    """
+
+    def __init__(self):
+        self.queue: Deque[Span] = deque(maxlen=settings.TRACE_BUFFER_MAX)
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread: Optional[threading.Thread] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the exporter thread after a final flush"""
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def after_fork(self):
+        """A worker starts with its own (empty) queue; the master exports what it recorded"""
+        self.queue.clear()
+        self.thread = None
+        self.stopping = False
+
+    def export(self, span: Span):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(span)
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(settings.TRACE_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        spans: List[Span] = []
+        while self.queue:
+            try:
+                spans.append(self.queue.popleft())
+            except IndexError:
+                break
+        if not spans:
+            return
+
+        try:
+            if settings.TRACE_EXPORT_URL:
+                self._post(spans)
+            else:
+                self._write(spans)
+            self.exported += len(spans)
+        except Exception as e:
+            self.failed += len(spans)
+            logger.warning(f"Failed to export {len(spans)} spans: {str(e)}")
+
+    def _write(self, spans: List[Span]):
+        with open(settings.TRACE_EXPORT_PATH, "ab") as f:
+            f.write(b"".join(orjson.dumps(span.to_dict(), default=str) + b"\n" for span in spans))
+
+    def _post(self, spans: List[Span]):
+        request = urllib.request.Request(
+            settings.TRACE_EXPORT_URL,
+            data=orjson.dumps({"spans": [span.to_dict() for span in spans]}, default=str),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class Tracer:
+    """Head-sampled in-process tracer with span context carried in contextvars.
+
+    Entry points (HTTP requests, bot updates, background jobs) open traces
+    with trace(); the sampling decision is made there once and inherited by
+    every span below it. span() only records inside a sampled trace, so
+    instrumented code costs one context lookup when it is not.
+    """
+
+    def __init__(self):
+        self.enabled = settings.TRACING_ENABLED
+        self.sample_rate = settings.TRACE_SAMPLE_RATE
+        self.exporter = SpanExporter()
+
+    def start(self):
+        if self.enabled:
+            self.exporter.start()
+
+    def stop(self):
+        self.exporter.stop()
+
+    def trace(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        sampled: Optional[bool] = None,
+        **attributes
+    ):
+        """Open a trace, or a child span when one is already active.
+
+        trace_id, parent_id and sampled continue a trace started upstream
+        (e.g. from a traceparent header).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+
+        current = _current_span.get()
+        if current is not None:
+            return self._child(current, name, attributes, True)
+
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        # Unsampled traces still get an (unrecorded) span, so nothing below re-samples
+        return Span(
+            self,
+            name,
+            trace_id or f"{random.getrandbits(128):032x}",
+            parent_id,
+            sampled,
+            attributes if sampled else {}
+        )
+
+    def span(self, name: str, activate: bool = True, **attributes):
+        """A child span of the active trace; a no-op outside sampled traces.
+
+        Use activate=False for spans that outlive the current context switch,
+        such as one wrapping an async generator's yields.
+        """
+        current = _current_span.get()
+        if current is None or not current.sampled:
+            return NOOP_SPAN
+        return self._child(current, name, attributes, activate)
+
+    def _child(self, parent: Span, name: str, attributes: Dict[str, Any], activate: bool):
+        if not parent.sampled:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, True, attributes, activate)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span is not None else None
+
+    def instrument_engine(self, engine):
+        """Record a span for every statement an engine executes"""
+        from sqlalchemy import event
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = self.span("db.query", activate=False)
+            if span is not NOOP_SPAN:
+                span.set_attribute("db.statement", statement[:500])
+                context._trace_span = span
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = getattr(context, "_trace_span", None)
+            if span is not None:
+                span.set_attribute("db.rows", cursor.rowcount)
+                span.end()
+
+        def handle_error(exception_context):
+            context = exception_context.execution_context
+            span = getattr(context, "_trace_span", None) if context is not None else None
+            if span is not None:
+                span.end(exception_context.original_exception)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(engine.sync_engine, "handle_error", handle_error)
+
+
+# Global instance
+tracer = Tracer()
+lifecycle.on_fork("tracer", tracer.exporter.after_fork)
@@ -0,0 +1,20 @@
+"""
+A manual clock for code that reads time.monotonic() through its module's ``time``
+"""
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def install(self, monkeypatch, *modules):
+        """Replace the ``time`` module seen by each of modules with this clock"""
+        for module in modules:
+            monkeypatch.setattr(module, "time", self)
+        return self
@@ -0,0 +1,216 @@
+"""
+Shared fixtures for the backend tests
+
+The tests need a throwaway PostgreSQL database in TEST_DATABASE_URL: its
+tables are dropped and recreated from the models at the start of the
+session, and dropped again at the end. Without it the database tests are
+skipped. Gemini, the Telegram Bot API and the WhatsApp Cloud API are
+replaced by the offline fakes in benchmarks/offline_fakes.py.
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from jose import jwt
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# Settings are read at import time, so the environment comes first
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql+asyncpg://localhost/unused"
+os.environ["REDIS_URL"] = ""
+os.environ.setdefault("HASURA_GRAPHQL_ENDPOINT", "http://hasura.test/v1/graphql")
+os.environ.setdefault("HASURA_ADMIN_SECRET", "test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from core.config import settings  # noqa: E402
+from offline_fakes import (  # noqa: E402
+    FakeGeminiModel, FakeTelegramRequest, install_fake_gemini, install_fake_telegram
+)
+
+pytest_plugins = ["query_budget"]
+
+settings.TELEGRAM_BOT_TOKEN = "123456:test"
+settings.TELEGRAM_WEBHOOK_URL = None
+settings.TELEGRAM_WEBHOOK_SECRET = None
+settings.WHATSAPP_WEBHOOK_SECRET = None
+settings.WHATSAPP_ACCESS_TOKEN = None
+settings.DEBUG = False
+settings.ENABLE_METRICS = False
+settings.QUERY_MONITOR_ENABLED = True
+settings.WARM_UP_ON_STARTUP = False
+
+
+def token_for(user) -> str:
+    return jwt.encode(
+        {"sub": str(user.id), "exp": datetime.utcnow() + timedelta(hours=1)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # One loop for the whole session: the engine's pooled connections are bound to it
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+async def session_factory():
+    """The app's session factory, on a freshly created schema"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+
+    from models import Base
+    from utils import database
+
+    database.init_database()
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield database.async_session_factory
+
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await database.engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def telegram_api():
+    return FakeTelegramRequest(latency_ms=0)
+
+
+@pytest.fixture(scope="session")
+async def app(session_factory, telegram_api):
+    """The FastAPI app with its bots started against the offline fakes (no lifespan)"""
+    from main import app
+    from services.telegram_bot import telegram_bot
+    from services.telegram_sender import telegram_sender
+    from services.whatsapp_bot import whatsapp_bot
+
+    install_fake_gemini(FakeGeminiModel(latency_ms=0, tokens_per_sec=0))
+
+    await telegram_bot.initialize()
+    install_fake_telegram(telegram_bot.application.bot, telegram_api)
+    await telegram_bot.application.initialize()
+    await telegram_bot.application.start()
+    telegram_sender.start(telegram_bot.application.bot)
+    whatsapp_bot.start()
+
+    yield app
+
+    await whatsapp_bot.stop()
+    await telegram_bot.stop()
+
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app)
+    # Outside DEBUG the app only accepts its production host
+    async with httpx.AsyncClient(transport=transport, base_url="http://yourdomain.com") as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    """Start every test with empty per-worker caches, so budgets cover the uncached path"""
+    from services.linked_identity_cache import linked_identity_cache
+    from utils.auth import token_cache, user_cache
+
+    token_cache.clear()
+    user_cache.clear()
+    linked_identity_cache.clear()
+    yield
+
+
+class Seed:
+    """An instructor, a student with linked Telegram and WhatsApp accounts, and a processed document"""
+
+    def __init__(self):
+        from models.document import Document, DocumentStatus
+        from models.user import User, UserRole
+
+        run = uuid.uuid4().hex[:8]
+        self.instructor = User(
+            id=uuid.uuid4(), email=f"test-{run}-instructor@example.com", password_hash="x",
+            full_name="Test Instructor", role=UserRole.INSTRUCTOR.value
+        )
+        self.student = User(
+            id=uuid.uuid4(), email=f"test-{run}-student@example.com", password_hash="x",
+            full_name="Test Student", role=UserRole.STUDENT.value
+        )
+        self.document = Document(
+            id=uuid.uuid4(), uploaded_by=self.instructor.id, original_filename="notes.pdf",
+            file_path="/dev/null", file_size=0, mime_type="application/pdf",
+            status=DocumentStatus.processed,
+            processed_text="Photosynthesis turns light into chemical energy. " * 200
+        )
+        self.telegram_id = 9_000_000_000 + int(run, 16) % 10**6
+        self.phone = f"1555{int(run, 16) % 10**7:07d}"
+        self.student_token = token_for(self.student)
+        self.instructor_token = token_for(self.instructor)
+
+    def auth(self, token: str = None) -> dict:
+        return {"Authorization": f"Bearer {token or self.student_token}"}
+
+    def telegram_text(self, text: str) -> dict:
+        update_id = time.time_ns() % 10**9
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": self.telegram_id, "type": "private"},
+                "from": {"id": self.telegram_id, "is_bot": False, "first_name": "Test"},
+                "text": text,
+            },
+        }
+
+    def whatsapp_text(self, text: str) -> dict:
+        return {
+            "id": f"wamid.test.{time.time_ns()}",
+            "from": self.phone,
+            "timestamp": str(int(time.time())),
+            "type": "text",
+            "text": {"body": text},
+        }
+
+
+@pytest.fixture
+async def seed(session_factory):
+    from sqlalchemy import delete
+    from models.document import Document
+    from models.telegram import TelegramUser
+    from models.user import User
+    from models.whatsapp import WhatsAppUser
+
+    seed = Seed()
+    now = datetime.utcnow()
+    async with session_factory() as session:
+        session.add_all([seed.instructor, seed.student])
+        await session.flush()
+        session.add(seed.document)
+        session.add(TelegramUser(
+            user_id=seed.student.id, telegram_id=seed.telegram_id, telegram_first_name="Test",
+            is_linked=True, linked_at=now
+        ))
+        session.add(WhatsAppUser(
+            user_id=seed.student.id, whatsapp_phone=seed.phone, whatsapp_name="Test",
+            is_linked=True, linked_at=now
+        ))
+        await session.commit()
+
+    yield seed
+
+    async with session_factory() as session:
+        await session.execute(delete(Document).where(Document.uploaded_by == seed.instructor.id))
+        await session.execute(delete(TelegramUser).where(TelegramUser.telegram_id == seed.telegram_id))
+        await session.execute(delete(WhatsAppUser).where(WhatsAppUser.whatsapp_phone == seed.phone))
+        await session.execute(delete(User).where(User.id.in_([seed.instructor.id, seed.student.id])))
+        await session.commit()
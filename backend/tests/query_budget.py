@@ -0,0 +1,25 @@
+"""
+pytest plugin asserting per-endpoint query budgets
+
+Registered by conftest.py (``pytest_plugins = ["query_budget"]``). Wrap the
+call under test::
+
+    async def test_list_documents(client, query_budget):
+        with query_budget(3):
+            await client.get("/api/documents/")
+
+The app must run in the test's own context (httpx.AsyncClient with
+ASGITransport), so the statements it executes are attributed to the block.
+"""
+import pytest
+
+from utils.query_monitor import query_monitor
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory: fails the test when a block exceeds its query budget"""
+    def budget(max_queries: int, name: str = "query budget"):
+        return query_monitor.query_budget(max_queries, name)
+
+    return budget
@@ -0,0 +1,81 @@
+"""
+Invalidation of the per-worker auth caches
+
+A cached user snapshot must not outlive a deactivation or a role change
+made through the admin endpoint or the Hasura users event trigger.
+"""
+import uuid
+
+import pytest
+
+from conftest import token_for
+from core.config import settings
+from utils.auth import user_cache
+
+
+@pytest.fixture
+async def admin(session_factory):
+    from sqlalchemy import delete
+    from models.user import User, UserRole
+
+    user = User(
+        id=uuid.uuid4(), email=f"test-{uuid.uuid4().hex[:8]}-admin@example.com", password_hash="x",
+        full_name="Test Admin", role=UserRole.ADMIN.value
+    )
+    async with session_factory() as session:
+        session.add(user)
+        await session.commit()
+
+    yield user
+
+    async with session_factory() as session:
+        await session.execute(delete(User).where(User.id == user.id))
+        await session.commit()
+
+
+async def test_deactivation_evicts_cached_user(client, seed, admin):
+    response = await client.get("/api/documents/", headers=seed.auth())
+    assert response.status_code == 200
+    assert str(seed.student.id) in user_cache._data
+
+    response = await client.patch(
+        f"/api/admin/users/{seed.student.id}", json={"is_active": False}, headers=seed.auth(token_for(admin))
+    )
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+    assert str(seed.student.id) not in user_cache._data
+
+    response = await client.get("/api/documents/", headers=seed.auth())
+    assert response.status_code == 400
+
+
+async def test_demotion_revokes_cached_admin_rights(client, seed, admin):
+    admin_auth = seed.auth(token_for(admin))
+    response = await client.get("/api/admin/tasks", headers=admin_auth)
+    assert response.status_code == 200
+
+    response = await client.patch(f"/api/admin/users/{admin.id}", json={"role": "student"}, headers=admin_auth)
+    assert response.status_code == 200
+
+    response = await client.get("/api/admin/tasks", headers=admin_auth)
+    assert response.status_code == 403
+
+
+async def test_hasura_event_evicts_cached_user(client, seed, monkeypatch):
+    monkeypatch.setattr(settings, "HASURA_EVENT_SECRET", "event-secret")
+    response = await client.get("/api/documents/", headers=seed.auth())
+    assert response.status_code == 200
+
+    event = {"event": {"op": "UPDATE", "data": {
+        "old": {"id": str(seed.student.id), "role": "student"},
+        "new": {"id": str(seed.student.id), "role": "instructor"},
+    }}}
+    response = await client.post("/api/admin/hooks/users", json=event, headers={"X-Hasura-Event-Secret": "wrong"})
+    assert response.status_code == 403
+    assert str(seed.student.id) in user_cache._data
+
+    response = await client.post(
+        "/api/admin/hooks/users", json=event, headers={"X-Hasura-Event-Secret": "event-secret"}
+    )
+    assert response.status_code == 200
+    assert str(seed.student.id) not in user_cache._data
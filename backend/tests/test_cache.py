@@ -0,0 +1,60 @@
+"""
+TTLCache: expiry, LRU eviction and hit counters
+"""
+import pytest
+
+from clock import Clock
+from utils import cache
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock().install(monkeypatch, cache)
+
+
+def test_entries_expire_after_their_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+    entries.set("b", 2, ttl=20)
+
+    clock.advance(4.9)
+    assert entries.get("a") == 1
+    clock.advance(0.1)
+    assert entries.get("a") is None
+    assert entries.get("a", "default") == "default"
+    assert entries.get("b") == 2
+    assert len(entries) == 1
+
+
+def test_entries_without_ttl_never_expire(clock):
+    entries = TTLCache(maxsize=10)
+    entries.set("a", 1)
+    clock.advance(10 ** 6)
+    assert entries.get("a") == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+
+
+def test_hits_misses_pop_and_clear(clock):
+    entries = TTLCache(maxsize=10)
+    entries.set("a", 1)
+    entries.get("a")
+    entries.get("missing")
+    assert (entries.hits, entries.misses) == (1, 1)
+
+    assert entries.pop("a") == 1
+    assert entries.pop("a", "gone") == "gone"
+    entries.set("b", 2)
+    entries.clear()
+    assert len(entries) == 0
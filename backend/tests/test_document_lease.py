@@ -0,0 +1,43 @@
+"""
+Processing leases: a running document keeps its lease, so the requeue sweep leaves it alone
+"""
+import asyncio
+import uuid
+
+from sqlalchemy import func, select
+
+from core.config import settings
+from models.document import Document, DocumentStatus
+from services.document_service import document_service
+
+
+async def test_running_document_renews_its_lease(session_factory, seed, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_PROCESSING_LEASE_SECONDS", 0.3)
+    document = Document(
+        id=uuid.uuid4(), uploaded_by=seed.instructor.id, original_filename="slow.txt",
+        file_path="/dev/null", file_size=0, mime_type="text/plain", status=DocumentStatus.uploaded
+    )
+    async with session_factory() as session:
+        session.add(document)
+        await session.commit()
+
+    async def slow_extract(file_path, mime_type):
+        await asyncio.sleep(1.0)
+        return "Photosynthesis turns light into chemical energy."
+
+    monkeypatch.setattr(document_service, "extract_text_from_file", slow_extract)
+    run = asyncio.create_task(document_service.process_document_async(str(document.id)))
+    try:
+        # Well past the lease length: only renewals keep it live
+        await asyncio.sleep(0.7)
+        async with session_factory() as session:
+            row = (await session.execute(
+                select(Document.status, func.now() - Document.processing_started_at)
+                .where(Document.id == document.id)
+            )).one()
+        assert row[0] == DocumentStatus.processing
+        assert row[1].total_seconds() < 0.3
+
+        assert await document_service.requeue_stale_documents() == 0
+    finally:
+        assert await run
@@ -0,0 +1,8 @@
+"""
+Importing the app must not load the modules the service registry defers
+"""
+from bench_import_time import eager_lazy_modules, import_once
+
+
+def test_app_import_defers_lazy_modules():
+    assert eager_lazy_modules(import_once("main")) == []
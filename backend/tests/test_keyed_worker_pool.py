@@ -0,0 +1,151 @@
+"""
+KeyedWorkerPool: per-key ordering, dedupe and backpressure
+"""
+import asyncio
+
+import pytest
+
+from utils.keyed_worker_pool import KeyedWorkerPool, QueueFullError
+
+
+class Recorder:
+    """Pool handler that records items and can be held at a gate"""
+
+    def __init__(self):
+        self.items = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self, item):
+        await self.gate.wait()
+        self.items.append(item)
+
+
+class Tracker:
+    """Pool handler recording start and end of each item, with a configurable delay per item"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.events = []
+
+    async def __call__(self, item):
+        self.events.append(("start", item))
+        await asyncio.sleep(self.delays.get(item, 0))
+        self.events.append(("end", item))
+
+
+async def test_items_run_in_order_per_key():
+    handler = Tracker(delays={("a", 1): 0.02})
+    pool = KeyedWorkerPool(handler, name="test", workers=4)
+    pool.start()
+    for i in range(1, 4):
+        pool.submit("a", ("a", i))
+    await pool.stop(timeout=1)
+
+    # Never two items of one key at once, and in submission order
+    assert handler.events == [
+        ("start", ("a", 1)), ("end", ("a", 1)),
+        ("start", ("a", 2)), ("end", ("a", 2)),
+        ("start", ("a", 3)), ("end", ("a", 3)),
+    ]
+
+
+async def test_keys_run_in_parallel():
+    handler = Tracker(delays={"slow": 0.05})
+    pool = KeyedWorkerPool(handler, name="test", workers=2)
+    pool.start()
+    pool.submit("a", "slow")
+    pool.submit("b", "fast")
+    await pool.stop(timeout=1)
+
+    # The other key is not held up behind the slow item
+    assert handler.events.index(("end", "fast")) < handler.events.index(("end", "slow"))
+
+
+async def test_duplicate_item_ids_are_dropped():
+    handler = Recorder()
+    pool = KeyedWorkerPool(handler, name="test", workers=1)
+    pool.start()
+    assert pool.submit("a", "first", item_id=1)
+    assert not pool.submit("a", "again", item_id=1)
+    assert pool.submit("a", "second", item_id=2)
+    await pool.stop(timeout=1)
+
+    assert handler.items == ["first", "second"]
+    assert pool.stats()["duplicates"] == 1
+
+
+async def test_full_or_stopped_pool_rejects_items():
+    handler = Recorder()
+    handler.gate.clear()
+    pool = KeyedWorkerPool(handler, name="test", workers=1, max_pending=2)
+    with pytest.raises(QueueFullError):
+        pool.submit("a", 0)
+
+    pool.start()
+    pool.submit("a", 1)
+    pool.submit("b", 2)
+    with pytest.raises(QueueFullError):
+        pool.submit("c", 3)
+    assert pool.stats()["rejected"] == 2
+
+    handler.gate.set()
+    await pool.stop(timeout=1)
+    assert handler.items == [1, 2]
+
+
+async def test_handler_failure_does_not_stop_the_key():
+    async def handler(item):
+        if item == "bad":
+            raise ValueError(item)
+        done.append(item)
+
+    done = []
+    pool = KeyedWorkerPool(handler, name="test", workers=1)
+    pool.start()
+    pool.submit("a", "bad")
+    pool.submit("a", "good")
+    await pool.stop(timeout=1)
+
+    assert done == ["good"]
+    assert (pool.failed, pool.processed) == (1, 1)
+
+
+async def test_wait_submit_waits_for_room():
+    handler = Recorder()
+    handler.gate.clear()
+    pool = KeyedWorkerPool(handler, name="test", workers=1, max_pending=1)
+    pool.start()
+    try:
+        pool.submit("a", 1)
+        await asyncio.sleep(0)  # the worker takes 1 and blocks at the gate
+        pool.submit("a", 2)
+        with pytest.raises(QueueFullError):
+            pool.submit("a", 3)
+
+        waiter = asyncio.create_task(pool.wait_submit("a", 3))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        handler.gate.set()
+        assert await asyncio.wait_for(waiter, 1)
+    finally:
+        await pool.stop(timeout=1)
+    assert handler.items == [1, 2, 3]
+
+
+async def test_wait_submit_fails_once_the_pool_stops():
+    handler = Recorder()
+    handler.gate.clear()
+    pool = KeyedWorkerPool(handler, name="test", workers=1, max_pending=1)
+    pool.start()
+    pool.submit("a", 1)
+    await asyncio.sleep(0)
+    pool.submit("a", 2)
+
+    waiter = asyncio.create_task(pool.wait_submit("a", 3))
+    await asyncio.sleep(0.01)
+    await pool.stop(timeout=0.01)
+
+    with pytest.raises(QueueFullError):
+        await asyncio.wait_for(waiter, 1)
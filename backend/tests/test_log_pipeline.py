@@ -0,0 +1,25 @@
+"""
+Queued log sink replacement and fork handling
+"""
+import io
+
+from utils import log_pipeline
+from utils.log_pipeline import configure_logging
+
+
+def test_only_the_active_sink_restarts_after_fork():
+    first = configure_logging(io.StringIO())
+    second = configure_logging(io.StringIO())
+    try:
+        # Replacing a sink stops it for good
+        assert first.thread is None
+        assert log_pipeline._active_sink is second
+
+        second.queue.append(({}, None, None))
+        log_pipeline._after_fork_in_child()
+        assert first.thread is None
+        assert second.thread is not None and second.thread.is_alive()
+        # Records queued before the fork belong to the parent
+        assert not second.queue
+    finally:
+        configure_logging()
@@ -0,0 +1,83 @@
+"""
+Query budgets for the hot paths
+
+Each budget is the number of statements the path runs today with cold
+per-worker caches. A change that adds queries (an N+1 loop, a lost eager
+load, a cache that stopped being consulted) fails here; lower the budget
+when a change removes queries.
+"""
+from sqlalchemy import func, select
+from telegram import Update
+
+from models.document import ChatMessage, DocumentChatSession
+from services.chat_context_store import chat_context_store, whatsapp_chat_context
+from services.telegram_bot import telegram_bot
+from services.whatsapp_bot import whatsapp_bot
+
+
+async def chat_messages(session_factory, seed) -> int:
+    async with session_factory() as session:
+        result = await session.execute(
+            select(func.count(ChatMessage.id))
+            .join(DocumentChatSession, ChatMessage.session_id == DocumentChatSession.id)
+            .where(DocumentChatSession.user_id == seed.student.id)
+        )
+        return result.scalar_one()
+
+
+async def test_list_documents(client, seed, query_budget):
+    # User, count, page
+    with query_budget(3, "GET /documents/"):
+        response = await client.get("/api/documents/", params={"per_page": 10}, headers=seed.auth())
+    assert response.status_code == 200
+    assert [doc["id"] for doc in response.json()["documents"]] == [str(seed.document.id)]
+
+
+async def test_document_summary(client, seed, query_budget):
+    url = f"/api/documents/{seed.document.id}/summary"
+    # User, artifact row, processed text, cache write
+    with query_budget(4, "GET /documents/{id}/summary (generate)"):
+        response = await client.get(url, headers=seed.auth())
+    assert response.status_code == 200
+
+    # Served from the cached artifact; the user is cached too by now
+    with query_budget(1, "GET /documents/{id}/summary (cached)"):
+        response = await client.get(url, headers=seed.auth())
+    assert response.status_code == 200
+
+
+async def test_document_chat(client, session_factory, seed, query_budget):
+    # User, document, session lookup and insert, history, message insert
+    with query_budget(6, "POST /documents/{id}/chat"):
+        response = await client.post(
+            f"/api/documents/{seed.document.id}/chat",
+            json={"content": "What does photosynthesis produce?"},
+            headers=seed.auth()
+        )
+    assert response.status_code == 200
+    assert await chat_messages(session_factory, seed) == 2
+
+
+async def test_telegram_chat_message(app, telegram_api, session_factory, seed, query_budget):
+    await chat_context_store.set(seed.telegram_id, str(seed.document.id))
+    update = Update.de_json(seed.telegram_text("What does photosynthesis produce?"), telegram_bot.application.bot)
+    sent = telegram_api.calls.get("sendMessage", 0)
+
+    # Linked identity, then the same chat turn as the REST endpoint
+    with query_budget(6, "Telegram chat message"):
+        await telegram_bot._handle_update(update)
+    assert telegram_api.calls.get("sendMessage", 0) > sent
+    assert await chat_messages(session_factory, seed) == 2
+
+
+async def test_whatsapp_chat_message(app, session_factory, seed, query_budget):
+    await whatsapp_chat_context.set(seed.phone, str(seed.document.id))
+    message = seed.whatsapp_text("What does photosynthesis produce?")
+
+    # Sender upsert and linked identity, then the chat turn
+    with query_budget(7, "WhatsApp chat message"):
+        # The two webhook stages: sender resolution (batch worker), then the message worker
+        async with whatsapp_bot.db_session_factory() as session:
+            senders = await whatsapp_bot.resolve_senders([message], {}, session)
+        await whatsapp_bot._handle_message((message, senders[seed.phone]))
+    assert await chat_messages(session_factory, seed) == 2
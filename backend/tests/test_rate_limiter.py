@@ -0,0 +1,107 @@
+"""
+GCRA rate limiting and its per-worker fallback
+"""
+import pytest
+from loguru import logger
+
+from clock import Clock
+from utils import cache, rate_limiter
+from utils.rate_limiter import RateLimiter, InMemoryRateLimitBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock().install(monkeypatch, cache, rate_limiter)
+
+
+async def test_gcra_allows_a_burst_then_one_per_interval(clock):
+    backend = InMemoryRateLimitBackend()
+    # 1 per second, bursts of 3
+    results = [await backend.check("k", 1.0, 3) for _ in range(4)]
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert results[-1].retry_after == pytest.approx(1.0)
+
+    clock.advance(0.5)
+    assert not (await backend.check("k", 1.0, 3)).allowed
+    clock.advance(0.5)
+    assert (await backend.check("k", 1.0, 3)).allowed
+    assert not (await backend.check("k", 1.0, 3)).allowed
+
+
+async def test_gcra_denied_checks_consume_nothing(clock):
+    backend = InMemoryRateLimitBackend()
+    for _ in range(2):
+        await backend.check("k", 1.0, 2)
+    for _ in range(5):
+        assert not (await backend.check("k", 1.0, 2)).allowed
+
+    clock.advance(1.0)
+    assert (await backend.check("k", 1.0, 2)).allowed
+
+
+async def test_gcra_cost_and_force(clock):
+    backend = InMemoryRateLimitBackend()
+    assert (await backend.check("k", 1.0, 10, cost=8)).allowed
+    result = await backend.check("k", 1.0, 10, cost=4)
+    assert not result.allowed
+    assert result.retry_after == pytest.approx(2.0)
+
+    # Forced charges always land, pushing later checks back
+    assert (await backend.check("k", 1.0, 10, cost=4, force=True)).allowed
+    clock.advance(2.0)
+    assert not (await backend.check("k", 1.0, 10)).allowed
+
+
+async def test_gcra_keys_are_independent_and_expire_once_full_again(clock):
+    backend = InMemoryRateLimitBackend()
+    assert (await backend.check("a", 1.0, 1)).allowed
+    assert not (await backend.check("a", 1.0, 1)).allowed
+    assert (await backend.check("b", 1.0, 1)).allowed
+
+    clock.advance(1.0)
+    assert backend.tats.get("a") is None
+    assert backend.tats.get("b") is None
+
+
+class FlakyBackend(InMemoryRateLimitBackend):
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    async def check(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError("redis down")
+        return await super().check(*args, **kwargs)
+
+
+async def test_fallback_logs_outage_once_and_counts_checks():
+    messages = []
+    sink = logger.add(lambda message: messages.append(message.record["message"]), level="INFO")
+    backend = FlakyBackend()
+    limiter = RateLimiter(max_requests=100, backend=backend)
+    try:
+        assert (await limiter.check("client")).allowed
+        backend.down = True
+        for _ in range(5):
+            assert (await limiter.check("client")).allowed
+        backend.down = False
+        assert (await limiter.check("client")).allowed
+    finally:
+        logger.remove(sink)
+
+    assert limiter.fallbacks == 5
+    assert not limiter.degraded
+    assert [m for m in messages if "Rate limit backend" in m] == [
+        "Rate limit backend error, enforcing per-worker limits until it recovers: redis down",
+        "Rate limit backend recovered (5 checks enforced per worker so far)",
+    ]
+
+
+async def test_fallback_enforces_the_limit():
+    backend = FlakyBackend()
+    backend.down = True
+    limiter = RateLimiter(max_requests=3, window_seconds=60, backend=backend)
+
+    results = [await limiter.check("client") for _ in range(4)]
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert 0 < results[-1].retry_after <= 20
@@ -0,0 +1,29 @@
+"""
+Splitting over-long replies for the messaging platforms
+"""
+from utils.text import split_message, split_point
+
+
+def test_short_text_is_not_split():
+    assert split_point("hello", 10) == 5
+    assert split_message("hello", 10) == ["hello"]
+    assert split_message("", 10) == [""]
+
+
+def test_split_prefers_paragraph_then_line_then_word_breaks():
+    head = "a" * 11
+    assert split_point(head + "\n\nbbbb\ncc dd eeee", 20) == 11
+    assert split_point(head + "\nbbbb cc dd eeee", 20) == 11
+    assert split_point(head + " bbbb cc dd eeee", 20) == 19
+
+
+def test_breaks_in_the_first_half_are_ignored():
+    # Cutting at the early space would leave a tiny part; cut at the limit instead
+    assert split_point("ab " + "c" * 20, 10) == 10
+
+
+def test_parts_fit_the_limit_and_keep_every_word():
+    text = " ".join(f"word{i}" for i in range(500))
+    parts = split_message(text, 100)
+    assert all(len(part) <= 100 for part in parts)
+    assert " ".join(parts).split() == text.split()
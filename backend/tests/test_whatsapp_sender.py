@@ -0,0 +1,16 @@
+"""
+WhatsAppSender lifecycle
+"""
+import pytest
+
+from services.whatsapp_sender import WhatsAppSender, WhatsAppSendError
+
+
+async def test_send_after_stop_fails_without_reopening_a_client():
+    sender = WhatsAppSender(api_url="http://graph.invalid", access_token="token", phone_number_id="1")
+    sender.start()
+    await sender.stop()
+
+    with pytest.raises(WhatsAppSendError):
+        await sender.send_text("15550000000", "hello")
+    assert sender.client is None
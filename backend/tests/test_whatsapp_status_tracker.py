@@ -0,0 +1,47 @@
+"""
+WhatsApp delivery statuses: parsing and coalescing in the write-behind buffer
+"""
+from services.whatsapp_status_tracker import WhatsAppStatusTracker, parse_status_event
+
+
+def status(message_id: str, state: str, timestamp: int) -> dict:
+    return {"id": message_id, "status": state, "timestamp": str(timestamp), "recipient_id": "15550000000"}
+
+
+def test_unusable_events_are_ignored():
+    assert parse_status_event({"status": "sent"}) is None
+    assert parse_status_event({"id": "wamid.1", "status": "deleted"}) is None
+
+
+def test_failed_event_carries_its_error():
+    row = parse_status_event({
+        **status("wamid.1", "failed", 1700000000),
+        "errors": [{"code": 131026, "title": "Message undeliverable"}],
+    })
+    assert row["status_rank"] == 4
+    assert (row["error_code"], row["error_title"]) == (131026, "Message undeliverable")
+
+
+def test_later_stage_wins_whatever_the_arrival_order():
+    tracker = WhatsAppStatusTracker()
+    tracker.record(status("wamid.1", "read", 1700000010))
+    tracker.record(status("wamid.1", "delivered", 1700000005))
+    tracker.record(status("wamid.1", "sent", 1700000001))
+    tracker.record(status("wamid.2", "sent", 1700000001))
+
+    assert tracker.buffer["wamid.1"]["status"] == "read"
+    assert tracker.buffer["wamid.2"]["status"] == "sent"
+    assert (tracker.received, tracker.coalesced) == (4, 2)
+
+
+def test_buffer_sheds_new_messages_when_full():
+    tracker = WhatsAppStatusTracker()
+    tracker.max_buffered = 2
+    for i in range(3):
+        tracker.record(status(f"wamid.{i}", "sent", 1700000000))
+    # Updates to buffered messages still coalesce
+    tracker.record(status("wamid.0", "delivered", 1700000001))
+
+    assert sorted(tracker.buffer) == ["wamid.0", "wamid.1"]
+    assert tracker.buffer["wamid.0"]["status"] == "delivered"
+    assert tracker.dropped == 1
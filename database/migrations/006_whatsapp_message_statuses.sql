@@ -0,0 +1,32 @@
+-- Migration: Create WhatsApp Message Statuses Table
+-- Description: Latest delivery status (sent/delivered/read/failed) per outbound WhatsApp message
+-- Date: 2026-10-19
+
+BEGIN;
+
+-- One row per message; status webhooks are buffered and upserted in batches
+CREATE TABLE IF NOT EXISTS whatsapp_message_statuses (
+    message_id VARCHAR(128) PRIMARY KEY,
+    recipient_phone VARCHAR(20),
+    status VARCHAR(16) NOT NULL,
+    status_rank SMALLINT NOT NULL,
+    status_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    conversation_id VARCHAR(128),
+    pricing_category VARCHAR(32),
+    error_code INTEGER,
+    error_title TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create indexes for performance
+CREATE INDEX IF NOT EXISTS idx_whatsapp_message_statuses_recipient ON whatsapp_message_statuses(recipient_phone);
+CREATE INDEX IF NOT EXISTS idx_whatsapp_message_statuses_status ON whatsapp_message_statuses(status);
+
+-- Add comments for documentation
+COMMENT ON TABLE whatsapp_message_statuses IS 'Latest delivery status per outbound WhatsApp message';
+COMMENT ON COLUMN whatsapp_message_statuses.message_id IS 'WhatsApp message id (wamid)';
+COMMENT ON COLUMN whatsapp_message_statuses.status_rank IS 'Status precedence (sent < delivered < read < failed); older or lesser events never overwrite';
+COMMENT ON COLUMN whatsapp_message_statuses.status_at IS 'Event timestamp reported by WhatsApp';
+
+COMMIT;
@@ -0,0 +1,16 @@
+-- Migration: Document processing lease
+-- Description: Lets the requeue sweep recover documents whose worker died mid-processing
+-- Date: 2026-10-19
+
+BEGIN;
+
+ALTER TABLE documents
+ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP WITH TIME ZONE;
+
+-- The sweep looks for unfinished documents only
+CREATE INDEX IF NOT EXISTS idx_documents_unfinished ON documents(status, processing_started_at)
+    WHERE status IN ('uploaded', 'processing');
+
+COMMENT ON COLUMN documents.processing_started_at IS 'When a worker last claimed the document or renewed its lease while processing; expired leases are swept again';
+
+COMMIT;
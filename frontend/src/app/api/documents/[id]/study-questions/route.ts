@@ -14,13 +14,33 @@ export async function GET(
       return NextResponse.json({ error: 'Unauthorized' }, { status: 401 })
     }
 
+    const headers: Record<string, string> = {
+      'Authorization': `Bearer ${session.accessToken}`,
+      'Content-Type': 'application/json',
+    }
+    const ifNoneMatch = request.headers.get('if-none-match')
+    if (ifNoneMatch) {
+      headers['If-None-Match'] = ifNoneMatch
+    }
+
     const response = await fetch(`${BACKEND_URL}/api/documents/${params.id}/study-questions`, {
-      headers: {
-        'Authorization': `Bearer ${session.accessToken}`,
-        'Content-Type': 'application/json',
-      },
+      headers,
+      cache: 'no-store',
     })
 
+    // Pass cache validators through so the browser can revalidate cheaply
+    const cacheHeaders: Record<string, string> = {}
+    for (const name of ['etag', 'cache-control', 'vary']) {
+      const value = response.headers.get(name)
+      if (value) {
+        cacheHeaders[name] = value
+      }
+    }
+
+    if (response.status === 304) {
+      return new NextResponse(null, { status: 304, headers: cacheHeaders })
+    }
+
     if (!response.ok) {
       const errorData = await response.text()
       return NextResponse.json(
@@ -30,7 +50,7 @@ export async function GET(
     }
 
     const data = await response.json()
-    return NextResponse.json(data)
+    return NextResponse.json(data, { headers: cacheHeaders })
     
   } catch (error) {
     console.error('Study questions API error:', error)
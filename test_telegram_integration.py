@@ -16,16 +16,19 @@ async def test_telegram_bot_integration():
     
     try:
         # Test import of telegram bot service
-        from services.telegram_bot import TelegramBotService, user_chat_contexts
+        from services.telegram_bot import TelegramBotService
+        from services.chat_context_store import chat_context_store
         print("✅ Successfully imported TelegramBotService")
         
         # Test creating bot instance
         bot = TelegramBotService()
         print("✅ Successfully created TelegramBotService instance")
         
-        # Test that the user_chat_contexts is properly initialized
-        assert isinstance(user_chat_contexts, dict)
-        print("✅ user_chat_contexts is properly initialized as dict")
+        # Test that the chat context store round-trips an active document
+        await chat_context_store.set(0, "test-document")
+        assert await chat_context_store.get(0) == "test-document"
+        await chat_context_store.clear(0)
+        print("✅ chat_context_store is properly initialized")
         
         # Test that all required methods exist
         required_methods = [